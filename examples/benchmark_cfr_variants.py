@@ -0,0 +1,198 @@
+''' Exploitability curves of the CFR variants of CFRAgent (vanilla, CFR+,
+Linear CFR, Discounted CFR) on Leduc Hold'em, against iterations and
+wall-clock time.
+
+The exploitability of the average policy is computed exactly: the tree of
+every deal is built once, then a best response is computed for each player
+on the true information sets (own cards, public card and the betting
+history). The curves are saved to <log_dir>/cfr_variants.csv.
+
+With --env limit-holdem the tree is too large for a best response, only the
+time per iteration of each variant is reported. A full traversal of a limit
+hold'em deal takes about a minute, use a few iterations.
+'''
+import argparse
+import csv
+import os
+import time
+
+import numpy as np
+
+import rlcard
+from rlcard.agents import CFRAgent
+
+def deal_key(game):
+    ''' The chance outcome of a new Leduc game: the hands, the public card to
+    come and the small blind
+    '''
+    return (tuple(str(player.hand) for player in game.players), str(game.dealer.deck[-1]), game.game_pointer)
+
+def build_tree(env, history=()):
+    ''' Build the game tree under the current state by stepping the env
+
+    A terminal node is the array of payoffs, a decision node is the tuple
+    (player_id, obs, history, legal_actions, children)
+    '''
+    if env.is_over():
+        return env.get_payoffs()
+    player_id = env.get_player_id()
+    state = env.get_state(player_id)
+    legal_actions = list(state['legal_actions'].keys())
+    children = []
+    for action in legal_actions:
+        env.step(action)
+        children.append(build_tree(env, history + (action,)))
+        env.step_back()
+    return (player_id, state['obs'].tobytes(), history, legal_actions, children)
+
+def build_deals(env, patience):
+    ''' The trees of all the deals, equally likely. The env is reset until no new
+    deal was seen for patience resets
+    '''
+    trees = {}
+    since_new = 0
+    while since_new < patience:
+        env.reset()
+        key = deal_key(env.game)
+        if key in trees:
+            since_new += 1
+        else:
+            trees[key] = build_tree(env)
+            since_new = 0
+    return list(trees.values())
+
+def best_response_value(trees, agent, player_id):
+    ''' The expected payoff of a best response of player_id to the average
+    policy of the agent
+    '''
+    policies = {}
+    def policy(node):
+        _, obs, _, legal_actions, _ = node
+        key = (obs, tuple(legal_actions))
+        if key not in policies:
+            policies[key] = agent.action_probs(obs, legal_actions, agent.average_policy)[legal_actions]
+        return policies[key]
+
+    # group the decision nodes of player_id by information set, with the
+    # probability of reaching them by chance and by the opponents
+    infosets = {}
+    def collect(node, reach):
+        if not isinstance(node, tuple):
+            return
+        current_player, obs, history, _, children = node
+        if current_player == player_id:
+            infosets.setdefault((obs, history), []).append((node, reach))
+            for child in children:
+                collect(child, reach)
+        else:
+            for prob, child in zip(policy(node), children):
+                collect(child, reach * prob)
+    for tree in trees:
+        collect(tree, 1.0 / len(trees))
+
+    best_actions = {}
+    def value(node):
+        if not isinstance(node, tuple):
+            return node[player_id]
+        current_player, obs, history, _, children = node
+        if current_player != player_id:
+            return sum(prob * value(child) for prob, child in zip(policy(node), children))
+        key = (obs, history)
+        if key not in best_actions:
+            nodes = infosets[key]
+            action_values = [sum(reach * value(n[4][i]) for n, reach in nodes) for i in range(len(children))]
+            best_actions[key] = int(np.argmax(action_values))
+        return value(children[best_actions[key]])
+
+    return sum(value(tree) for tree in trees) / len(trees)
+
+def exploitability(trees, agent, num_players):
+    ''' The mean gain of the best responses of the players to the average
+    policy, 0 at a Nash equilibrium of a two-player zero-sum game
+    '''
+    return sum(best_response_value(trees, agent, player_id) for player_id in range(num_players)) / num_players
+
+def run(args):
+    env = rlcard.make(args.env, config={'seed': args.seed, 'allow_step_back': True})
+    trees = None
+    if args.env == 'leduc-holdem':
+        start = time.perf_counter()
+        trees = build_deals(env, args.patience)
+        print('{} deals built in {:.1f}s'.format(len(trees), time.perf_counter() - start))
+
+    rows = []
+    for variant in CFRAgent.VARIANTS:
+        env = rlcard.make(args.env, config={'seed': args.seed, 'allow_step_back': True})
+        agent = CFRAgent(env, variant=variant)
+        train_time = 0
+        for iteration in range(1, args.num_iterations + 1):
+            start = time.perf_counter()
+            agent.train()
+            train_time += time.perf_counter() - start
+            if trees is not None and (iteration % args.evaluate_every == 0 or iteration == args.num_iterations):
+                value = exploitability(trees, agent, env.num_players)
+                rows.append({'variant': variant, 'iteration': iteration, 'seconds': train_time,
+                             'exploitability': value})
+        line = '{:>10}: {:8.3f} s/iteration'.format(variant, train_time / args.num_iterations)
+        if trees is not None:
+            line += ', exploitability {:.4f} after {} iterations'.format(rows[-1]['exploitability'], args.num_iterations)
+            for target in args.targets:
+                reached = [row for row in rows if row['variant'] == variant and row['exploitability'] <= target]
+                line += ', <= {} at {}'.format(target, '{:.1f}s'.format(reached[0]['seconds']) if reached else '-')
+        print(line)
+
+    if rows:
+        if not os.path.exists(args.log_dir):
+            os.makedirs(args.log_dir)
+        csv_path = os.path.join(args.log_dir, 'cfr_variants.csv')
+        with open(csv_path, 'w') as csv_file:
+            writer = csv.DictWriter(csv_file, fieldnames=['variant', 'iteration', 'seconds', 'exploitability'])
+            writer.writeheader()
+            writer.writerows(rows)
+        print('Curves saved in', csv_path)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser("CFR variants benchmark in RLCard")
+    parser.add_argument(
+        '--env',
+        type=str,
+        default='leduc-holdem',
+        choices=['leduc-holdem', 'limit-holdem'],
+    )
+    parser.add_argument(
+        '--num_iterations',
+        type=int,
+        default=1000,
+    )
+    parser.add_argument(
+        '--evaluate_every',
+        type=int,
+        default=50,
+    )
+    parser.add_argument(
+        '--targets',
+        type=float,
+        nargs='*',
+        default=[0.5, 0.2],
+        help='Report the training time to reach these exploitabilities',
+    )
+    parser.add_argument(
+        '--patience',
+        type=int,
+        default=5000,
+        help='Resets without a new deal before the deals are assumed complete',
+    )
+    parser.add_argument(
+        '--seed',
+        type=int,
+        default=0,
+    )
+    parser.add_argument(
+        '--log_dir',
+        type=str,
+        default='experiments/cfr_variants_result/',
+    )
+
+    args = parser.parse_args()
+
+    run(args)
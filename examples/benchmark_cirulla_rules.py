@@ -0,0 +1,86 @@
+''' Throughput of the Cirulla environment with the optional rules
+(redeal, knock, last taker) against the simplified rules.
+
+Exits with an error if the full-rules engine is more than --max_slowdown
+percent slower than the simplified one.
+'''
+import argparse
+import sys
+import time
+
+import numpy as np
+
+import rlcard
+
+FULL_RULES = {
+    'game_redeal': True,
+    'game_knock': True,
+    'game_last_taker': True,
+}
+
+def play(env, num_games, np_random):
+    ''' Play random games, return the number of steps and the elapsed time
+    '''
+    num_steps = 0
+    start = time.perf_counter()
+    for _ in range(num_games):
+        state, _ = env.reset()
+        while not env.is_over():
+            legal_actions = list(state['legal_actions'])
+            state, _ = env.step(legal_actions[np_random.randint(len(legal_actions))])
+            num_steps += 1
+    return num_steps, time.perf_counter() - start
+
+def run(args):
+    envs = {}
+    for name, rules in [('simplified', {}), ('full', FULL_RULES)]:
+        config = {'seed': 42, 'game_bitboard': args.bitboard, 'allow_step_back': False, **rules}
+        envs[name] = rlcard.make('cirulla', config=config)
+
+    # interleave the runs and keep the best of each, to be robust to noise
+    best = {name: None for name in envs}
+    for _ in range(args.repeats):
+        for name, env in envs.items():
+            num_steps, elapsed = play(env, args.num_games, np.random.RandomState(0))
+            if best[name] is None or elapsed < best[name][1]:
+                best[name] = (num_steps, elapsed)
+
+    for name, (num_steps, elapsed) in best.items():
+        print('{:>10}: {:8.1f} games/sec {:10.1f} steps/sec'.format(
+            name, args.num_games / elapsed, num_steps / elapsed))
+
+    # compare the time per step, the number of steps per game is the same
+    simplified_rate = best['simplified'][0] / best['simplified'][1]
+    full_rate = best['full'][0] / best['full'][1]
+    slowdown = 100 * (simplified_rate / full_rate - 1)
+    print('full rules slowdown: {:.1f}% (max {:.1f}%)'.format(slowdown, args.max_slowdown))
+    if slowdown > args.max_slowdown:
+        sys.exit('The full-rules engine is too slow')
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser("Cirulla rules benchmark in RLCard")
+    parser.add_argument(
+        '--num_games',
+        type=int,
+        default=200,
+    )
+    parser.add_argument(
+        '--repeats',
+        type=int,
+        default=5,
+    )
+    parser.add_argument(
+        '--max_slowdown',
+        type=float,
+        default=10.0,
+        help='Maximum slowdown of the full rules, in percent',
+    )
+    parser.add_argument(
+        '--bitboard',
+        action='store_true',
+        help='Use the bitboard engine',
+    )
+
+    args = parser.parse_args()
+
+    run(args)
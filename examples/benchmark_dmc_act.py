@@ -0,0 +1,120 @@
+''' Throughput of a DMC actor: the self-play games that `act` plays between
+the actor models, with DMCAgent.predict looking the action features up in a
+device table and broadcasting the observation over the legal actions,
+against the former predict which built the features of every legal action
+and repeated the observation for each of them. The latency of predict is
+also measured on the first states of games, with the most legal actions.
+'''
+import argparse
+import time
+
+import numpy as np
+import torch
+
+import rlcard
+from rlcard.agents.dmc_agent.model import DMCAgent
+
+class LegacyDMCAgent(DMCAgent):
+    ''' DMCAgent with the former predict
+    '''
+    def predict(self, state):
+        obs = state['obs'].astype(np.float32)
+        legal_actions = state['legal_actions']
+        action_keys = np.array(list(legal_actions.keys()))
+        action_values = list(legal_actions.values())
+        for i in range(len(action_values)):
+            if action_values[i] is None:
+                action_values[i] = np.zeros(self.action_shape[0])
+                action_values[i][action_keys[i]] = 1
+        action_values = np.array(action_values, dtype=np.float32)
+        obs = np.repeat(obs[np.newaxis, :], len(action_keys), axis=0)
+        values = self.net.forward(torch.from_numpy(obs).to(self.device),
+                                  torch.from_numpy(action_values).to(self.device))
+        return action_keys, values.cpu().detach().numpy()
+
+def make_agents(cls, env, action_features):
+    action_shape = env.action_shape[0] or [env.num_actions]
+    torch.manual_seed(0)
+    agents = [cls(env.state_shape[p], action_shape, device='cpu', action_features=action_features)
+              for p in range(env.num_players)]
+    for agent in agents:
+        agent.eval()
+    return agents
+
+def play(env, agents, num_games):
+    ''' Play training games as an actor does, return the number of decisions and the elapsed time
+    '''
+    env.set_agents(agents)
+    env.seed(0)
+    np.random.seed(0)
+    num_steps = 0
+    start = time.perf_counter()
+    for _ in range(num_games):
+        trajectories, _ = env.run(is_training=True)
+        num_steps += sum(len(trajectory) // 2 for trajectory in trajectories)
+    return num_steps, time.perf_counter() - start
+
+def predict_latency(env, agent, num_states, repeats):
+    ''' Best time of DMCAgent.predict on the first states of games, which have
+    the most legal actions
+    '''
+    states = []
+    for seed in range(num_states):
+        env.seed(seed)
+        states.append(env.reset()[0])
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for state in states:
+            agent.predict(state)
+        times.append((time.perf_counter() - start) / len(states))
+    num_actions = np.mean([len(state['legal_actions']) for state in states])
+    return min(times), num_actions
+
+def run(args):
+    torch.set_num_threads(args.num_threads)
+    env = rlcard.make(args.env)
+    action_features = np.stack([env.get_action_feature(action_id) for action_id in range(env.num_actions)])
+
+    agents = {
+        'legacy': make_agents(LegacyDMCAgent, env, None),
+        'table': make_agents(DMCAgent, env, action_features),
+    }
+    best = {}
+    for _ in range(args.repeats):
+        for name, _agents in agents.items():
+            num_steps, elapsed = play(env, _agents, args.num_games)
+            if name not in best or elapsed < best[name][1]:
+                best[name] = (num_steps, elapsed)
+    for name, (num_steps, elapsed) in best.items():
+        latency, num_actions = predict_latency(env, agents[name][0], args.num_games, args.repeats)
+        print('{:>8}: {:8.2f} games/sec {:10.1f} decisions/sec, predict {:6.3f} ms for {:.0f} legal actions'.format(
+            name, args.num_games / elapsed, num_steps / elapsed, 1000 * latency, num_actions))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser("DMC actor benchmark in RLCard")
+    parser.add_argument(
+        '--env',
+        type=str,
+        default='doudizhu',
+    )
+    parser.add_argument(
+        '--num_games',
+        type=int,
+        default=10,
+    )
+    parser.add_argument(
+        '--repeats',
+        type=int,
+        default=3,
+    )
+    parser.add_argument(
+        '--num_threads',
+        type=int,
+        default=1,
+        help='Intra-op threads, one per actor process',
+    )
+
+    args = parser.parse_args()
+
+    run(args)
@@ -0,0 +1,127 @@
+''' Cost of moving the episodes of a DMC actor into the shared buffers: the
+episodes are staged in numpy arrays and copied to a buffer one T-length slice
+per key, against the former lists of per-step tensors copied one timestep at
+a time and sliced after every buffer. The episodes are played once and
+replayed, only the copy is timed.
+'''
+import argparse
+import queue
+import time
+
+import numpy as np
+import torch
+
+import rlcard
+from rlcard.agents.dmc_agent.model import DMCModel
+from rlcard.agents.dmc_agent.utils import create_buffers, create_staging, stage_episode, flush_staging
+
+def recycle(free_queue, full_queue):
+    ''' Free the filled buffers, as the learner does
+    '''
+    while not full_queue.empty():
+        free_queue.put(full_queue.get())
+
+def legacy_copy(episodes, env, T, free_queue, full_queue, buffers):
+    ''' The former loop of act for player 0
+    '''
+    done_buf, episode_return_buf, target_buf, state_buf, action_buf = [], [], [], [], []
+    size = 0
+    for trajectory, payoff in episodes:
+        size += len(trajectory[:-1]) // 2
+        diff = size - len(target_buf)
+        if diff > 0:
+            done_buf.extend([False for _ in range(diff-1)])
+            done_buf.append(True)
+            episode_return_buf.extend([0.0 for _ in range(diff-1)])
+            episode_return_buf.append(payoff)
+            target_buf.extend([payoff for _ in range(diff)])
+            for i in range(0, len(trajectory)-2, 2):
+                state_buf.append(torch.from_numpy(trajectory[i]['obs']))
+                action_buf.append(torch.from_numpy(env.get_action_feature(trajectory[i+1])))
+        while size > T:
+            index = free_queue.get()
+            for t in range(T):
+                buffers['done'][index][t, ...] = done_buf[t]
+                buffers['episode_return'][index][t, ...] = episode_return_buf[t]
+                buffers['target'][index][t, ...] = target_buf[t]
+                buffers['state'][index][t, ...] = state_buf[t]
+                buffers['action'][index][t, ...] = action_buf[t]
+            full_queue.put(index)
+            done_buf = done_buf[T:]
+            episode_return_buf = episode_return_buf[T:]
+            target_buf = target_buf[T:]
+            state_buf = state_buf[T:]
+            action_buf = action_buf[T:]
+            size -= T
+        recycle(free_queue, full_queue)
+
+def staged_copy(episodes, action_features, T, free_queue, full_queue, buffers):
+    ''' The loop of act for player 0
+    '''
+    staging, size = create_staging(buffers, 2 * T), 0
+    for trajectory, payoff in episodes:
+        staging, size = stage_episode(staging, size, trajectory, payoff, action_features)
+        size = flush_staging(staging, size, T, free_queue, full_queue, buffers)
+        recycle(free_queue, full_queue)
+
+def run(args):
+    torch.set_num_threads(1)
+    env = rlcard.make(args.env, config={'seed': 0})
+    model = DMCModel(env.state_shape, env.action_shape, mlp_layers=[64], device='cpu')
+    env.set_agents(model.get_agents())
+    episodes = []
+    for _ in range(args.num_games):
+        trajectories, payoffs = env.run(is_training=True)
+        episodes.append((trajectories[0], float(payoffs[0])))
+    num_steps = sum(len(trajectory) // 2 for trajectory, _ in episodes)
+
+    buffers = create_buffers(args.T, args.num_buffers, env.state_shape, env.action_shape, ['cpu'])['cpu'][0]
+    free_queue, full_queue = queue.Queue(), queue.Queue()
+    for index in range(args.num_buffers):
+        free_queue.put(index)
+    action_features = np.stack([env.get_action_feature(action_id) for action_id in range(env.num_actions)])
+
+    copies = {
+        'legacy': lambda: legacy_copy(episodes, env, args.T, free_queue, full_queue, buffers),
+        'staged': lambda: staged_copy(episodes, action_features, args.T, free_queue, full_queue, buffers),
+    }
+    for name, copy in copies.items():
+        times = []
+        for _ in range(args.repeats):
+            start = time.perf_counter()
+            copy()
+            times.append(time.perf_counter() - start)
+        print('{:>8}: {:10.0f} steps/sec, {:7.2f} us/step'.format(
+            name, num_steps / min(times), 1e6 * min(times) / num_steps))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser("DMC buffer copy benchmark in RLCard")
+    parser.add_argument(
+        '--env',
+        type=str,
+        default='doudizhu',
+    )
+    parser.add_argument(
+        '--num_games',
+        type=int,
+        default=200,
+    )
+    parser.add_argument(
+        '--T',
+        type=int,
+        default=100,
+    )
+    parser.add_argument(
+        '--num_buffers',
+        type=int,
+        default=50,
+    )
+    parser.add_argument(
+        '--repeats',
+        type=int,
+        default=3,
+    )
+
+    args = parser.parse_args()
+
+    run(args)
@@ -0,0 +1,93 @@
+''' Frames/sec of DMC actors on CPU against the number of actor processes.
+Every actor plays self-play training games with its own model for a fixed
+time, as `act` does, and the frames (the decisions of the players) of all
+the actors are summed. Compare --num_threads 1, one intra-op thread per
+actor as DMCTrainer sets by default, with the torch default of one thread
+per CPU in every process, and --compile to compile the networks.
+'''
+import argparse
+import multiprocessing
+import os
+import time
+
+import numpy as np
+import torch
+
+import rlcard
+from rlcard.agents.dmc_agent.model import DMCModel
+
+def actor(args, seed, start_time, results):
+    ''' Play games from start_time for args.seconds, put the number of frames
+    '''
+    if args.num_threads is not None:
+        torch.set_num_threads(args.num_threads)
+    env = rlcard.make(args.env, config={'seed': seed})
+    action_features = np.stack([env.get_action_feature(action_id) for action_id in range(env.num_actions)])
+    model = DMCModel(env.state_shape, env.action_shape, device='cpu', action_features=action_features)
+    model.eval()
+    if args.compile:
+        model.compile()
+        # warm up on a few games, the compilation is not timed
+        env.set_agents(model.get_agents())
+        for _ in range(5):
+            env.run(is_training=True)
+    env.set_agents(model.get_agents())
+
+    while time.time() < start_time:
+        time.sleep(0.01)
+    frames = 0
+    while time.time() < start_time + args.seconds:
+        trajectories, _ = env.run(is_training=True)
+        frames += sum(len(trajectory) // 2 for trajectory in trajectories)
+    results.put(frames)
+
+def run(args):
+    ctx = multiprocessing.get_context('spawn')
+    print('{} CPUs'.format(os.cpu_count()))
+    for num_actors in args.num_actors:
+        results = ctx.Queue()
+        # leave time to start the processes, and to compile
+        start_time = time.time() + (60 if args.compile else 10)
+        processes = [ctx.Process(target=actor, args=(args, seed, start_time, results)) for seed in range(num_actors)]
+        for process in processes:
+            process.start()
+        frames = sum(results.get() for _ in processes)
+        for process in processes:
+            process.join()
+        print('{:>3} actors: {:9.1f} frames/sec, {:8.1f} per actor'.format(
+            num_actors, frames / args.seconds, frames / args.seconds / num_actors))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser("DMC CPU actor scaling benchmark in RLCard")
+    parser.add_argument(
+        '--env',
+        type=str,
+        default='doudizhu',
+    )
+    parser.add_argument(
+        '--num_actors',
+        type=int,
+        nargs='+',
+        default=[1, 2, 4, 8],
+    )
+    parser.add_argument(
+        '--num_threads',
+        type=int,
+        default=1,
+        help='Intra-op threads per actor, 0 for the torch default',
+    )
+    parser.add_argument(
+        '--compile',
+        action='store_true',
+        help='Compile the networks with torch.compile',
+    )
+    parser.add_argument(
+        '--seconds',
+        type=float,
+        default=20,
+    )
+
+    args = parser.parse_args()
+    args.num_threads = args.num_threads or None
+
+    run(args)
@@ -0,0 +1,168 @@
+''' Latency of DQNAgent.train, sampling from the replay memory included, with
+the legal actions stored as boolean masks in the numpy memory and the
+double-DQN target computed in one torch expression, against the former agent
+which kept the transitions in a list, the legal actions as lists of ids, and
+masked the Q-values in numpy. Both agents start from the same weights and
+memory contents, the first train step is checked to give the same weights.
+'''
+import argparse
+import contextlib
+import copy
+import os
+import random
+import time
+
+import numpy as np
+import torch
+
+from rlcard.agents import DQNAgent
+from rlcard.agents.dqn_agent import Transition
+
+class LegacyMemory(object):
+    ''' The former replay memory, a list of transitions
+    '''
+    def __init__(self, memory_size, batch_size):
+        self.memory_size = memory_size
+        self.batch_size = batch_size
+        self.memory = []
+
+    def save(self, state, action, reward, next_state, legal_actions, done):
+        if len(self.memory) == self.memory_size:
+            self.memory.pop(0)
+        self.memory.append(Transition(state, action, reward, next_state, done, legal_actions))
+
+    def sample(self):
+        samples = random.sample(self.memory, self.batch_size)
+        samples = tuple(zip(*samples))
+        return tuple(map(np.array, samples[:-1])) + (samples[-1],)
+
+class LegacyDQNAgent(DQNAgent):
+    ''' DQNAgent with the former train
+    '''
+    def train(self):
+        state_batch, action_batch, reward_batch, next_state_batch, done_batch, legal_actions_batch = self.memory.sample()
+
+        q_values_next = self.q_estimator.predict_nograd(next_state_batch)
+        legal_actions = []
+        for b in range(self.batch_size):
+            legal_actions.extend([i + b * self.num_actions for i in legal_actions_batch[b]])
+        masked_q_values = -np.inf * np.ones(self.num_actions * self.batch_size, dtype=float)
+        masked_q_values[legal_actions] = q_values_next.flatten()[legal_actions]
+        masked_q_values = masked_q_values.reshape((self.batch_size, self.num_actions))
+        best_actions = np.argmax(masked_q_values, axis=1)
+
+        q_values_next_target = self.target_estimator.predict_nograd(next_state_batch)
+        target_batch = reward_batch + np.invert(done_batch).astype(np.float32) * \
+            self.discount_factor * q_values_next_target[np.arange(self.batch_size), best_actions]
+
+        state_batch = np.array(state_batch)
+        loss = self.q_estimator.update(state_batch, action_batch, target_batch)
+        print('\rINFO - Step {}, rl-loss: {}'.format(self.total_t, loss), end='')
+
+        if self.train_t % self.update_target_estimator_every == 0:
+            self.target_estimator = copy.deepcopy(self.q_estimator)
+            print("\nINFO - Copied model parameters to target network.")
+        self.train_t += 1
+
+def make_agent(cls, args):
+    torch.manual_seed(0)
+    return cls(
+        num_actions=args.num_actions,
+        state_shape=[args.state_size],
+        mlp_layers=[64, 64],
+        batch_size=args.batch_size,
+        replay_memory_size=args.memory_size,
+        update_target_estimator_every=10 ** 9,
+        device=torch.device(args.device),
+    )
+
+def same_weights(agent, other):
+    return all(torch.allclose(a, b, atol=1e-6) for a, b in
+               zip(agent.q_estimator.qnet.parameters(), other.q_estimator.qnet.parameters()))
+
+def run(args):
+    torch.set_num_threads(args.num_threads)
+    agents = {
+        'list masks': make_agent(LegacyDQNAgent, args),
+        'bool masks': make_agent(DQNAgent, args),
+    }
+    agents['list masks'].memory = LegacyMemory(args.memory_size, args.batch_size)
+
+    # the same transitions in both memories, the legal actions as ids or as masks
+    np_random = np.random.RandomState(0)
+    for _ in range(args.memory_size):
+        state = np_random.rand(args.state_size).astype(np.float32)
+        next_state = np_random.rand(args.state_size).astype(np.float32)
+        action = np_random.randint(args.num_actions)
+        reward = np_random.rand()
+        done = np_random.rand() < 0.1
+        legal_mask = np_random.rand(args.num_actions) < 0.2
+        legal_mask[0] = True
+        agents['list masks'].feed_memory(state, action, reward, next_state, list(np.flatnonzero(legal_mask)), done)
+        agents['bool masks'].feed_memory(state, action, reward, next_state, legal_mask, done)
+
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        # the same sample gives the same update
+        for agent in agents.values():
+            random.seed(0)
+            agent.train()
+        assert same_weights(*agents.values())
+
+        best = {}
+        for _ in range(args.repeats):
+            for name, agent in agents.items():
+                start = time.perf_counter()
+                for _ in range(args.num_steps):
+                    agent.train()
+                elapsed = (time.perf_counter() - start) / args.num_steps
+                best[name] = min(best.get(name, elapsed), elapsed)
+    for name, elapsed in best.items():
+        print('{:>10}: {:8.1f} us per train step'.format(name, 1e6 * elapsed))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser("DQN train step benchmark in RLCard")
+    parser.add_argument(
+        '--num_actions',
+        type=int,
+        default=309,
+        help='309 for Mahjong-sized action spaces, 40 for Cirulla',
+    )
+    parser.add_argument(
+        '--state_size',
+        type=int,
+        default=200,
+    )
+    parser.add_argument(
+        '--batch_size',
+        type=int,
+        default=32,
+    )
+    parser.add_argument(
+        '--memory_size',
+        type=int,
+        default=20000,
+    )
+    parser.add_argument(
+        '--num_steps',
+        type=int,
+        default=200,
+    )
+    parser.add_argument(
+        '--repeats',
+        type=int,
+        default=5,
+    )
+    parser.add_argument(
+        '--num_threads',
+        type=int,
+        default=1,
+    )
+    parser.add_argument(
+        '--device',
+        type=str,
+        default='cpu',
+    )
+
+    args = parser.parse_args()
+
+    run(args)
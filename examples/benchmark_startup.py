@@ -0,0 +1,53 @@
+''' Startup time of a fresh process that imports rlcard and makes one
+environment, as the short-lived evaluation workers do.
+
+The environments are registered lazily, so only the game of the environment
+made is imported. The "all games" line imports every registered environment,
+as rlcard did before, to show what is saved. The "numpy" line is the floor:
+rlcard imports numpy in any case.
+'''
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+MAKE = 'import rlcard; rlcard.make({env!r})'
+MAKE_ALL = ('import rlcard; from rlcard.envs.registration import registry; '
+            '[spec.load() for spec in registry.env_specs.values()]; rlcard.make({env!r})')
+COUNT_GAMES = ('import sys; {code}; '
+               'print(len({{m.split(".")[2] for m in sys.modules if m.startswith("rlcard.games.")}} - {{"base"}}))')
+
+def run_python(code):
+    ''' Run code in a new python process, return its output and the elapsed time
+    '''
+    # run from the root of the repository so that rlcard is importable
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    start = time.perf_counter()
+    output = subprocess.check_output([sys.executable, '-c', code], cwd=root, text=True)
+    return output, time.perf_counter() - start
+
+def run(args):
+    for name, code in [('numpy', 'import numpy'), ('lazy', MAKE), ('all games', MAKE_ALL)]:
+        code = code.format(env=args.env)
+        times = sorted(run_python(code)[1] for _ in range(args.repeats))
+        num_games = run_python(COUNT_GAMES.format(code=code))[0].strip()
+        print('{:>10}: {:6.1f} ms median, {:6.1f} ms best, {} games imported'.format(
+            name, 1000 * times[len(times) // 2], 1000 * times[0], num_games))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser("Startup benchmark in RLCard")
+    parser.add_argument(
+        '--env',
+        type=str,
+        default='cirulla',
+    )
+    parser.add_argument(
+        '--repeats',
+        type=int,
+        default=10,
+    )
+
+    args = parser.parse_args()
+
+    run(args)
@@ -12,6 +12,7 @@ from rlcard.utils import (
     get_device,
     set_seed,
     tournament,
+    parallel_tournament,
 )
 
 def load_model(model_path, env=None, position=None, device=None):
@@ -50,7 +51,16 @@ def evaluate(args):
     env.set_agents(agents)
 
     # Evaluate
-    rewards = tournament(env, args.num_games)
+    if args.num_workers > 1:
+        rewards, _ = parallel_tournament(
+            args.env,
+            agents,
+            args.num_games,
+            num_workers=args.num_workers,
+            seed=args.seed,
+        )
+    else:
+        rewards = tournament(env, args.num_games)
     for position, reward in enumerate(rewards):
         print(position, args.models[position], reward)
 
@@ -94,6 +104,12 @@ if __name__ == '__main__':
         type=int,
         default=10000,
     )
+    parser.add_argument(
+        '--num_workers',
+        type=int,
+        default=1,
+        help='Play the games in that many processes',
+    )
 
     args = parser.parse_args()
 
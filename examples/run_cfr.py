@@ -41,6 +41,7 @@ def train(args):
             args.log_dir,
             'cfr_model',
         ),
+        variant=args.variant,
     )
     agent.load()  # If we have saved model, we first load the model
 
@@ -78,6 +79,12 @@ if __name__ == '__main__':
         type=int,
         default=42,
     )
+    parser.add_argument(
+        '--variant',
+        type=str,
+        default='vanilla',
+        choices=list(CFRAgent.VARIANTS),
+    )
     parser.add_argument(
         '--num_episodes',
         type=int,
@@ -24,6 +24,13 @@ def train(args):
         num_actor_devices=args.num_actor_devices,
         num_actors=args.num_actors,
         training_device=args.training_device,
+        publish_interval=args.publish_interval,
+        autoscale=args.autoscale,
+        min_actors=args.min_actors,
+        max_actors=args.max_actors,
+        actor_threads=args.actor_threads,
+        learner_threads=args.learner_threads,
+        compile=args.compile,
     )
 
     # Train DMC Agents
@@ -90,6 +97,46 @@ if __name__ == '__main__':
         type=str,
         help='The index of the GPU used for training models',
     )
+    parser.add_argument(
+        '--publish_interval',
+        default=1,
+        type=int,
+        help='The number of learner steps between two publications of the weights to the actors',
+    )
+    parser.add_argument(
+        '--autoscale',
+        action='store_true',
+        help='Add or retire actors to keep the learner busy',
+    )
+    parser.add_argument(
+        '--min_actors',
+        default=1,
+        type=int,
+        help='The minimum number of actors for each simulation device with --autoscale',
+    )
+    parser.add_argument(
+        '--max_actors',
+        default=None,
+        type=int,
+        help='The maximum number of actors for each simulation device with --autoscale, the number of CPUs by default',
+    )
+    parser.add_argument(
+        '--actor_threads',
+        default=1,
+        type=int,
+        help='The intra-op threads of each actor process',
+    )
+    parser.add_argument(
+        '--learner_threads',
+        default=None,
+        type=int,
+        help='The intra-op threads of the learner, on CPU the CPUs left by the actors by default',
+    )
+    parser.add_argument(
+        '--compile',
+        action='store_true',
+        help='Compile the networks of the actors with torch.compile',
+    )
 
     args = parser.parse_args()
 
@@ -1,5 +1,4 @@
 import numpy as np
-import collections
 
 import os
 import pickle
@@ -8,27 +7,92 @@ from rlcard.utils.utils import *
 
 class CFRAgent():
     ''' Implement CFR (chance sampling) algorithm
+
+    The regrets and the average policy are updated with one of the rules:
+
+        'vanilla': the accumulated regrets, the average policy weighted by iteration
+        'cfr+': the regrets are floored at zero after every traversal (regret
+                matching+), the average policy weighted by iteration
+        'linear': the contributions of iteration t to the regrets and the average
+                  policy are weighted by t
+        'discounted': after iteration t the positive regrets are multiplied by
+                      t^alpha / (t^alpha + 1), the negative regrets by
+                      t^beta / (t^beta + 1) and the average policy by (t / (t + 1))^gamma
     '''
+    VARIANTS = ('vanilla', 'cfr+', 'linear', 'discounted')
 
-    def __init__(self, env, model_path='./cfr_model'):
+    def __init__(self, env, model_path='./cfr_model', capacity=1024, variant='vanilla',
+                 alternating=None, alpha=1.5, beta=0.0, gamma=2.0):
         ''' Initilize Agent
 
         Args:
             env (Env): Env class
+            model_path (str): The directory to save and load the model
+            capacity (int): The initial number of rows of the tables
+            variant (str): The update rule, one of CFRAgent.VARIANTS
+            alternating (bool): Update the policy after the traversal of each
+                player instead of after all of them. By default, alternating
+                updates are used by all the variants but 'vanilla'
+            alpha (float): The discount exponent of the positive regrets, for 'discounted'
+            beta (float): The discount exponent of the negative regrets, for 'discounted'
+            gamma (float): The discount exponent of the average policy, for 'discounted'
         '''
+        if variant not in self.VARIANTS:
+            raise ValueError('Unknown CFR variant {}, expected one of {}'.format(variant, self.VARIANTS))
+        self.variant = variant
+        self.alternating = variant != 'vanilla' if alternating is None else alternating
+        if variant == 'linear':
+            # linear weights are the discounts with exponents 1
+            alpha, beta, gamma = 1.0, 1.0, 1.0
+        self.alpha = alpha
+        self.beta = beta
+        self.gamma = gamma
         self.use_raw = False
         self.env = env
         self.model_path = model_path
+        self.num_actions = env.num_actions
 
-        # A policy is a dict state_str -> action probabilities
-        self.policy = collections.defaultdict(list)
-        self.average_policy = collections.defaultdict(np.array)
+        # The infoset index maps a state_str to a row of the tables
+        self.infosets = {}
 
-        # Regret is a dict state_str -> action regrets
-        self.regrets = collections.defaultdict(np.array)
+        # The policy, average policy and regrets are 2-D tables with one row per
+        # infoset and one column per action. Only the first len(self.infosets) rows
+        # are in use, the tables double in size when they are full.
+        self.policy = np.full((capacity, self.num_actions), 1.0 / self.num_actions)
+        self.average_policy = np.zeros((capacity, self.num_actions))
+        self.regrets = np.zeros((capacity, self.num_actions))
 
         self.iteration = 0
 
+    @property
+    def num_infosets(self):
+        return len(self.infosets)
+
+    def infoset_id(self, obs):
+        ''' Get the row of an infoset in the tables, add it if it is new
+
+        Args:
+            obs (str): The state_str
+
+        Returns:
+            (int): The row of the infoset
+        '''
+        row = self.infosets.get(obs)
+        if row is None:
+            row = len(self.infosets)
+            if row == len(self.regrets):
+                self._grow()
+            self.infosets[obs] = row
+        return row
+
+    def _grow(self):
+        ''' Double the number of rows of the tables
+        '''
+        capacity = len(self.regrets)
+        self.policy = np.concatenate([self.policy, np.full((capacity, self.num_actions), 1.0 / self.num_actions)])
+        self.average_policy = np.concatenate([self.average_policy, np.zeros((capacity, self.num_actions))])
+        self.regrets = np.concatenate([self.regrets, np.zeros((capacity, self.num_actions))])
+
     def train(self):
         ''' Do one iteration of CFR
         '''
@@ -39,10 +103,26 @@ class CFRAgent():
             self.env.reset()
             probs = np.ones(self.env.num_players)
             self.traverse_tree(probs, player_id)
+            if self.variant == 'cfr+':
+                np.maximum(self.regrets, 0, out=self.regrets)
+            if self.alternating:
+                self.update_policy()
+
+        if self.variant in ('linear', 'discounted'):
+            self.discount()
 
         # Update policy
         self.update_policy()
 
+    def discount(self):
+        ''' Discount the regrets and the average policy at the end of an iteration
+        '''
+        t = self.iteration
+        num_infosets = len(self.infosets)
+        regrets = self.regrets[:num_infosets]
+        regrets *= np.where(regrets > 0, t ** self.alpha / (t ** self.alpha + 1), t ** self.beta / (t ** self.beta + 1))
+        self.average_policy[:num_infosets] *= (t / (t + 1)) ** self.gamma
+
     def traverse_tree(self, probs, player_id):
         ''' Traverse the game tree, update the regrets
 
@@ -58,23 +138,21 @@ class CFRAgent():
 
         current_player = self.env.get_player_id()
 
-        action_utilities = {}
-        state_utility = np.zeros(self.env.num_players)
         obs, legal_actions = self.get_state(current_player)
-        action_probs = self.action_probs(obs, legal_actions, self.policy)
+        row = self.infoset_id(obs)
+        action_probs = remove_illegal(self.policy[row], legal_actions)[legal_actions]
+        action_utilities = np.zeros((len(legal_actions), self.env.num_players))
 
-        for action in legal_actions:
-            action_prob = action_probs[action]
+        for i, action in enumerate(legal_actions):
             new_probs = probs.copy()
-            new_probs[current_player] *= action_prob
+            new_probs[current_player] *= action_probs[i]
 
             # Keep traversing the child state
             self.env.step(action)
-            utility = self.traverse_tree(new_probs, player_id)
+            action_utilities[i] = self.traverse_tree(new_probs, player_id)
             self.env.step_back()
 
-            state_utility += action_prob * utility
-            action_utilities[action] = utility
+        state_utility = action_probs @ action_utilities
 
         if not current_player == player_id:
             return state_utility
@@ -85,40 +163,32 @@ class CFRAgent():
                                 np.prod(probs[current_player + 1:]))
         player_state_utility = state_utility[current_player]
 
-        if obs not in self.regrets:
-            self.regrets[obs] = np.zeros(self.env.num_actions)
-        if obs not in self.average_policy:
-            self.average_policy[obs] = np.zeros(self.env.num_actions)
-        for action in legal_actions:
-            action_prob = action_probs[action]
-            regret = counterfactual_prob * (action_utilities[action][current_player]
-                    - player_state_utility)
-            self.regrets[obs][action] += regret
-            self.average_policy[obs][action] += self.iteration * player_prob * action_prob
+        self.regrets[row, legal_actions] += counterfactual_prob * (action_utilities[:, current_player]
+                - player_state_utility)
+        # the discounted variants weight the iterations through discount
+        weight = 1 if self.variant in ('linear', 'discounted') else self.iteration
+        self.average_policy[row, legal_actions] += weight * player_prob * action_probs
         return state_utility
 
     def update_policy(self):
         ''' Update policy based on the current regrets
         '''
-        for obs in self.regrets:
-            self.policy[obs] = self.regret_matching(obs)
+        num_infosets = len(self.infosets)
+        self.policy[:num_infosets] = self.regret_matching(self.regrets[:num_infosets])
 
-    def regret_matching(self, obs):
-        ''' Apply regret matching
+    def regret_matching(self, regrets):
+        ''' Apply regret matching to all the infosets at once
 
         Args:
-            obs (string): The state_str
-        '''
-        regret = self.regrets[obs]
-        positive_regret_sum = sum([r for r in regret if r > 0])
+            regrets (numpy.array): The regrets, one row per infoset
 
-        action_probs = np.zeros(self.env.num_actions)
-        if positive_regret_sum > 0:
-            for action in range(self.env.num_actions):
-                action_probs[action] = max(0.0, regret[action] / positive_regret_sum)
-        else:
-            for action in range(self.env.num_actions):
-                action_probs[action] = 1.0 / self.env.num_actions
+        Returns:
+            (numpy.array): The action probabilities, one row per infoset
+        '''
+        positive_regrets = np.maximum(regrets, 0)
+        positive_regret_sums = positive_regrets.sum(axis=1, keepdims=True)
+        action_probs = np.full(regrets.shape, 1.0 / self.num_actions)
+        np.divide(positive_regrets, positive_regret_sums, out=action_probs, where=positive_regret_sums > 0)
         return action_probs
 
     def action_probs(self, obs, legal_actions, policy):
@@ -127,19 +197,16 @@ class CFRAgent():
         Args:
             obs (str): state_str
             legal_actions (list): List of leagel actions
-            player_id (int): The current player
-            policy (dict): The used policy
+            policy (numpy.array): The used policy table
 
         Returns:
-            (tuple) that contains:
-                action_probs(numpy.array): The action probabilities
-                legal_actions (list): Indices of legal actions
+            action_probs(numpy.array): The action probabilities
         '''
-        if obs not in policy.keys():
-            action_probs = np.array([1.0/self.env.num_actions for _ in range(self.env.num_actions)])
-            self.policy[obs] = action_probs
+        row = self.infosets.get(obs)
+        if row is None:
+            action_probs = np.full(self.num_actions, 1.0 / self.num_actions)
         else:
-            action_probs = policy[obs]
+            action_probs = policy[row]
         action_probs = remove_illegal(action_probs, legal_actions)
         return action_probs
 
@@ -153,7 +220,7 @@ class CFRAgent():
             action (int): Predicted action
             info (dict): A dictionary containing information
         '''
-        probs = self.action_probs(state['obs'].tostring(), list(state['legal_actions'].keys()), self.average_policy)
+        probs = self.action_probs(state['obs'].tobytes(), list(state['legal_actions'].keys()), self.average_policy)
         action = np.random.choice(len(probs), p=probs)
 
         info = {}
@@ -173,7 +240,7 @@ class CFRAgent():
                 legal_actions (list): Indices of legal actions
         '''
         state = self.env.get_state(player_id)
-        return state['obs'].tostring(), list(state['legal_actions'].keys())
+        return state['obs'].tobytes(), list(state['legal_actions'].keys())
 
     def save(self):
         ''' Save model
@@ -181,16 +248,22 @@ class CFRAgent():
         if not os.path.exists(self.model_path):
             os.makedirs(self.model_path)
 
+        num_infosets = len(self.infosets)
+
+        infosets_file = open(os.path.join(self.model_path, 'infosets.pkl'),'wb')
+        pickle.dump(self.infosets, infosets_file)
+        infosets_file.close()
+
         policy_file = open(os.path.join(self.model_path, 'policy.pkl'),'wb')
-        pickle.dump(self.policy, policy_file)
+        pickle.dump(self.policy[:num_infosets], policy_file)
         policy_file.close()
 
         average_policy_file = open(os.path.join(self.model_path, 'average_policy.pkl'),'wb')
-        pickle.dump(self.average_policy, average_policy_file)
+        pickle.dump(self.average_policy[:num_infosets], average_policy_file)
         average_policy_file.close()
 
         regrets_file = open(os.path.join(self.model_path, 'regrets.pkl'),'wb')
-        pickle.dump(self.regrets, regrets_file)
+        pickle.dump(self.regrets[:num_infosets], regrets_file)
         regrets_file.close()
 
         iteration_file = open(os.path.join(self.model_path, 'iteration.pkl'),'wb')
@@ -198,24 +271,53 @@ class CFRAgent():
         iteration_file.close()
 
     def load(self):
-        ''' Load model
+        ''' Load model, either saved as tables or as the former dicts
+        state_str -> numpy.array
         '''
         if not os.path.exists(self.model_path):
             return
 
         policy_file = open(os.path.join(self.model_path, 'policy.pkl'),'rb')
-        self.policy = pickle.load(policy_file)
+        policy = pickle.load(policy_file)
         policy_file.close()
 
         average_policy_file = open(os.path.join(self.model_path, 'average_policy.pkl'),'rb')
-        self.average_policy = pickle.load(average_policy_file)
+        average_policy = pickle.load(average_policy_file)
         average_policy_file.close()
 
         regrets_file = open(os.path.join(self.model_path, 'regrets.pkl'),'rb')
-        self.regrets = pickle.load(regrets_file)
+        regrets = pickle.load(regrets_file)
         regrets_file.close()
 
         iteration_file = open(os.path.join(self.model_path, 'iteration.pkl'),'rb')
         self.iteration = pickle.load(iteration_file)
         iteration_file.close()
 
+        infosets_path = os.path.join(self.model_path, 'infosets.pkl')
+        if os.path.exists(infosets_path):
+            infosets_file = open(infosets_path,'rb')
+            self.infosets = pickle.load(infosets_file)
+            infosets_file.close()
+        else:
+            # the former dicts state_str -> action values
+            self.infosets = {obs: row for row, obs in enumerate(dict.fromkeys(
+                list(policy) + list(average_policy) + list(regrets)))}
+            policy, average_policy, regrets = [self._table_from_dict(values, fill_value)
+                for values, fill_value in [(policy, 1.0 / self.num_actions), (average_policy, 0.0), (regrets, 0.0)]]
+
+        # keep room for new infosets
+        capacity = max(2 * len(self.infosets), 1)
+        self.policy = np.full((capacity, self.num_actions), 1.0 / self.num_actions)
+        self.average_policy = np.zeros((capacity, self.num_actions))
+        self.regrets = np.zeros((capacity, self.num_actions))
+        self.policy[:len(policy)] = policy
+        self.average_policy[:len(average_policy)] = average_policy
+        self.regrets[:len(regrets)] = regrets
+
+    def _table_from_dict(self, values, fill_value):
+        ''' Convert a dict state_str -> action values to a table following the infoset index
+        '''
+        table = np.full((len(self.infosets), self.num_actions), fill_value)
+        for obs, value in values.items():
+            table[self.infosets[obs]] = value
+        return table
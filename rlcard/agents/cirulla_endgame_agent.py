@@ -0,0 +1,104 @@
+import numpy as np
+
+from rlcard.games.cirulla.solver import CirullaEndgameSolver, position_from_game, position_from_state
+
+
+class CirullaEndgameAgent(object):
+    ''' Cirulla agent playing the endgame perfectly with CirullaEndgameSolver.
+    Before the endgame it plays with a fallback agent, or randomly.
+
+    The solver only knows the default rules: in an env with one of the optional
+    rules (game_redeal, game_knock, game_last_taker) the agent plays with the
+    fallback agent all the game, and cannot be used without one.
+    '''
+
+    def __init__(self, max_deck_size=6, fallback_agent=None, solver=None, env=None):
+        ''' Initilize the agent
+
+        Args:
+            max_deck_size (int): Solve the positions with at most that many cards left in the deck
+            fallback_agent (object): Agent used before the endgame, random if None
+            solver (CirullaEndgameSolver): Solver to use, e.g. to share its transposition table
+            env (Env): The Cirulla env the agent plays in, to check its rules and to read
+                the position from its game when the states have no 'raw_obs' (raw_obs=False).
+                If None, only the knock actions among the legal actions reveal an optional rule
+        '''
+        self.use_raw = False
+        self.solver = solver if solver is not None else CirullaEndgameSolver(max_deck_size=max_deck_size)
+        self.fallback_agent = fallback_agent
+        self.env = env
+
+    def has_default_rules(self, state):
+        ''' Check that the solver knows the rules of the game of a state
+
+        Args:
+            state (dict): An dictionary that represents the current state
+
+        Returns:
+            (bool): False if an optional rule is enabled
+        '''
+        if self.env is not None:
+            game = self.env.game
+            if game.redeal or game.knock or game.last_taker:
+                return False
+        # the knock actions are the ids from 40
+        return max(self._legal_action_ids(state)) < 40
+
+    @staticmethod
+    def _legal_action_ids(state):
+        if 'legal_actions' in state:
+            return list(state['legal_actions'].keys())
+        return np.flatnonzero(state['legal_mask']).tolist()
+
+    def _position(self, state):
+        ''' The position of the player to move, from the raw state or the game of the env
+        '''
+        if 'raw_obs' in state:
+            return position_from_state(state['raw_obs'])
+        if self.env is None:
+            raise ValueError('CirullaEndgameAgent needs the raw states (raw_obs=True) or the env')
+        return position_from_game(self.env.game)
+
+    def step(self, state):
+        ''' Predict the action given the curent state in gerenerating training data.
+
+        Args:
+            state (dict): An dictionary that represents the current state, with 'raw_obs'
+
+        Returns:
+            action (int): The id of the card to play
+        '''
+        return self.eval_step(state)[0]
+
+    def eval_step(self, state):
+        ''' Predict the action given the current state for evaluation.
+
+        Args:
+            state (dict): An dictionary that represents the current state, with 'raw_obs'
+                unless the agent has the env
+
+        Returns:
+            action (int): The id of the card to play
+            info (dict): 'values' maps the legal cards to their exact values
+                when the position is solved
+
+        Raises:
+            ValueError: With an optional rule and no fallback agent, or without
+                'raw_obs' and no env
+        '''
+        if not self.has_default_rules(state):
+            if self.fallback_agent is None:
+                raise ValueError('CirullaEndgameAgent solves only the default rules, set a fallback agent')
+            return self.fallback_agent.eval_step(state)
+
+        position = self._position(state)
+        if not self.solver.can_solve(position):
+            if self.fallback_agent is not None:
+                return self.fallback_agent.eval_step(state)
+            return np.random.choice(self._legal_action_ids(state)), {}
+
+        action, action_values = self.solver.best_action_and_values(position)
+        cards = {card.card_id: card for card in state['raw_legal_actions']}
+        info = {}
+        info['values'] = {str(cards[card_id]): value for card_id, value in action_values.items()}
+        return action, info
@@ -18,6 +18,8 @@ import numpy as np
 import torch
 from torch import nn
 
+from .utils import device_name
+
 class DMCNet(nn.Module):
     def __init__(
         self,
@@ -42,6 +44,29 @@ class DMCNet(nn.Module):
         values = self.fc_layers(x).flatten()
         return values
 
+    def forward_actions(self, obs, actions):
+        ''' Values of several actions in one state, as forward on the observation
+        repeated for every action, but the observation goes through the first
+        layer once and is broadcast over the actions
+
+        Args:
+            obs (torch.Tensor): The observation of the state
+            actions (torch.Tensor): The features of the actions, one row per action
+
+        Returns:
+            (torch.Tensor): The value of each action
+        '''
+        obs = torch.flatten(obs)
+        actions = torch.flatten(actions, 1)
+        layers = iter(self.fc_layers)
+        first_layer = next(layers)
+        obs_dim = obs.shape[0]
+        bias = torch.addmv(first_layer.bias, first_layer.weight[:, :obs_dim], obs)
+        x = nn.functional.linear(actions, first_layer.weight[:, obs_dim:], bias)
+        for layer in layers:
+            x = layer(x)
+        return x.flatten()
+
 class DMCAgent:
     def __init__(
         self,
@@ -50,12 +75,25 @@ class DMCAgent:
         mlp_layers=[512,512,512,512,512],
         exp_epsilon=0.01,
         device="0",
+        action_features=None,
     ):
+        ''' Initialize the agent
+
+        Args:
+            action_features (numpy.array or torch.Tensor): The features of every
+                action, one row per action id, e.g. env.get_action_feature of
+                each id. If None, the features are taken from the legal actions
+                when they carry arrays, else one-hot
+        '''
         self.use_raw = False
-        self.device = 'cuda:'+device if device != "cpu" else "cpu"
+        self.device = device_name(device)
         self.net = DMCNet(state_shape, action_shape, mlp_layers).to(self.device)
         self.exp_epsilon = exp_epsilon
         self.action_shape = action_shape
+        if action_features is not None:
+            action_features = torch.as_tensor(action_features, dtype=torch.float32, device=self.device)
+        self.action_features = action_features
+        self.compiled_forward_actions = None
 
     def step(self, state):
         action_keys, values = self.predict(state)
@@ -81,33 +119,44 @@ class DMCAgent:
 
     def share_memory(self):
         self.net.share_memory()
+        if self.action_features is not None:
+            self.action_features.share_memory_()
 
     def eval(self):
         self.net.eval()
 
+    def compile(self):
+        ''' Compile the forward of predict with torch.compile. The number of
+        legal actions varies, so it is compiled for dynamic shapes. The first
+        calls are slow, compile the agents of an actor once it is started
+        '''
+        self.compiled_forward_actions = torch.compile(self.net.forward_actions, dynamic=True)
+
     def parameters(self):
         return self.net.parameters()
 
     def predict(self, state):
         # Prepare obs and actions
-        obs = state['obs'].astype(np.float32)
         legal_actions = state['legal_actions']
-        action_keys = np.array(list(legal_actions.keys()))
-        action_values = list(legal_actions.values())
-        # One-hot encoding if there is no action features
-        for i in range(len(action_values)):
-            if action_values[i] is None:
-                action_values[i] = np.zeros(self.action_shape[0])
-                action_values[i][action_keys[i]] = 1
-        action_values = np.array(action_values, dtype=np.float32)
+        action_keys = np.fromiter(legal_actions.keys(), dtype=np.int64, count=len(legal_actions))
+        obs = torch.from_numpy(state['obs']).to(self.device, torch.float32)
 
-        obs = np.repeat(obs[np.newaxis, :], len(action_keys), axis=0)
+        action_features = getattr(self, 'action_features', None)
+        if action_features is None and isinstance(next(iter(legal_actions.values())), np.ndarray):
+            # The features carried by the legal actions
+            actions = torch.from_numpy(np.stack(list(legal_actions.values()))).to(self.device, torch.float32)
+        else:
+            if action_features is None:
+                # One-hot encoding if there is no action features
+                action_features = self.action_features = torch.eye(self.action_shape[0], device=self.device)
+            actions = action_features[torch.from_numpy(action_keys).to(self.device)]
 
         # Predict Q values
-        values = self.net.forward(torch.from_numpy(obs).to(self.device),
-                                  torch.from_numpy(action_values).to(self.device))
+        forward_actions = getattr(self, 'compiled_forward_actions', None) or self.net.forward_actions
+        with torch.inference_mode():
+            values = forward_actions(obs, actions)
 
-        return action_keys, values.cpu().detach().numpy()
+        return action_keys, values.cpu().numpy()
 
     def forward(self, obs, actions):
         return self.net.forward(obs, actions)
@@ -120,6 +169,8 @@ class DMCAgent:
 
     def set_device(self, device):
         self.device = device
+        if getattr(self, 'action_features', None) is not None:
+            self.action_features = self.action_features.to(device)
 
 class DMCModel:
     def __init__(
@@ -128,9 +179,13 @@ class DMCModel:
         action_shape,
         mlp_layers=[512,512,512,512,512],
         exp_epsilon=0.01,
-        device=0
+        device=0,
+        action_features=None,
     ):
         self.agents = []
+        if action_features is not None:
+            # One table shared by the agents of all the players
+            action_features = torch.as_tensor(action_features, dtype=torch.float32, device=device_name(device))
         for player_id in range(len(state_shape)):
             agent = DMCAgent(
                 state_shape[player_id],
@@ -138,6 +193,7 @@ class DMCModel:
                 mlp_layers,
                 exp_epsilon,
                 device,
+                action_features,
             )
             self.agents.append(agent)
 
@@ -149,6 +205,10 @@ class DMCModel:
         for agent in self.agents:
             agent.eval()
 
+    def compile(self):
+        for agent in self.agents:
+            agent.compile()
+
     def parameters(self, index):
         return self.agents[index].parameters()
 
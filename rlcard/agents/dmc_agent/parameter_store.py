@@ -0,0 +1,116 @@
+import torch
+
+class ParameterStore:
+    ''' Versioned copy of the parameters of the agents of a DMC model in shared
+    memory, published by the learner and pulled by the actors between episodes
+
+    The parameters of every player are flattened into two slots. The learner
+    writes the slot the actors are not pointed at, then points them at it, so
+    publishing does not wait for the actors and the actors do not take a lock.
+    Each slot has a sequence number, odd while it is written: an actor that
+    sees it change while copying a slot (the learner published twice during
+    the copy) copies again. The version of a slot is the number of learner
+    steps of the player when it was published.
+    '''
+    def __init__(self, agents, num_actors, publish_interval=1):
+        ''' Allocate the slots and publish the current parameters of the agents
+
+        Args:
+            agents (list): The agents of the learner model
+            num_actors (int): The number of actors, which record the versions they use
+            publish_interval (int): The number of learner steps of a player between two publications
+        '''
+        self.publish_interval = publish_interval
+        num_players = len(agents)
+        self.slots = [torch.zeros(2, sum(param.numel() for param in agent.parameters())).share_memory_()
+                      for agent in agents]
+        self.sequences = torch.zeros(num_players, 2, dtype=torch.int64).share_memory_()
+        self.versions = torch.zeros(num_players, 2, dtype=torch.int64).share_memory_()
+        self.heads = torch.zeros(num_players, dtype=torch.int64).share_memory_()
+        self.learner_steps = torch.zeros(num_players, dtype=torch.int64).share_memory_()
+        self.actor_versions = torch.zeros(num_actors, num_players, dtype=torch.int64).share_memory_()
+        for position, agent in enumerate(agents):
+            self.publish(position, agent, 0)
+
+    def publish(self, position, agent, version):
+        ''' Write the parameters of an agent to the free slot of its player and
+        point the actors at it. The calls for a player must not run concurrently
+
+        Args:
+            position (int): The player of the agent
+            agent (DMCAgent): The agent of the learner
+            version (int): The version of the parameters
+        '''
+        slot = 1 - int(self.heads[position])
+        self.sequences[position, slot] += 1
+        offset = 0
+        with torch.no_grad():
+            for param in agent.parameters():
+                self.slots[position][slot, offset:offset + param.numel()].copy_(param.view(-1))
+                offset += param.numel()
+        self.versions[position, slot] = version
+        self.sequences[position, slot] += 1
+        self.heads[position] = slot
+
+    def step(self, position, agent):
+        ''' Count a learner step of a player, publishing its parameters every
+        publish_interval steps. Called under the lock of the player
+
+        Args:
+            position (int): The player
+            agent (DMCAgent): The agent of the learner, after the step
+        '''
+        self.learner_steps[position] += 1
+        steps = int(self.learner_steps[position])
+        if steps % self.publish_interval == 0:
+            self.publish(position, agent, steps)
+
+    def pull(self, actor_id, agents, versions=None):
+        ''' Copy the latest parameters into the agents of an actor, for the
+        players with a version newer than the one of the agent
+
+        Args:
+            actor_id (int): The index of the actor, its versions are recorded
+            agents (list): The agents of the actor
+            versions (list): The versions of the parameters of the agents, None to pull all
+
+        Returns:
+            (list): The versions of the parameters of the agents
+        '''
+        if versions is None:
+            versions = [None for _ in agents]
+        versions = [self._pull(position, agent, version)
+                    for position, (agent, version) in enumerate(zip(agents, versions))]
+        self.actor_versions[actor_id] = torch.tensor(versions)
+        return versions
+
+    def _pull(self, position, agent, version):
+        while True:
+            slot = int(self.heads[position])
+            sequence = int(self.sequences[position, slot])
+            if sequence % 2 == 1:
+                continue
+            latest = int(self.versions[position, slot])
+            if latest == version:
+                return version
+            offset = 0
+            with torch.no_grad():
+                for param in agent.parameters():
+                    param.copy_(self.slots[position][slot, offset:offset + param.numel()].view_as(param))
+                    offset += param.numel()
+            if int(self.sequences[position, slot]) == sequence:
+                return latest
+
+    def policy_lag(self, actor_ids=None):
+        ''' The number of learner steps between the parameters used by the
+        actors and the learner, per player
+
+        Args:
+            actor_ids (list): The actors to consider, all of them if None
+
+        Returns:
+            (tuple): The mean and the max lag of the actors, numpy arrays
+        '''
+        actor_versions = self.actor_versions if actor_ids is None else self.actor_versions[actor_ids]
+        lag = (self.learner_steps.unsqueeze(0) - actor_versions).float()
+        return lag.mean(0).numpy(), lag.max(0).values.numpy()
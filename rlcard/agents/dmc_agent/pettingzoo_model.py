@@ -46,6 +46,10 @@ class DMCModelPettingZoo:
         for agent in self.agents.values():
             agent.eval()
 
+    def compile(self):
+        for agent in self.agents.values():
+            agent.compile()
+
     def parameters(self, index):
         return list(self.agents.values())[index].parameters()
 
@@ -1,9 +1,11 @@
+import copy
 import traceback
 
 import numpy as np
 import torch
 
-from .utils import log
+from .telemetry import QueueMeter
+from .utils import log, device_name
 from rlcard.utils import run_game_pettingzoo
 
 def create_buffers_pettingzoo(
@@ -27,10 +29,7 @@ def create_buffers_pettingzoo(
             _buffers = {key: [] for key in specs}
             for _ in range(num_buffers):
                 for key in _buffers:
-                    if device == "cpu":
-                        _buffer = torch.empty(**specs[key]).to('cpu').share_memory_()
-                    else:
-                        _buffer = torch.empty(**specs[key]).to('cuda:'+str(device)).share_memory_()
+                    _buffer = torch.empty(**specs[key]).to(device_name(device)).share_memory_()
                     _buffers[key].append(_buffer)
             buffers[device].append(_buffers)
     return buffers
@@ -48,10 +47,25 @@ def act_pettingzoo(
     full_queue,
     model,
     buffers,
-    env
+    env,
+    parameter_store=None,
+    actor_id=0,
+    telemetry=None,
+    num_threads=None,
+    compile_model=False
 ):
     log.info('Device %s Actor %i started.', str(device), i)
     try:
+        if num_threads is not None:
+            torch.set_num_threads(num_threads)
+
+        if parameter_store is not None:
+            # Own weights, pulled from the store between episodes
+            model = copy.deepcopy(model)
+            versions = parameter_store.pull(actor_id, model.get_agents())
+        if compile_model:
+            model.compile()
+
         done_buf = [[] for _ in range(env.num_agents)]
         episode_return_buf = [[] for _ in range(env.num_agents)]
         target_buf = [[] for _ in range(env.num_agents)]
@@ -59,7 +73,14 @@ def act_pettingzoo(
         action_buf = [[] for _ in range(env.num_agents)]
         size = [0 for _ in range(env.num_agents)]
 
-        while True:
+        if telemetry is not None:
+            # Count the buffers filled and the waits for free ones
+            free_queue = [QueueMeter(queue) for queue in free_queue]
+            full_queue = [QueueMeter(queue) for queue in full_queue]
+
+        while telemetry is None or telemetry.running[actor_id]:
+            if parameter_store is not None:
+                versions = parameter_store.pull(actor_id, model.get_agents(), versions)
             trajectories = run_game_pettingzoo(env, model.agents, is_training=True)
             for agent_id, agent_name in enumerate(env.possible_agents):
                 traj_size = len(trajectories[agent_name]) // 2
@@ -98,6 +119,9 @@ def act_pettingzoo(
                     state_buf[agent_id] = state_buf[agent_id][T:]
                     action_buf[agent_id] = action_buf[agent_id][T:]
                     size[agent_id] -= T
+            if telemetry is not None:
+                telemetry.record(actor_id, free_queue, full_queue)
+        log.info('Device %s Actor %i retired.', str(device), actor_id)
 
     except KeyboardInterrupt:
         pass
@@ -0,0 +1,109 @@
+import timeit
+
+import torch
+
+class QueueMeter:
+    ''' Wrap a queue, counting the items put and the time spent waiting in get
+    '''
+    def __init__(self, queue):
+        self.queue = queue
+        self.reset()
+
+    def reset(self):
+        self.num_puts = 0
+        self.num_gets = 0
+        self.wait_time = 0.0
+
+    def get(self):
+        start = timeit.default_timer()
+        item = self.queue.get()
+        self.wait_time += timeit.default_timer() - start
+        self.num_gets += 1
+        return item
+
+    def put(self, item):
+        self.queue.put(item)
+        self.num_puts += 1
+
+class Telemetry:
+    ''' Counters of the DMC actors in shared memory, read by the trainer
+
+    Every actor owns a slot, the device index times max_actors plus its index
+    on the device, and is the only writer of its counters: the episodes
+    played, the buffers filled for each player and the seconds spent waiting
+    for a free buffer. The counters only grow, an actor started in the slot of
+    a retired one adds to them. The trainer clears the running flag of a slot
+    to retire its actor, which stops after its current episode.
+    '''
+    def __init__(self, num_devices, max_actors, num_players):
+        ''' Allocate the counters
+
+        Args:
+            num_devices (int): The number of actor devices
+            max_actors (int): The maximum number of actors per device
+            num_players (int): The number of players
+        '''
+        self.max_actors = max_actors
+        num_slots = num_devices * max_actors
+        self.episodes = torch.zeros(num_slots, dtype=torch.int64).share_memory_()
+        self.buffers = torch.zeros(num_slots, num_players, dtype=torch.int64).share_memory_()
+        self.wait_time = torch.zeros(num_slots, dtype=torch.float64).share_memory_()
+        self.running = torch.zeros(num_slots, dtype=torch.bool).share_memory_()
+
+    def slot(self, device_index, i):
+        ''' The slot of the actor i of a device
+        '''
+        return device_index * self.max_actors + i
+
+    def record(self, actor_id, free_queue, full_queue):
+        ''' Count an episode of an actor with what its queue meters measured
+        since the previous one, and reset the meters. Called between episodes
+
+        Args:
+            actor_id (int): The slot of the actor
+            free_queue (list): The meters of the free queues of the players
+            full_queue (list): The meters of the full queues of the players
+        '''
+        self.episodes[actor_id] += 1
+        self.buffers[actor_id] += torch.tensor([queue.num_puts for queue in full_queue])
+        self.wait_time[actor_id] += sum(queue.wait_time for queue in free_queue)
+        for queue in free_queue + full_queue:
+            queue.reset()
+
+    def snapshot(self):
+        ''' A copy of the counters, to compute rates over an interval
+
+        Returns:
+            (dict): The episodes, buffers and wait times of all the slots
+        '''
+        return {
+            'episodes': self.episodes.clone(),
+            'buffers': self.buffers.clone(),
+            'wait_time': self.wait_time.clone(),
+        }
+
+def autoscale_decision(learner_wait, actor_wait, num_actors, min_actors, max_actors,
+                       learner_threshold=0.1, actor_threshold=0.5):
+    ''' Decide whether to add or retire an actor of a device
+
+    The learner is starved when it waits for full buffers, more actors are
+    needed. The actors outrun the learner when they wait for free buffers, an
+    actor can be retired to give its CPU to the learner threads.
+
+    Args:
+        learner_wait (float): The largest fraction of time a player of the learner waited for full buffers
+        actor_wait (float): The mean fraction of time the actors waited for free buffers
+        num_actors (int): The number of running actors
+        min_actors (int): The minimum number of actors
+        max_actors (int): The maximum number of actors
+        learner_threshold (float): The learner wait above which an actor is added
+        actor_threshold (float): The actor wait above which an actor is retired
+
+    Returns:
+        (int): 1 to add an actor, -1 to retire one, 0 to keep them
+    '''
+    if learner_wait > learner_threshold and num_actors < max_actors:
+        return 1
+    if learner_wait <= learner_threshold and actor_wait > actor_threshold and num_actors > min_actors:
+        return -1
+    return 0
@@ -20,18 +20,22 @@ import timeit
 import pprint
 from collections import deque
 
+import numpy as np
 import torch
 from torch import multiprocessing as mp
 from torch import nn
 
 from .file_writer import FileWriter
 from .model import DMCModel
+from .parameter_store import ParameterStore
+from .telemetry import QueueMeter, Telemetry, autoscale_decision
 from .pettingzoo_model import DMCModelPettingZoo
 from .utils import (
     get_batch,
     create_buffers,
     create_optimizers,
     act,
+    device_name,
     log,
 )
 from .pettingzoo_utils import (
@@ -45,7 +49,7 @@ def compute_loss(logits, targets):
 
 def learn(
     position,
-    actor_models,
+    parameter_store,
     agent,
     batch,
     optimizer,
@@ -55,7 +59,7 @@ def learn(
     lock
 ):
     """Performs a learning (optimization) step."""
-    device = "cuda:"+str(training_device) if training_device != "cpu" else "cpu"
+    device = device_name(training_device)
     state = torch.flatten(batch['state'].to(device), 0, 1).float()
     action = torch.flatten(batch['action'].to(device), 0, 1).float()
     target = torch.flatten(batch['target'].to(device), 0, 1)
@@ -75,8 +79,7 @@ def learn(
         nn.utils.clip_grad_norm_(agent.parameters(), max_grad_norm)
         optimizer.step()
 
-        for actor_model in actor_models.values():
-            actor_model.get_agent(position).load_state_dict(agent.state_dict())
+        parameter_store.step(position, agent)
         return stats
 
 
@@ -104,6 +107,17 @@ class DMCTrainer:
         alpha (float): RMSProp smoothing constant
         momentum (float): RMSProp momentum
         epsilon (float): RMSProp epsilon
+        publish_interval (int): Learner steps of a player between two publications of its weights to the actors
+        autoscale (boolean): Whether to add actors while the learner waits for
+            full buffers and retire them while the actors wait for free buffers
+        min_actors (int): The minimum number of actors per device with autoscale
+        max_actors (int): The maximum number of actors per device with autoscale,
+            the number of CPUs if None
+        actor_threads (int): The intra-op threads of an actor process, None for the torch default
+        learner_threads (int): The intra-op threads of the learner. If None, on CPU the
+            CPUs left by the running actors, recomputed when autoscale adds or
+            retires one, on GPU the torch default
+        compile (boolean): Whether the actors compile their networks with torch.compile
     """
     def __init__(
         self,
@@ -127,7 +141,14 @@ class DMCTrainer:
         learning_rate=0.0001,
         alpha=0.99,
         momentum=0,
-        epsilon=0.00001
+        epsilon=0.00001,
+        publish_interval=1,
+        autoscale=False,
+        min_actors=1,
+        max_actors=None,
+        actor_threads=1,
+        learner_threads=None,
+        compile=False
     ):
         self.env = env
 
@@ -158,6 +179,13 @@ class DMCTrainer:
         self.alpha = alpha
         self.momentum = momentum
         self.epsilon = epsilon
+        self.publish_interval = publish_interval
+        self.autoscale = autoscale
+        self.min_actors = min_actors
+        self.max_actors = max(max_actors or os.cpu_count(), num_actors) if autoscale else num_actors
+        self.actor_threads = actor_threads
+        self.learner_threads = learner_threads
+        self.compile = compile
 
         self.is_pettingzoo_env = is_pettingzoo_env
         if not self.is_pettingzoo_env:
@@ -165,6 +193,9 @@ class DMCTrainer:
             self.action_shape = self.env.action_shape
             if self.action_shape[0] == None:  # One-hot encoding
                 self.action_shape = [[self.env.num_actions] for _ in range(self.num_players)]
+            # The features of every action id, looked up by the actors
+            self.action_features = np.stack([self.env.get_action_feature(action_id)
+                                             for action_id in range(self.env.num_actions)])
 
             def model_func(device):
                 return DMCModel(
@@ -172,6 +203,7 @@ class DMCTrainer:
                     self.action_shape,
                     exp_epsilon=self.exp_epsilon,
                     device=str(device),
+                    action_features=self.action_features,
                 )
         else:
             self.num_players = self.env.num_agents
@@ -192,7 +224,48 @@ class DMCTrainer:
         else:
             self.device_iterator = range(num_actor_devices)
 
+    def _telemetry_stats(self, stats, telemetry, learner_full_queue, start_actors, start_learner, running, elapsed):
+        """Write the rates of the actors and of the learner over an interval to the stats.
+
+        The queue waits are fractions of the interval: the learner waits for full
+        buffers when the actors are too slow, the actors wait for free buffers
+        when the learner is. The occupancy is the fraction of the buffers that
+        are full and not yet read by the learner.
+        """
+        episodes = telemetry.episodes - start_actors['episodes']
+        wait_time = telemetry.wait_time - start_actors['wait_time']
+        stats['num_actors'] = len(running)
+        stats['actor_episodes_per_sec'] = float(episodes.sum()) / elapsed
+        stats['actor_queue_wait'] = float(wait_time[running].mean()) / elapsed if running else 0.0
+        for p in range(self.num_players):
+            batches, wait, occupancy = 0, 0.0, 0.0
+            for device_index, device in enumerate(self.device_iterator):
+                queue = learner_full_queue[device][p]
+                batches += (queue.num_gets - start_learner[device][p][0]) / self.B
+                wait += (queue.wait_time - start_learner[device][p][1]) / elapsed
+                slots = slice(telemetry.slot(device_index, 0), telemetry.slot(device_index + 1, 0))
+                # the actors count a buffer after their episode, it may already be read
+                occupancy += max(int(telemetry.buffers[slots, p].sum()) - queue.num_gets, 0) / self.num_buffers
+            stats['learner_batches_per_sec_'+str(p)] = batches / elapsed
+            stats['learner_queue_wait_'+str(p)] = wait / len(self.device_iterator)
+            stats['buffer_occupancy_'+str(p)] = occupancy / len(self.device_iterator)
+
+    def _learner_num_threads(self, num_running_actors):
+        """The intra-op threads of the learner with that many running actors, None for the torch default."""
+        if self.learner_threads is not None:
+            return self.learner_threads
+        if self.training_device == "cpu":
+            # Leave the CPUs of the actors to them
+            return max(1, os.cpu_count() - num_running_actors * (self.actor_threads or 1))
+        return None
+
     def start(self):
+        # The learner threads set it again themselves, with OpenMP
+        # torch.set_num_threads only applies to the calling thread
+        learner_threads = self._learner_num_threads(len(self.device_iterator) * self.num_actors)
+        if learner_threads is not None:
+            torch.set_num_threads(learner_threads)
+
         # Initialize actor models
         models = {}
         for device in self.device_iterator:
@@ -219,7 +292,6 @@ class DMCTrainer:
             )
 
         # Initialize queues
-        actor_processes = []
         ctx = mp.get_context('spawn')
         free_queue = {}
         full_queue = {}
@@ -247,48 +319,90 @@ class DMCTrainer:
         for p in range(self.num_players):
             stat_keys.append('mean_episode_return_'+str(p))
             stat_keys.append('loss_'+str(p))
+            stat_keys.append('learner_steps_per_sec_'+str(p))
+            stat_keys.append('mean_policy_lag_'+str(p))
+            stat_keys.append('max_policy_lag_'+str(p))
+            stat_keys.append('learner_batches_per_sec_'+str(p))
+            stat_keys.append('learner_queue_wait_'+str(p))
+            stat_keys.append('buffer_occupancy_'+str(p))
+        stat_keys += ['num_actors', 'actor_episodes_per_sec', 'actor_queue_wait']
         frames, stats = 0, {k: 0 for k in stat_keys}
 
         # Load models if any
         if self.load_model and os.path.exists(self.checkpointpath):
             checkpoint_states = torch.load(
                     self.checkpointpath,
-                    map_location="cuda:"+str(self.training_device) if self.training_device != "cpu" else "cpu"
+                    map_location=device_name(self.training_device)
             )
             for p in range(self.num_players):
                 learner_model.get_agent(p).load_state_dict(checkpoint_states["model_state_dict"][p])
                 optimizers[p].load_state_dict(checkpoint_states["optimizer_state_dict"][p])
                 for device in self.device_iterator:
                     models[device].get_agent(p).load_state_dict(learner_model.get_agent(p).state_dict())
-            stats = checkpoint_states["stats"]
+            stats.update(checkpoint_states["stats"])
             frames = checkpoint_states["frames"]
             log.info(f"Resuming preempted job, current stats:\n{stats}")
 
+        # The weights published by the learner, pulled by the actors between episodes
+        parameter_store = ParameterStore(
+            learner_model.get_agents(),
+            len(self.device_iterator) * self.max_actors,
+            self.publish_interval,
+        )
+
+        # Counters of the actors and meters of the queues the learner reads
+        telemetry = Telemetry(len(self.device_iterator), self.max_actors, self.num_players)
+        learner_full_queue = {device: [QueueMeter(queue) for queue in full_queue[device]]
+                              for device in self.device_iterator}
+
+        # The actor processes of each device, by slot
+        actor_processes = [[None for _ in range(self.max_actors)] for _ in self.device_iterator]
+
+        def start_actor(device_index):
+            """Start an actor in the first free slot of a device."""
+            device = self.device_iterator[device_index]
+            for i, actor in enumerate(actor_processes[device_index]):
+                if actor is None or not actor.is_alive():
+                    break
+            else:
+                return
+            slot = telemetry.slot(device_index, i)
+            telemetry.running[slot] = True
+            actor = ctx.Process(
+                target=act_pettingzoo if self.is_pettingzoo_env else act,
+                args=(i, device, self.T, free_queue[device], full_queue[device], models[device], buffers[device], self.env,
+                      parameter_store, slot, telemetry, self.actor_threads, self.compile))
+            actor.start()
+            actor_processes[device_index][i] = actor
+
+        def running_actors(device_index):
+            """The slots of the running actors of a device, in start order of the slots."""
+            return [telemetry.slot(device_index, i) for i in range(self.max_actors)
+                    if telemetry.running[telemetry.slot(device_index, i)]]
 
         # Starting actor processes
-        for device in self.device_iterator:
-            num_actors = self.num_actors
-            for i in range(self.num_actors):
-                actor = ctx.Process(
-                    target=act_pettingzoo if self.is_pettingzoo_env else act,
-                    args=(i, device, self.T, free_queue[device], full_queue[device], models[device], buffers[device], self.env))
-                actor.start()
-                actor_processes.append(actor)
+        for device_index in range(len(self.device_iterator)):
+            for _ in range(self.num_actors):
+                start_actor(device_index)
 
         def batch_and_learn(i, device, position, local_lock, position_lock, lock=threading.Lock()):
             """Thread target for the learning process."""
             nonlocal frames, stats
+            num_threads = None
             while frames < self.total_frames:
+                if learner_threads != num_threads:
+                    num_threads = learner_threads
+                    torch.set_num_threads(num_threads)
                 batch = get_batch(
                     free_queue[device][position],
-                    full_queue[device][position],
+                    learner_full_queue[device][position],
                     buffers[device][position],
                     self.B,
                     local_lock
                 )
                 _stats = learn(
                     position,
-                    models,
+                    parameter_store,
                     learner_model.get_agent(position),
                     batch,
                     optimizers[position],
@@ -355,6 +469,10 @@ class DMCTrainer:
             last_checkpoint_time = timer() - self.save_interval * 60
             while frames < self.total_frames:
                 start_frames = frames
+                start_steps = parameter_store.learner_steps.clone()
+                start_actors = telemetry.snapshot()
+                start_learner = {device: [(queue.num_gets, queue.wait_time) for queue in learner_full_queue[device]]
+                                 for device in self.device_iterator}
                 start_time = timer()
                 time.sleep(5)
 
@@ -364,6 +482,37 @@ class DMCTrainer:
 
                 end_time = timer()
                 fps = (frames - start_frames) / (end_time - start_time)
+                steps_per_sec = (parameter_store.learner_steps - start_steps).numpy() / (end_time - start_time)
+                running = [slot for device_index in range(len(self.device_iterator))
+                           for slot in running_actors(device_index)]
+                mean_lag, max_lag = parameter_store.policy_lag(running)
+                for p in range(self.num_players):
+                    stats['learner_steps_per_sec_'+str(p)] = float(steps_per_sec[p])
+                    stats['mean_policy_lag_'+str(p)] = float(mean_lag[p])
+                    stats['max_policy_lag_'+str(p)] = float(max_lag[p])
+                self._telemetry_stats(stats, telemetry, learner_full_queue, start_actors, start_learner,
+                                      running, end_time - start_time)
+
+                if self.autoscale:
+                    for device_index, device in enumerate(self.device_iterator):
+                        slots = running_actors(device_index)
+                        learner_wait = max((queue.wait_time - wait) / (end_time - start_time) for queue, (_, wait)
+                                           in zip(learner_full_queue[device], start_learner[device]))
+                        actor_wait = float((telemetry.wait_time[slots] - start_actors['wait_time'][slots]).mean()) \
+                            / (end_time - start_time) if slots else 0.0
+                        decision = autoscale_decision(learner_wait, actor_wait, len(slots),
+                                                      self.min_actors, self.max_actors)
+                        if decision > 0:
+                            log.info('Device %s: learner waits %.2f, adding an actor', str(device), learner_wait)
+                            start_actor(device_index)
+                        elif decision < 0:
+                            log.info('Device %s: actors wait %.2f, retiring an actor', str(device), actor_wait)
+                            telemetry.running[slots[-1]] = False
+                    num_running = sum(len(running_actors(device_index))
+                                      for device_index in range(len(self.device_iterator)))
+                    if self._learner_num_threads(num_running) != learner_threads:
+                        learner_threads = self._learner_num_threads(num_running)
+                        log.info('Learner threads: %d', learner_threads)
                 log.info(
                     'After %i frames: @ %.1f fps Stats:\n%s',
                     frames,
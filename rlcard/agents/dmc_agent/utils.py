@@ -13,12 +13,15 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import copy
 import logging
 import traceback
 
 import numpy as np
 import torch
 
+from .telemetry import QueueMeter
+
 shandle = logging.StreamHandler()
 shandle.setFormatter(
     logging.Formatter(
@@ -29,6 +32,20 @@ log.propagate = False
 log.addHandler(shandle)
 log.setLevel(logging.INFO)
 
+def device_name(device):
+    ''' The torch device of a DMC device
+
+    Args:
+        device (str or int): 'cpu', a torch device name, or the index of a GPU
+
+    Returns:
+        (str): The torch device name, 'cpu' or 'cuda:<index>'
+    '''
+    device = str(device)
+    if device == 'cpu' or device.startswith('cuda'):
+        return device
+    return 'cuda:' + device
+
 def get_batch(
     free_queue,
     full_queue,
@@ -67,10 +84,7 @@ def create_buffers(
             _buffers = {key: [] for key in specs}
             for _ in range(num_buffers):
                 for key in _buffers:
-                    if device == "cpu":
-                        _buffer = torch.empty(**specs[key]).to('cpu').share_memory_()
-                    else:
-                        _buffer = torch.empty(**specs[key]).to('cuda:'+str(device)).share_memory_()
+                    _buffer = torch.empty(**specs[key]).to(device_name(device)).share_memory_()
                     _buffers[key].append(_buffer)
             buffers[device].append(_buffers)
     return buffers
@@ -94,6 +108,91 @@ def create_optimizers(
         optimizers.append(optimizer)
     return optimizers
 
+def create_staging(buffers, capacity):
+    ''' Create the staging arrays of a player, numpy arrays with the keys, the
+    per-timestep shapes and the dtypes of its shared buffers, where an actor
+    writes its episodes before they are copied to the buffers T at a time
+
+    Args:
+        buffers (dict): The shared buffers of the player, lists of (T, ...) tensors
+        capacity (int): The initial number of timesteps
+
+    Returns:
+        (dict): The staging arrays of the player
+    '''
+    return {
+        key: np.zeros((capacity,) + tuple(buffers[key][0].shape[1:]),
+                      dtype=torch.empty((), dtype=buffers[key][0].dtype).numpy().dtype)
+        for key in buffers
+    }
+
+def stage_episode(staging, size, trajectory, payoff, action_features):
+    ''' Write the transitions of a player in an episode after the first size
+    timesteps of its staging arrays, growing them if needed
+
+    Args:
+        staging (dict): The staging arrays of the player
+        size (int): The number of timesteps already staged
+        trajectory (list): The trajectory of the player, states and action ids
+        payoff (float): The payoff of the player
+        action_features (numpy.array): The features of every action id
+
+    Returns:
+        (tuple): The staging arrays, possibly reallocated, and the new size
+    '''
+    num_steps = len(trajectory) // 2
+    if num_steps == 0:
+        return staging, size
+    end = size + num_steps
+    capacity = len(staging['target'])
+    if end > capacity:
+        while end > capacity:
+            capacity *= 2
+        grown = {}
+        for key, array in staging.items():
+            grown[key] = np.zeros((capacity,) + array.shape[1:], dtype=array.dtype)
+            grown[key][:size] = array[:size]
+        staging = grown
+
+    staging['state'][size:end] = np.stack([trajectory[i]['obs'] for i in range(0, 2 * num_steps, 2)])
+    staging['action'][size:end] = action_features[trajectory[1:2 * num_steps:2]]
+    staging['done'][size:end] = False
+    staging['done'][end - 1] = True
+    staging['episode_return'][size:end] = 0.0
+    staging['episode_return'][end - 1] = payoff
+    staging['target'][size:end] = payoff
+    return staging, end
+
+def flush_staging(staging, size, T, free_queue, full_queue, buffers):
+    ''' Copy the staged timesteps to free shared buffers, one T-length slice per
+    buffer and key, while more than T timesteps are staged, then move the rest
+    to the front of the staging arrays
+
+    Args:
+        staging (dict): The staging arrays of the player
+        size (int): The number of timesteps staged
+        T (int): The unroll length of a buffer
+        free_queue (Queue): The indices of the free buffers of the player
+        full_queue (Queue): The indices of the filled buffers of the player
+        buffers (dict): The shared buffers of the player
+
+    Returns:
+        (int): The number of timesteps left in the staging arrays
+    '''
+    start = 0
+    while size - start > T:
+        index = free_queue.get()
+        if index is None:
+            break
+        for key in staging:
+            buffers[key][index].copy_(torch.from_numpy(staging[key][start:start + T]))
+        full_queue.put(index)
+        start += T
+    if start > 0:
+        for array in staging.values():
+            array[:size - start] = array[start:size]
+    return size - start
+
 def act(
     i,
     device,
@@ -102,57 +201,50 @@ def act(
     full_queue,
     model,
     buffers,
-    env
+    env,
+    parameter_store=None,
+    actor_id=0,
+    telemetry=None,
+    num_threads=None,
+    compile_model=False
 ):
     try:
         log.info('Device %s Actor %i started.', str(device), i)
+        if num_threads is not None:
+            # The intra-op threads of this process, one avoids oversubscribing the CPUs with many actors
+            torch.set_num_threads(num_threads)
+
+        if parameter_store is not None:
+            # Own weights, pulled from the store between episodes
+            model = copy.deepcopy(model)
+            versions = parameter_store.pull(actor_id, model.get_agents())
+        if compile_model:
+            model.compile()
 
         # Configure environment
         env.seed(i)
         env.set_agents(model.get_agents())
 
-        done_buf = [[] for _ in range(env.num_players)]
-        episode_return_buf = [[] for _ in range(env.num_players)]
-        target_buf = [[] for _ in range(env.num_players)]
-        state_buf = [[] for _ in range(env.num_players)]
-        action_buf = [[] for _ in range(env.num_players)]
+        # The features of every action id, to look up the actions of an episode at once
+        action_features = np.stack([env.get_action_feature(action_id) for action_id in range(env.num_actions)])
+        staging = [create_staging(buffers[p], 2 * T) for p in range(env.num_players)]
         size = [0 for _ in range(env.num_players)]
 
-        while True:
+        if telemetry is not None:
+            # Count the buffers filled and the waits for free ones
+            free_queue = [QueueMeter(queue) for queue in free_queue]
+            full_queue = [QueueMeter(queue) for queue in full_queue]
+
+        while telemetry is None or telemetry.running[actor_id]:
+            if parameter_store is not None:
+                versions = parameter_store.pull(actor_id, model.get_agents(), versions)
             trajectories, payoffs = env.run(is_training=True)
             for p in range(env.num_players):
-                size[p] += len(trajectories[p][:-1]) // 2
-                diff = size[p] - len(target_buf[p])
-                if diff > 0:
-                    done_buf[p].extend([False for _ in range(diff-1)])
-                    done_buf[p].append(True)
-                    episode_return_buf[p].extend([0.0 for _ in range(diff-1)])
-                    episode_return_buf[p].append(float(payoffs[p]))
-                    target_buf[p].extend([float(payoffs[p]) for _ in range(diff)])
-                    # State and action
-                    for i in range(0, len(trajectories[p])-2, 2):
-                        state = trajectories[p][i]['obs']
-                        action = env.get_action_feature(trajectories[p][i+1])
-                        state_buf[p].append(torch.from_numpy(state))
-                        action_buf[p].append(torch.from_numpy(action))
-                
-                while size[p] > T:
-                    index = free_queue[p].get()
-                    if index is None:
-                        break
-                    for t in range(T):
-                        buffers[p]['done'][index][t, ...] = done_buf[p][t]
-                        buffers[p]['episode_return'][index][t, ...] = episode_return_buf[p][t]
-                        buffers[p]['target'][index][t, ...] = target_buf[p][t]
-                        buffers[p]['state'][index][t, ...] = state_buf[p][t]
-                        buffers[p]['action'][index][t, ...] = action_buf[p][t]
-                    full_queue[p].put(index)
-                    done_buf[p] = done_buf[p][T:]
-                    episode_return_buf[p] = episode_return_buf[p][T:]
-                    target_buf[p] = target_buf[p][T:]
-                    state_buf[p] = state_buf[p][T:]
-                    action_buf[p] = action_buf[p][T:]
-                    size[p] -= T
+                staging[p], size[p] = stage_episode(staging[p], size[p], trajectories[p], float(payoffs[p]), action_features)
+                size[p] = flush_staging(staging[p], size[p], T, free_queue[p], full_queue[p], buffers[p])
+            if telemetry is not None:
+                telemetry.record(actor_id, free_queue, full_queue)
+        log.info('Device %s Actor %i retired.', str(device), actor_id)
 
     except KeyboardInterrupt:
         pass
@@ -59,7 +59,11 @@ class DQNAgent(object):
                  learning_rate=0.00005,
                  device=None,
                  save_path=None,
-                 save_every=float('inf'),):
+                 save_every=float('inf'),
+                 prioritized_replay=False,
+                 prioritized_replay_alpha=0.6,
+                 prioritized_replay_beta=0.4,
+                 prioritized_replay_eps=1e-6,):
 
         '''
         Q-Learning algorithm for off-policy TD control using Function Approximation.
@@ -86,6 +90,13 @@ class DQNAgent(object):
             device (torch.device): whether to use the cpu or gpu
             save_path (str): The path to save the model checkpoints
             save_every (int): Save the model every X training steps
+            prioritized_replay (boolean): Sample the transitions with probabilities
+              proportional to their last TD error (Schaul et al. 2016) instead of uniformly
+            prioritized_replay_alpha (float): How much prioritization is used, 0 is uniform
+            prioritized_replay_beta (float): How much the importance-sampling weights
+              correct the bias of the prioritized sampling, 1 is fully
+            prioritized_replay_eps (float): Added to the TD errors so that every
+              transition keeps a chance to be sampled
         '''
         self.use_raw = False
         self.replay_memory_init_size = replay_memory_init_size
@@ -118,7 +129,11 @@ class DQNAgent(object):
             mlp_layers=mlp_layers, device=self.device)
 
         # Create replay memory
-        self.memory = Memory(replay_memory_size, batch_size)
+        if prioritized_replay:
+            self.memory = PrioritizedMemory(replay_memory_size, batch_size, num_actions, alpha=prioritized_replay_alpha,
+                                            beta=prioritized_replay_beta, eps=prioritized_replay_eps)
+        else:
+            self.memory = Memory(replay_memory_size, batch_size, num_actions)
         
         # Checkpoint saving parameters
         self.save_path = save_path
@@ -133,7 +148,7 @@ class DQNAgent(object):
             ts (list): a list of 5 elements that represent the transition
         '''
         (state, action, reward, next_state, done) = tuple(ts)
-        self.feed_memory(state['obs'], action, reward, next_state['obs'], list(next_state['legal_actions'].keys()), done)
+        self.feed_memory(state['obs'], action, reward, next_state['obs'], self.legal_mask(next_state), done)
         self.total_t += 1
         tmp = self.total_t - self.replay_memory_init_size
         if tmp>=0 and tmp%self.train_every == 0:
@@ -151,7 +166,7 @@ class DQNAgent(object):
         '''
         q_values = self.predict(state)
         epsilon = self.epsilons[min(self.total_t, self.epsilon_decay_steps-1)]
-        legal_actions = list(state['legal_actions'].keys())
+        legal_actions = self.legal_action_ids(state)
         probs = np.ones(len(legal_actions), dtype=float) * epsilon / len(legal_actions)
         best_action_idx = legal_actions.index(np.argmax(q_values))
         probs[best_action_idx] += (1.0 - epsilon)
@@ -173,10 +188,34 @@ class DQNAgent(object):
         best_action = np.argmax(q_values)
 
         info = {}
-        info['values'] = {state['raw_legal_actions'][i]: float(q_values[list(state['legal_actions'].keys())[i]]) for i in range(len(state['legal_actions']))}
+        if 'legal_actions' in state:
+            info['values'] = {state['raw_legal_actions'][i]: float(q_values[list(state['legal_actions'].keys())[i]]) for i in range(len(state['legal_actions']))}
+        else:
+            info['values'] = {action_id: float(q_values[action_id]) for action_id in self.legal_action_ids(state)}
 
         return best_action, info
 
+    def batch_step(self, obs, legal_masks, is_training=False):
+        ''' Predict the actions of a batch of states with one forward pass,
+            see rlcard.utils.run_batched
+
+        Args:
+            obs (numpy.array): The stacked observations, (batch, *state_shape)
+            legal_masks (numpy.array): Boolean masks of the legal actions, (batch, num_actions)
+            is_training (boolean): True to explore as step does, False to act greedily as eval_step
+
+        Returns:
+            (numpy.array): The action ids, (batch,)
+        '''
+        q_values = self.q_estimator.predict_nograd(obs)
+        actions = np.where(legal_masks, q_values, -np.inf).argmax(axis=1)
+        if is_training:
+            # as in step: with probability epsilon a uniformly random legal action
+            epsilon = self.epsilons[min(self.total_t, self.epsilon_decay_steps-1)]
+            for i in np.flatnonzero(np.random.rand(len(actions)) < epsilon):
+                actions[i] = np.random.choice(np.flatnonzero(legal_masks[i]))
+        return actions
+
     def predict(self, state):
         ''' Predict the masked Q-values
 
@@ -188,39 +227,66 @@ class DQNAgent(object):
         '''
         
         q_values = self.q_estimator.predict_nograd(np.expand_dims(state['obs'], 0))[0]
-        masked_q_values = -np.inf * np.ones(self.num_actions, dtype=float)
-        legal_actions = list(state['legal_actions'].keys())
-        masked_q_values[legal_actions] = q_values[legal_actions]
+        masked_q_values = np.where(self.legal_mask(state), q_values, -np.inf)
 
         return masked_q_values
 
-    def train(self):
-        ''' Train the network
+    def legal_action_ids(self, state):
+        ''' Get the legal action ids of a state
+
+        Args:
+            state (dict): a state, with a 'legal_actions' dict or only a 'legal_mask' array
 
         Returns:
-            loss (float): The loss of the current batch.
+            legal_actions (list): the legal action ids, in the order of 'legal_actions' if present
         '''
-        state_batch, action_batch, reward_batch, next_state_batch, done_batch, legal_actions_batch = self.memory.sample()
+        if 'legal_actions' in state:
+            return list(state['legal_actions'].keys())
+        return np.flatnonzero(state['legal_mask']).tolist()
 
-        # Calculate best next actions using Q-network (Double DQN)
-        q_values_next = self.q_estimator.predict_nograd(next_state_batch)
-        legal_actions = []
-        for b in range(self.batch_size):
-            legal_actions.extend([i + b * self.num_actions for i in legal_actions_batch[b]])
-        masked_q_values = -np.inf * np.ones(self.num_actions * self.batch_size, dtype=float)
-        masked_q_values[legal_actions] = q_values_next.flatten()[legal_actions]
-        masked_q_values = masked_q_values.reshape((self.batch_size, self.num_actions))
-        best_actions = np.argmax(masked_q_values, axis=1)
+    def legal_mask(self, state):
+        ''' Get the boolean mask of the legal actions of a state
+
+        Args:
+            state (dict): a state, with a 'legal_mask' array if the environment provides it
 
-        # Evaluate best next actions using Target-network (Double DQN)
-        q_values_next_target = self.target_estimator.predict_nograd(next_state_batch)
-        target_batch = reward_batch + np.invert(done_batch).astype(np.float32) * \
-            self.discount_factor * q_values_next_target[np.arange(self.batch_size), best_actions]
+        Returns:
+            legal_mask (numpy.array): a 1-d boolean array of size num_actions
+        '''
+        if 'legal_mask' in state:
+            return state['legal_mask']
+        legal_mask = np.zeros(self.num_actions, dtype=bool)
+        legal_mask[list(state['legal_actions'].keys())] = True
+        return legal_mask
 
-        # Perform gradient descent update
-        state_batch = np.array(state_batch)
+    def train(self):
+        ''' Train the network
 
-        loss = self.q_estimator.update(state_batch, action_batch, target_batch)
+        Returns:
+            loss (float): The loss of the current batch.
+        '''
+        batch = self.memory.sample()
+        state_batch, action_batch, reward_batch, next_state_batch, done_batch, legal_actions_batch = batch[:6]
+        prioritized = isinstance(self.memory, PrioritizedMemory)
+
+        # Double DQN target on the device: the best legal next actions by the Q-network,
+        # evaluated by the target network
+        with torch.no_grad():
+            next_states = torch.from_numpy(next_state_batch).float().to(self.device)
+            legal_masks = torch.from_numpy(legal_actions_batch).to(self.device)
+            best_actions = self.q_estimator.qnet(next_states).masked_fill(~legal_masks, -np.inf).argmax(1, keepdim=True)
+            target_batch = torch.from_numpy(reward_batch).to(self.device) + \
+                torch.from_numpy(~done_batch).to(self.device) * self.discount_factor * \
+                self.target_estimator.qnet(next_states).gather(1, best_actions).squeeze(1)
+
+        if prioritized:
+            # importance-sampling weights in the loss, new priorities from the TD errors
+            weights, indices = batch[6:]
+            loss, td_errors = self.q_estimator.update(state_batch, action_batch, target_batch, weights,
+                                                      return_td_errors=True)
+            self.memory.update_priorities(indices, td_errors)
+        else:
+            loss = self.q_estimator.update(state_batch, action_batch, target_batch)
         print('\rINFO - Step {}, rl-loss: {}'.format(self.total_t, loss), end='')
 
         # Update the target estimator
@@ -245,7 +311,8 @@ class DQNAgent(object):
             action (int): the performed action ID
             reward (float): the reward received
             next_state (numpy.array): the next state after performing the action
-            legal_actions (list): the legal actions of the next state
+            legal_actions (list or numpy.array): the legal actions of the next state,
+                as action ids or as a boolean mask
             done (boolean): whether the episode is finished
         '''
         self.memory.save(state, action, reward, next_state, legal_actions, done)
@@ -292,6 +359,7 @@ class DQNAgent(object):
         '''
         
         print("\nINFO - Restoring model from checkpoint...")
+        prioritized_replay = checkpoint['memory'].get('prioritized', False)
         agent_instance = cls(
             replay_memory_size=checkpoint['memory']['memory_size'],
             replay_memory_init_size=checkpoint['replay_memory_init_size'],
@@ -309,6 +377,7 @@ class DQNAgent(object):
             device=checkpoint['device'],
             save_path=checkpoint['save_path'],
             save_every=checkpoint['save_every'],
+            prioritized_replay=prioritized_replay,
         )
         
         agent_instance.total_t = checkpoint['total_t']
@@ -316,7 +385,10 @@ class DQNAgent(object):
         
         agent_instance.q_estimator = Estimator.from_checkpoint(checkpoint['q_estimator'])
         agent_instance.target_estimator = deepcopy(agent_instance.q_estimator)
-        agent_instance.memory = Memory.from_checkpoint(checkpoint['memory'])
+        if prioritized_replay:
+            agent_instance.memory = PrioritizedMemory.from_checkpoint(checkpoint['memory'])
+        else:
+            agent_instance.memory = Memory.from_checkpoint(checkpoint['memory'])
 
         return agent_instance
                      
@@ -388,7 +460,7 @@ class Estimator(object):
             q_as = self.qnet(s).cpu().numpy()
         return q_as
 
-    def update(self, s, a, y):
+    def update(self, s, a, y, weights=None, return_td_errors=False):
         ''' Updates the estimator towards the given targets.
             In this case y is the target-network estimated
             value of the Q-network optimal actions, which
@@ -397,18 +469,21 @@ class Estimator(object):
         Args:
           s (np.ndarray): (batch, state_shape) state representation
           a (np.ndarray): (batch,) integer sampled actions
-          y (np.ndarray): (batch,) value of optimal actions according to Q-target
+          y (np.ndarray or torch.Tensor): (batch,) value of optimal actions according to Q-target
+          weights (np.ndarray): (batch,) optional importance-sampling weights of the squared errors
+          return_td_errors (bool): also return the TD errors y - Q(s, a), copied to the CPU.
+            Off by default, the copy waits for the device
 
         Returns:
-          The calculated loss on the batch.
+          The calculated loss on the batch, and the (batch,) TD errors if return_td_errors
         '''
         self.optimizer.zero_grad()
 
         self.qnet.train()
 
-        s = torch.from_numpy(s).float().to(self.device)
-        a = torch.from_numpy(a).long().to(self.device)
-        y = torch.from_numpy(y).float().to(self.device)
+        s = torch.as_tensor(s, device=self.device).float()
+        a = torch.as_tensor(a, device=self.device).long()
+        y = torch.as_tensor(y, device=self.device).float()
 
         # (batch, state_shape) -> (batch, num_actions)
         q_as = self.qnet(s)
@@ -417,13 +492,19 @@ class Estimator(object):
         Q = torch.gather(q_as, dim=-1, index=a.unsqueeze(-1)).squeeze(-1)
 
         # update model
-        batch_loss = self.mse_loss(Q, y)
+        if weights is None:
+            batch_loss = self.mse_loss(Q, y)
+        else:
+            weights = torch.from_numpy(weights).float().to(self.device)
+            batch_loss = (weights * (Q - y) ** 2).mean()
         batch_loss.backward()
         self.optimizer.step()
         batch_loss = batch_loss.item()
 
         self.qnet.eval()
 
+        if return_td_errors:
+            return batch_loss, (y - Q).detach().cpu().numpy()
         return batch_loss
     
     def checkpoint_attributes(self):
@@ -494,56 +575,105 @@ class EstimatorNetwork(nn.Module):
         return self.fc_layers(s)
 
 class Memory(object):
-    ''' Memory for saving transitions
+    ''' Memory for saving transitions, a circular buffer of fixed capacity
+    with one preallocated numpy array per field
     '''
 
-    def __init__(self, memory_size, batch_size):
+    def __init__(self, memory_size, batch_size, num_actions=None):
         ''' Initialize
         Args:
             memory_size (int): the size of the memroy buffer
+            batch_size (int): the size of the sampled batches
+            num_actions (int): the width of the legal action masks, grown to
+                fit the legal actions saved if None
         '''
         self.memory_size = memory_size
         self.batch_size = batch_size
-        self.memory = []
+        self.num_actions = num_actions
+        # the arrays are allocated on the first save, with the shape and dtype of the state
+        self.states = None
+        self.next_states = None
+        self.actions = np.zeros(memory_size, dtype=np.int64)
+        self.rewards = np.zeros(memory_size, dtype=np.float32)
+        self.dones = np.zeros(memory_size, dtype=bool)
+        self.legal_actions = np.zeros((memory_size, num_actions or 0), dtype=bool)
+        # number of transitions saved and index of the next one to write (the oldest when full)
+        self.size = 0
+        self.position = 0
+
+    def __len__(self):
+        return self.size
 
     def save(self, state, action, reward, next_state, legal_actions, done):
-        ''' Save transition into memory
+        ''' Save transition into memory, overwriting the oldest one when full
 
         Args:
             state (numpy.array): the current state
             action (int): the performed action ID
             reward (float): the reward received
             next_state (numpy.array): the next state after performing the action
-            legal_actions (list): the legal actions of the next state
+            legal_actions (list or numpy.array): the legal actions of the next state,
+                as action ids or as a boolean mask
             done (boolean): whether the episode is finished
         '''
-        if len(self.memory) == self.memory_size:
-            self.memory.pop(0)
-        transition = Transition(state, action, reward, next_state, done, legal_actions)
-        self.memory.append(transition)
+        if self.states is None:
+            state = np.asarray(state)
+            self.states = np.zeros((self.memory_size,) + state.shape, dtype=state.dtype)
+            self.next_states = np.zeros_like(self.states)
+        is_mask = isinstance(legal_actions, np.ndarray) and legal_actions.dtype == bool
+        if self.num_actions is None:
+            width = len(legal_actions) if is_mask else max(legal_actions, default=-1) + 1
+            if width > self.legal_actions.shape[1]:
+                self.legal_actions = np.pad(self.legal_actions, ((0, 0), (0, width - self.legal_actions.shape[1])))
+        i = self.position
+        self.states[i] = state
+        self.actions[i] = action
+        self.rewards[i] = reward
+        self.next_states[i] = next_state
+        self.dones[i] = done
+        if is_mask:
+            self.legal_actions[i, :len(legal_actions)] = legal_actions
+        else:
+            self.legal_actions[i] = False
+            self.legal_actions[i, legal_actions] = True
+        self.position = (i + 1) % self.memory_size
+        self.size = min(self.size + 1, self.memory_size)
 
     def sample(self):
-        ''' Sample a minibatch from the replay memory
+        ''' Sample a minibatch from the replay memory, without replacement
 
         Returns:
-            state_batch (list): a batch of states
-            action_batch (list): a batch of actions
-            reward_batch (list): a batch of rewards
-            next_state_batch (list): a batch of states
-            done_batch (list): a batch of dones
+            state_batch (numpy.array): a batch of states
+            action_batch (numpy.array): a batch of actions
+            reward_batch (numpy.array): a batch of rewards
+            next_state_batch (numpy.array): a batch of states
+            done_batch (numpy.array): a batch of dones
+            legal_actions_batch (numpy.array): a batch of boolean masks of the next legal actions
         '''
-        samples = random.sample(self.memory, self.batch_size)
-        samples = tuple(zip(*samples))
-        return tuple(map(np.array, samples[:-1])) + (samples[-1],)
+        indices = np.array(random.sample(range(self.size), self.batch_size))
+        return (self.states[indices], self.actions[indices], self.rewards[indices],
+                self.next_states[indices], self.dones[indices], self.legal_actions[indices])
+
+    def _order(self):
+        ''' Indices of the saved transitions, from the oldest to the newest
+        '''
+        return (np.arange(self.size) + (self.position if self.size == self.memory_size else 0)) % self.memory_size
 
     def checkpoint_attributes(self):
-        ''' Returns the attributes that need to be checkpointed
+        ''' Returns the attributes that need to be checkpointed, the arrays
+        of the saved transitions, from the oldest to the newest
         '''
-        
+        order = self._order()
         return {
             'memory_size': self.memory_size,
             'batch_size': self.batch_size,
-            'memory': self.memory
+            'num_actions': self.num_actions,
+            'states': None if self.states is None else self.states[order],
+            'actions': self.actions[order],
+            'rewards': self.rewards[order],
+            'next_states': None if self.next_states is None else self.next_states[order],
+            'dones': self.dones[order],
+            'legal_actions': self.legal_actions[order],
         }
             
     @classmethod
@@ -558,6 +688,169 @@ class Memory(object):
             instance (Memory): the restored instance
         '''
         
-        instance = cls(checkpoint['memory_size'], checkpoint['batch_size'])
-        instance.memory = checkpoint['memory']
+        instance = cls(checkpoint['memory_size'], checkpoint['batch_size'], checkpoint.get('num_actions'))
+        if 'memory' in checkpoint:
+            # checkpoint of the list memory: a list of Transition
+            for t in checkpoint['memory']:
+                instance.save(t.state, t.action, t.reward, t.next_state, t.legal_actions, t.done)
+            return instance
+        size = len(checkpoint['actions'])
+        if checkpoint['states'] is not None:
+            instance.states = np.zeros((instance.memory_size,) + checkpoint['states'].shape[1:],
+                                       dtype=checkpoint['states'].dtype)
+            instance.next_states = np.zeros_like(instance.states)
+            instance.states[:size] = checkpoint['states']
+            instance.next_states[:size] = checkpoint['next_states']
+        instance.actions[:size] = checkpoint['actions']
+        instance.rewards[:size] = checkpoint['rewards']
+        instance.dones[:size] = checkpoint['dones']
+        instance.legal_actions = np.zeros((instance.memory_size, checkpoint['legal_actions'].shape[1]), dtype=bool)
+        instance.legal_actions[:size] = checkpoint['legal_actions']
+        instance.size = size
+        instance.position = size % instance.memory_size
+        return instance
+
+
+class SumTree(object):
+    ''' Binary tree where each node holds the sum of its two children, stored in
+    an array: the children of node i are 2i and 2i + 1, the root is node 1 and the
+    leaves are the nodes capacity to 2 * capacity - 1 (capacity is rounded up to a
+    power of two). Updates and prefix-sum searches take O(log n), vectorised over a batch.
+    '''
+
+    def __init__(self, capacity):
+        ''' Initialize
+        Args:
+            capacity (int): the number of leaves needed
+        '''
+        self.capacity = 1
+        self.depth = 0
+        while self.capacity < capacity:
+            self.capacity *= 2
+            self.depth += 1
+        self.tree = np.zeros(2 * self.capacity)
+
+    def total(self):
+        return self.tree[1]
+
+    def get(self, indices):
+        return self.tree[np.asarray(indices) + self.capacity]
+
+    def update(self, indices, values):
+        ''' Set the values of some leaves and update their ancestors
+
+        Args:
+            indices (array_like): the indices of the leaves
+            values (array_like): the new values
+        '''
+        nodes = np.asarray(indices) + self.capacity
+        self.tree[nodes] = values
+        for _ in range(self.depth):
+            nodes = np.unique(nodes // 2)
+            self.tree[nodes] = self.tree[2 * nodes] + self.tree[2 * nodes + 1]
+
+    def find(self, prefix_sums):
+        ''' Find the leaves where the cumulative sums of the leaves reach some values
+
+        Args:
+            prefix_sums (array_like): values in [0, total)
+
+        Returns:
+            (numpy.array): for each value v, the first leaf i with sum(leaves[:i + 1]) > v
+        '''
+        values = np.array(prefix_sums, dtype=float)
+        nodes = np.ones(len(values), dtype=np.int64)
+        for _ in range(self.depth):
+            left = self.tree[2 * nodes]
+            right = values >= left
+            values -= left * right
+            nodes = 2 * nodes + right
+        return nodes - self.capacity
+
+
+class PrioritizedMemory(Memory):
+    ''' Memory sampling the transitions with probabilities proportional to
+    priority ** alpha, the priority of a transition being its last absolute TD error
+    (Schaul et al. 2016, proportional variant). New transitions get the highest priority.
+    '''
+
+    def __init__(self, memory_size, batch_size, num_actions=None, alpha=0.6, beta=0.4, eps=1e-6):
+        ''' Initialize
+        Args:
+            memory_size (int): the size of the memroy buffer
+            batch_size (int): the size of the sampled batches
+            num_actions (int): the width of the legal action masks
+            alpha (float): the exponent of the priorities, 0 is uniform sampling
+            beta (float): the exponent of the importance-sampling weights
+            eps (float): added to the absolute TD errors
+        '''
+        super().__init__(memory_size, batch_size, num_actions)
+        self.alpha = alpha
+        self.beta = beta
+        self.eps = eps
+        self.max_priority = 1.0
+        self.tree = SumTree(memory_size)
+
+    def save(self, state, action, reward, next_state, legal_actions, done):
+        ''' Save transition into memory with the highest priority, see Memory.save
+        '''
+        i = self.position
+        super().save(state, action, reward, next_state, legal_actions, done)
+        self.tree.update([i], [self.max_priority ** self.alpha])
+
+    def sample(self):
+        ''' Sample a minibatch, with replacement, stratified over the total priority
+
+        Returns:
+            The batches of Memory.sample, followed by:
+            weights_batch (numpy.array): the importance-sampling weights, at most 1
+            indices (numpy.array): the indices of the transitions, for update_priorities
+        '''
+        segment = self.tree.total() / self.batch_size
+        prefix_sums = (np.arange(self.batch_size) + np.random.rand(self.batch_size)) * segment
+        # rounding errors may reach an empty leaf past the saved transitions
+        indices = np.minimum(self.tree.find(prefix_sums), self.size - 1)
+        probs = self.tree.get(indices) / self.tree.total()
+        weights = (self.size * probs) ** (-self.beta)
+        weights /= weights.max()
+        return (self.states[indices], self.actions[indices], self.rewards[indices],
+                self.next_states[indices], self.dones[indices], self.legal_actions[indices],
+                weights.astype(np.float32), indices)
+
+    def update_priorities(self, indices, td_errors):
+        ''' Set the priorities of sampled transitions from their new TD errors
+
+        Args:
+            indices (numpy.array): the indices returned by sample
+            td_errors (numpy.array): the TD errors of the transitions
+        '''
+        priorities = np.abs(td_errors) + self.eps
+        self.max_priority = max(self.max_priority, float(priorities.max()))
+        self.tree.update(indices, priorities ** self.alpha)
+
+    def checkpoint_attributes(self):
+        ''' Returns the attributes that need to be checkpointed, see Memory.checkpoint_attributes
+        '''
+        attributes = super().checkpoint_attributes()
+        attributes.update({
+            'prioritized': True,
+            'alpha': self.alpha,
+            'beta': self.beta,
+            'eps': self.eps,
+            'max_priority': self.max_priority,
+            'priorities': self.tree.get(self._order()),
+        })
+        return attributes
+
+    @classmethod
+    def from_checkpoint(cls, checkpoint):
+        ''' Restores the attributes from the checkpoint, see Memory.from_checkpoint
+        '''
+        instance = super().from_checkpoint(checkpoint)
+        if 'priorities' in checkpoint:
+            instance.alpha = checkpoint['alpha']
+            instance.beta = checkpoint['beta']
+            instance.eps = checkpoint['eps']
+            instance.max_priority = checkpoint['max_priority']
+            instance.tree.update(np.arange(instance.size), checkpoint['priorities'])
         return instance
@@ -0,0 +1,206 @@
+import copy
+
+import numpy as np
+
+from rlcard.agents.cfr_agent import CFRAgent
+from rlcard.utils.utils import remove_illegal
+
+class MCCFRAgent(CFRAgent):
+    ''' Implement Monte Carlo CFR with external sampling or outcome sampling
+
+    The chance events are sampled by resetting the environment, as in
+    CFRAgent. External sampling explores every action of the traversing
+    player and samples one action of the others, outcome sampling samples a
+    single trajectory, so an iteration costs one episode per player and does
+    not need step_back. The regrets are matched at the visited infosets only,
+    the cost of an iteration does not grow with the number of infosets.
+
+    External sampling still branches on every decision of the traversing
+    player, for long games such as Cirulla or Doudizhu use outcome sampling.
+    '''
+    SAMPLINGS = ('external', 'outcome')
+
+    def __init__(self, env, model_path='./mccfr_model', sampling='external', epsilon=0.6,
+                 capacity=1024, seed=None):
+        ''' Initilize Agent
+
+        Args:
+            env (Env): Env class, with allow_step_back for external sampling
+            model_path (str): The directory to save and load the model
+            sampling (str): The sampling scheme, one of MCCFRAgent.SAMPLINGS
+            epsilon (float): The exploration of the traversing player, for outcome sampling
+            capacity (int): The initial number of rows of the tables
+            seed (int): The seed of the sampling of the actions
+        '''
+        if sampling not in self.SAMPLINGS:
+            raise ValueError('Unknown MCCFR sampling {}, expected one of {}'.format(sampling, self.SAMPLINGS))
+        super().__init__(env, model_path=model_path, capacity=capacity)
+        self.sampling = sampling
+        self.epsilon = epsilon
+        self.np_random = np.random.RandomState(seed)
+
+    def train(self):
+        ''' Do one iteration of MCCFR, one sampled traversal per player
+        '''
+        self.iteration += 1
+        for player_id in range(self.env.num_players):
+            self.env.reset()
+            if self.sampling == 'external':
+                self.traverse_external(player_id)
+            else:
+                self.traverse_outcome(player_id, 1.0, 1.0, 1.0)
+
+    def current_policy(self, row, legal_actions):
+        ''' Match the regrets of one infoset
+
+        Args:
+            row (int): The row of the infoset
+            legal_actions (list): Indices of legal actions
+
+        Returns:
+            (numpy.array): The probabilities of the legal actions
+        '''
+        self.policy[row] = self.regret_matching(self.regrets[row:row + 1])[0]
+        return remove_illegal(self.policy[row], legal_actions)[legal_actions]
+
+    def traverse_external(self, player_id):
+        ''' Traverse the game tree with external sampling, update the regrets
+
+        Args:
+            player_id (int): The traversing player
+
+        Returns:
+            (float): The sampled utility of the traversing player
+        '''
+        if self.env.is_over():
+            return self.env.get_payoffs()[player_id]
+
+        current_player = self.env.get_player_id()
+        obs, legal_actions = self.get_state(current_player)
+        row = self.infoset_id(obs)
+        action_probs = self.current_policy(row, legal_actions)
+
+        if not current_player == player_id:
+            # The average policy is accumulated where the actions are sampled
+            self.average_policy[row, legal_actions] += action_probs
+            action = legal_actions[self.np_random.choice(len(legal_actions), p=action_probs)]
+            self.env.step(action)
+            utility = self.traverse_external(player_id)
+            self.env.step_back()
+            return utility
+
+        action_utilities = np.zeros(len(legal_actions))
+        for i, action in enumerate(legal_actions):
+            self.env.step(action)
+            action_utilities[i] = self.traverse_external(player_id)
+            self.env.step_back()
+
+        state_utility = action_probs @ action_utilities
+        self.regrets[row, legal_actions] += action_utilities - state_utility
+        return state_utility
+
+    def traverse_outcome(self, player_id, player_prob, others_prob, sample_prob):
+        ''' Sample one trajectory with outcome sampling, update the regrets
+
+        Args:
+            player_id (int): The traversing player
+            player_prob (float): The reach probability of the traversing player
+            others_prob (float): The reach probability of the other players
+            sample_prob (float): The probability of sampling the current node
+
+        Returns:
+            (tuple): Tuple containing:
+
+                (float): The utility of the traversing player over the sampling probability
+                (float): The probability of the rest of the trajectory under the policies
+        '''
+        if self.env.is_over():
+            return self.env.get_payoffs()[player_id] / sample_prob, 1.0
+
+        current_player = self.env.get_player_id()
+        obs, legal_actions = self.get_state(current_player)
+        row = self.infoset_id(obs)
+        action_probs = self.current_policy(row, legal_actions)
+
+        if current_player == player_id:
+            sample_probs = self.epsilon / len(legal_actions) + (1 - self.epsilon) * action_probs
+        else:
+            sample_probs = action_probs
+        i = self.np_random.choice(len(legal_actions), p=sample_probs)
+        self.env.step(legal_actions[i])
+
+        if not current_player == player_id:
+            utility, tail_prob = self.traverse_outcome(player_id, player_prob,
+                others_prob * action_probs[i], sample_prob * sample_probs[i])
+            self.average_policy[row, legal_actions] += others_prob / sample_prob * action_probs
+            return utility, tail_prob * action_probs[i]
+
+        utility, tail_prob = self.traverse_outcome(player_id, player_prob * action_probs[i],
+            others_prob, sample_prob * sample_probs[i])
+        weight = utility * others_prob * tail_prob
+        regrets = -weight * action_probs[i] * np.ones(len(legal_actions))
+        regrets[i] = weight * (1 - action_probs[i])
+        self.regrets[row, legal_actions] += regrets
+        return utility, tail_prob * action_probs[i]
+
+    def train_parallel(self, num_iterations, num_workers=None, num_shards=None, seed=0):
+        ''' Do iterations of MCCFR in shards, usually in worker processes, and
+        merge the regrets and average policies they accumulated
+
+        Every shard starts from a copy of the agent and runs its iterations with
+        its own seed, derived from seed and the current iteration. The deltas are
+        merged in shard order: the tables only depend on seed and num_shards, any
+        num_workers, including 1 which runs the shards serially in this process,
+        gives the same result.
+
+        Args:
+            num_iterations (int): The total number of iterations
+            num_workers (int): The number of processes, the number of CPUs if None
+            num_shards (int): The number of shards, num_workers if None
+            seed (int): The seed of the shards
+        '''
+        import os
+
+        num_workers = num_workers or os.cpu_count()
+        num_shards = min(num_shards or num_workers, num_iterations)
+        seeds = [int(s.generate_state(1)[0])
+                 for s in np.random.SeedSequence([seed, self.iteration]).spawn(num_shards)]
+        # spread the iterations over the shards, the first ones get one more
+        nums = [num_iterations // num_shards + (i < num_iterations % num_shards) for i in range(num_shards)]
+
+        if num_workers == 1:
+            results = [_mccfr_shard(copy.deepcopy(self), n, s) for n, s in zip(nums, seeds)]
+        else:
+            from concurrent.futures import ProcessPoolExecutor
+            with ProcessPoolExecutor(max_workers=min(num_workers, num_shards)) as executor:
+                results = list(executor.map(_mccfr_shard, [self] * num_shards, nums, seeds))
+
+        num_infosets = self.num_infosets
+        for new_infosets, regrets, average_policy in results:
+            rows = np.concatenate([np.arange(num_infosets), [self.infoset_id(obs) for obs in new_infosets]]).astype(int)
+            self.regrets[rows] += regrets
+            self.average_policy[rows] += average_policy
+        self.iteration += num_iterations
+        self.update_policy()
+
+def _mccfr_shard(agent, num_iterations, seed):
+    ''' Run the iterations of one shard of MCCFRAgent.train_parallel on a copy of the agent
+
+    Returns:
+        (tuple): The infosets added, in row order, and the deltas of the regrets
+            and of the average policy of all the rows
+    '''
+    num_infosets = agent.num_infosets
+    regrets = agent.regrets[:num_infosets].copy()
+    average_policy = agent.average_policy[:num_infosets].copy()
+    agent.np_random = np.random.RandomState(seed)
+    agent.env.seed(seed)
+    for _ in range(num_iterations):
+        agent.train()
+
+    new_infosets = list(agent.infosets)[num_infosets:]
+    regret_deltas = agent.regrets[:agent.num_infosets].copy()
+    regret_deltas[:num_infosets] -= regrets
+    average_policy_deltas = agent.average_policy[:agent.num_infosets].copy()
+    average_policy_deltas[:num_infosets] -= average_policy
+    return new_infosets, regret_deltas, average_policy_deltas
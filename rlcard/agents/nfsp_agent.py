@@ -212,6 +212,46 @@ class NFSPAgent(object):
             raise ValueError("'evaluate_with' should be either 'average_policy' or 'best_response'.")
         return action, info
 
+    def batch_step(self, obs, legal_masks, is_training=False):
+        ''' Predict the actions of a batch of states with one forward pass,
+            see rlcard.utils.run_batched
+
+        Args:
+            obs (numpy.array): The stacked observations, (batch, *state_shape)
+            legal_masks (numpy.array): Boolean masks of the legal actions, (batch, num_actions)
+            is_training (boolean): True to act as step, with the policy of the episode,
+                False to act as eval_step
+
+        Returns:
+            (numpy.array): The action ids, (batch,)
+        '''
+        mode = self._mode if is_training else self.evaluate_with
+        if mode == 'best_response':
+            actions = self._rl_agent.batch_step(obs, legal_masks, is_training)
+            if is_training:
+                for info_state, action in zip(obs, actions):
+                    one_hot = np.zeros(self._num_actions)
+                    one_hot[action] = 1
+                    self._add_transition(info_state, one_hot)
+        elif mode == 'average_policy':
+            info_state = torch.from_numpy(obs).float().to(self.device)
+            with torch.no_grad():
+                probs = np.exp(self.policy_network(info_state).cpu().numpy())
+            # as remove_illegal, row by row
+            probs = probs * legal_masks
+            sums = probs.sum(axis=1, keepdims=True)
+            probs = np.where(sums > 0, probs / np.where(sums > 0, sums, 1),
+                             legal_masks / legal_masks.sum(axis=1, keepdims=True))
+            # sample one action per row
+            draws = np.random.rand(len(probs), 1)
+            actions = (probs.cumsum(axis=1) > draws).argmax(axis=1)
+            # guard against rounding: never return an illegal action
+            actions = np.where(legal_masks[np.arange(len(actions)), actions], actions,
+                               legal_masks.argmax(axis=1))
+        else:
+            raise ValueError("'evaluate_with' should be either 'average_policy' or 'best_response'.")
+        return actions
+
     def sample_episode_policy(self):
         ''' Sample average/best_response policy
         '''
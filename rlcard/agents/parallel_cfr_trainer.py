@@ -0,0 +1,209 @@
+import copy
+import itertools
+import multiprocessing
+import os
+
+import numpy as np
+
+class ParallelCFRTrainer(object):
+    ''' Run the traversals of the iterations of a CFRAgent in worker processes
+
+    An iteration traverses the tree for every player on chance_samples deals.
+    The traversals only read the policy at the start of the iteration (of the
+    player for alternating updates), so they run independently: every worker
+    owns a clone of the environment and writes the regret and average policy
+    deltas of a traversal to its own slot of shared-memory arrays. The deals
+    are drawn from the random generator of the environment of the agent in the
+    order of a serial run, and the deltas are merged in traversal order, so the
+    tables do not depend on num_workers. With chance_samples=1 an iteration is
+    CFRAgent.train, up to the rounding of the sums.
+    '''
+
+    def __init__(self, agent, num_workers=None, chance_samples=1):
+        ''' Start the workers
+
+        Args:
+            agent (CFRAgent): The agent to train, with an env allowing step_back
+            num_workers (int): The number of processes, the number of CPUs if None.
+                With 1 the traversals run in this process
+            chance_samples (int): The number of deals traversed per player and iteration
+        '''
+        self.agent = agent
+        self.num_workers = num_workers or os.cpu_count()
+        self.chance_samples = chance_samples
+        self.num_slots = agent.env.num_players * chance_samples
+        self.capacity = 0
+        self.workers = []
+        # The infoset keys in row order, to send the new ones to the workers
+        self.keys = list(agent.infosets)
+        self._start(max(len(agent.regrets), 2 * agent.num_infosets))
+
+    def _start(self, capacity):
+        ''' Allocate the shared arrays with capacity rows and start the workers on them
+        '''
+        self.close()
+        agent = self.agent
+        self.capacity = capacity
+        shape = (capacity, agent.num_actions)
+        if self.num_workers == 1:
+            self.policy = np.zeros(shape)
+            self.deltas = np.zeros((self.num_slots, 2) + shape)
+            self.local_agent = _worker_agent(agent)
+            return
+
+        ctx = multiprocessing.get_context()
+        policy = ctx.RawArray('d', int(np.prod(shape)))
+        deltas = ctx.RawArray('d', self.num_slots * 2 * int(np.prod(shape)))
+        self.policy = np.frombuffer(policy).reshape(shape)
+        self.deltas = np.frombuffer(deltas).reshape((self.num_slots, 2) + shape)
+        self.results = ctx.Queue()
+        self.workers = []
+        for _ in range(min(self.num_workers, self.num_slots)):
+            tasks = ctx.Queue()
+            process = ctx.Process(target=_cfr_worker, daemon=True,
+                                  args=(_worker_agent(agent), policy, deltas, self.deltas.shape, tasks, self.results))
+            process.start()
+            self.workers.append((process, tasks))
+        # The number of infoset keys each worker knows
+        self.synced = [agent.num_infosets for _ in self.workers]
+
+    def close(self):
+        ''' Stop the workers
+        '''
+        for process, tasks in self.workers:
+            tasks.put(None)
+        for process, _ in self.workers:
+            process.join()
+        self.workers = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+    def train(self):
+        ''' Do one iteration of CFR, as CFRAgent.train
+        '''
+        agent = self.agent
+        agent.iteration += 1
+        players = list(range(agent.env.num_players))
+        for group in ([[player_id] for player_id in players] if agent.alternating else [players]):
+            tasks = [player_id for player_id in group for _ in range(self.chance_samples)]
+            num_infosets = agent.num_infosets
+            results = self._run(tasks)
+            for i, result in enumerate(results):
+                self._merge(i, num_infosets, *result)
+                if (i + 1) % self.chance_samples == 0:
+                    # the traversals of a player are merged
+                    if agent.variant == 'cfr+':
+                        np.maximum(agent.regrets, 0, out=agent.regrets)
+                    if agent.alternating:
+                        agent.update_policy()
+
+        if agent.variant in ('linear', 'discounted'):
+            agent.discount()
+        agent.update_policy()
+
+    def _run(self, tasks):
+        ''' Run the traversals of players from the current policy
+
+        Returns:
+            (list): The new infosets and, if they did not fit in the shared arrays,
+                the deltas of each traversal
+        '''
+        agent = self.agent
+        num_infosets = agent.num_infosets
+        if 2 * num_infosets > self.capacity:
+            self._start(4 * num_infosets)
+        self.policy[:num_infosets] = agent.policy[:num_infosets]
+        self.policy[num_infosets:] = 1.0 / agent.num_actions
+
+        messages = []
+        for task_id, player_id in enumerate(tasks):
+            # draw the deal as a serial run would, the worker replays it
+            rng_state = agent.env.np_random.get_state()
+            agent.env.reset()
+            messages.append((task_id, player_id, rng_state, agent.iteration))
+
+        if self.num_workers == 1:
+            local_agent = self.local_agent
+            for obs in self.keys[local_agent.num_infosets:]:
+                local_agent.infosets[obs] = len(local_agent.infosets)
+            return [_traverse(local_agent, self.policy, self.deltas[message[0]], *message)
+                    for message in messages]
+
+        for task_id, message in enumerate(messages):
+            worker_id = task_id % len(self.workers)
+            new_keys = self.keys[self.synced[worker_id]:num_infosets]
+            self.synced[worker_id] = num_infosets
+            self.workers[worker_id][1].put(message + (new_keys,))
+        results = [None for _ in tasks]
+        for _ in tasks:
+            task_id, result = self.results.get()
+            results[task_id] = result
+        return results
+
+    def _merge(self, task_id, num_infosets, new_keys, tables):
+        ''' Add the deltas of a traversal to the tables of the agent
+        '''
+        agent = self.agent
+        regrets, average_policy = tables if tables is not None else self.deltas[task_id]
+        new_rows = []
+        for obs in new_keys:
+            if obs not in agent.infosets:
+                self.keys.append(obs)
+            new_rows.append(agent.infoset_id(obs))
+        agent.regrets[:num_infosets] += regrets[:num_infosets]
+        agent.average_policy[:num_infosets] += average_policy[:num_infosets]
+        if new_rows:
+            agent.regrets[new_rows] += regrets[num_infosets:num_infosets + len(new_rows)]
+            agent.average_policy[new_rows] += average_policy[num_infosets:num_infosets + len(new_rows)]
+
+def _worker_agent(agent):
+    ''' A clone of the agent for the traversals, without its tables
+    '''
+    worker_agent = copy.copy(agent)
+    worker_agent.policy = worker_agent.regrets = worker_agent.average_policy = None
+    worker_agent.infosets = dict(agent.infosets)
+    worker_agent.env = copy.deepcopy(agent.env)
+    return worker_agent
+
+def _traverse(agent, policy, deltas, task_id, player_id, rng_state, iteration):
+    ''' Traverse the tree of one deal for a player, writing the deltas of the tables
+
+    Returns:
+        (tuple): The new infosets, in the order they were found, and the deltas
+            if the tables outgrew the shared arrays, else None
+    '''
+    num_infosets = agent.num_infosets
+    agent.iteration = iteration
+    regrets, average_policy = deltas
+    deltas.fill(0)
+    agent.policy, agent.regrets, agent.average_policy = policy, regrets, average_policy
+    agent.env.np_random.set_state(rng_state)
+    agent.env.reset()
+    agent.traverse_tree(np.ones(agent.env.num_players), player_id)
+
+    # the master numbers the new infosets
+    new_keys = list(itertools.islice(reversed(agent.infosets), agent.num_infosets - num_infosets))[::-1]
+    for obs in new_keys:
+        del agent.infosets[obs]
+    tables = None
+    if agent.regrets is not regrets:
+        tables = (agent.regrets, agent.average_policy)
+    return new_keys, tables
+
+def _cfr_worker(agent, policy, deltas, shape, tasks, results):
+    ''' Run the traversals sent by a ParallelCFRTrainer, in a worker process
+    '''
+    policy = np.frombuffer(policy).reshape(shape[2:])
+    deltas = np.frombuffer(deltas).reshape(shape)
+    while True:
+        message = tasks.get()
+        if message is None:
+            break
+        task_id, player_id, rng_state, iteration, new_keys = message
+        for obs in new_keys:
+            agent.infosets[obs] = len(agent.infosets)
+        results.put((task_id, _traverse(agent, policy, deltas[task_id], task_id, player_id, rng_state, iteration)))
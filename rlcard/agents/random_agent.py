@@ -45,3 +45,16 @@ class RandomAgent(object):
         info['probs'] = {state['raw_legal_actions'][i]: probs[list(state['legal_actions'].keys())[i]] for i in range(len(state['legal_actions']))}
 
         return self.step(state), info
+
+    def batch_step(self, obs, legal_masks, is_training=False):
+        ''' Predict the actions of a batch of states, see rlcard.utils.run_batched
+
+        Args:
+            obs (numpy.array): The stacked observations, unused
+            legal_masks (numpy.array): Boolean masks of the legal actions, (batch, num_actions)
+            is_training (boolean): Unused, random agents do not train
+
+        Returns:
+            (numpy.array): The action ids, (batch,)
+        '''
+        return np.array([np.random.choice(np.flatnonzero(mask)) for mask in legal_masks])
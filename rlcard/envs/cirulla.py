@@ -3,25 +3,60 @@ from collections import OrderedDict
 
 from rlcard.envs import Env
 from rlcard.games.cirulla.game import CirullaGame as Game
+from rlcard.games.cirulla.bitboard_game import CirullaBitboardGame as BitboardGame
 from rlcard.games.cirulla.card import CirullaCard as Card
 
-from rlcard.games.cirulla.utils import encode_cards, get_card_id, card_from_card_id
+from rlcard.games.cirulla.utils import get_action_id, action_from_action_id
+from rlcard.games.cirulla.bitboard import iter_card_ids
 
 DEFAULT_GAME_CONFIG = {
         'num_players': 2,
         'allow_step_back': True,
-        'seed': 4
+        'seed': 4,
+        'game_bitboard': False,
+        'game_undo_log': True,
+        'game_redeal': False,
+        'game_knock': False,
+        'game_last_taker': False,
+        'reuse_obs_buffer': False,
+        'raw_obs': True,
+        'legal_mask_only': False,
         }
 
+# the raw state entries encoded in the 5 planes of the observation
+OBS_PLANES = ['board', 'my_hand', 'opponents_hand', 'my_won_cards', 'opponents_won_cards']
+
 class CirullaEnv(Env):
 
     def __init__(self, config = DEFAULT_GAME_CONFIG):
         self.name = 'cirulla'
         self.default_game_config = DEFAULT_GAME_CONFIG
-        self.game = Game()
+        # optional rules, all disabled by default (see CirullaGame):
+        # 'game_redeal': deal the first 4 cards again with 2 aces or 3 cards of a rank
+        # 'game_knock': score the "buona" only by knocking, actions 40 + card id
+        # 'game_last_taker': the cards left at the end go to the last player who took
+        rules = {key: config.get('game_' + key, DEFAULT_GAME_CONFIG['game_' + key])
+                 for key in ['redeal', 'knock', 'last_taker']}
+        # 'game_bitboard': use the engine holding every pile of cards as a 40-bit mask
+        if config.get('game_bitboard', DEFAULT_GAME_CONFIG['game_bitboard']):
+            self.game = BitboardGame(**rules)
+        else:
+            # 'game_undo_log': step back by reverting the last move instead of restoring a deepcopy
+            self.game = Game(undo_log=config.get('game_undo_log', DEFAULT_GAME_CONFIG['game_undo_log']), **rules)
+        # 'reuse_obs_buffer': encode every observation and legal mask into the same
+        # env-owned arrays, they are overwritten at the next step so copy them to keep
+        # them (Env.run keeps states)
+        # 'raw_obs': False to leave the raw state out of the extracted state
+        # 'legal_mask_only': True to leave the 'legal_actions' dict out of the extracted
+        # state, for agents reading 'legal_mask' (DQNAgent, run_batched)
+        self.reuse_obs_buffer = config.get('reuse_obs_buffer', DEFAULT_GAME_CONFIG['reuse_obs_buffer'])
+        self.raw_obs = config.get('raw_obs', DEFAULT_GAME_CONFIG['raw_obs'])
+        self.legal_mask_only = config.get('legal_mask_only', DEFAULT_GAME_CONFIG['legal_mask_only'])
+        self._obs_buffer = np.zeros((len(OBS_PLANES), 40), dtype=np.int8)
         super().__init__(config)
+        self._legal_mask_buffer = np.zeros(self.num_actions, dtype=bool)
         self.state_shape = [[5,40] for _ in range(self.num_players)]
-        self.action_shape = [[3] for _ in range(self.num_players)]
+        self.action_shape = [None for _ in range(self.num_players)]
 
 
     def get_payoffs(self) -> np.array:
@@ -31,15 +66,43 @@ class CirullaEnv(Env):
     def _decode_action(self, action_id: int) -> Card:
         legal_ids = self._get_legal_actions()
         if action_id in legal_ids.keys():
-            return card_from_card_id(action_id)
+            return action_from_action_id(action_id)
         else:
-            return card_from_card_id(np.random.choice(list(legal_ids.keys())))
+            return action_from_action_id(np.random.choice(list(legal_ids.keys())))
 
 
     def _get_legal_actions(self) -> dict:
         legal_actions = self.game.get_legal_actions(self.game.current_player_id)
-        legal_ids = {get_card_id(card): card for card in legal_actions}
-        return OrderedDict(legal_ids)
+        return OrderedDict((get_action_id(action), action) for action in legal_actions)
+
+
+    def encode_obs(self, state, out=None) -> np.ndarray:
+        ''' Encode the cards of a raw state into 5 planes of 40, see _extract_state
+
+        Args:
+            state (dict): dict of original state
+            out (numpy.array): optional (5, 40) array to write into, e.g. a row of a
+                preallocated batch. A new int8 array is allocated if None.
+
+        Returns:
+            numpy array: the 5 * 40 observation (out if given)
+        '''
+        if out is None:
+            out = np.zeros((len(OBS_PLANES), 40), dtype=np.int8)
+        else:
+            out.fill(0)
+        # written card by card, faster than collecting the indices for one assignment
+        if 'masks' in state: # bitboard engine
+            for plane, mask in enumerate(state['masks']):
+                row = out[plane]
+                for card_id in iter_card_ids(mask):
+                    row[card_id] = 1
+        else:
+            for plane, key in enumerate(OBS_PLANES):
+                row = out[plane]
+                for card in state[key]:
+                    row[card.card_id] = 1
+        return out
 
 
     def _extract_state(self, state) -> dict:
@@ -49,7 +112,12 @@ class CirullaEnv(Env):
             state (dict): dict of original state
 
         Returns:
-            numpy array: 5 * 40 array
+            dict: 'obs' the 5 * 40 array below, 'legal_actions' the legal action ids
+                  and cards (unless legal_mask_only), 'legal_mask' the boolean mask of
+                  the legal action ids, 'raw_legal_actions' the cards and 'raw_obs' the
+                  raw state (if raw_obs). With reuse_obs_buffer, 'obs' and 'legal_mask'
+                  are arrays of the env, overwritten at the next step
+            obs: 5 * 40 array
                          5 :board state         (1 if card in board else 0) 
                             my hand             (1 if card in hand else 0)
                             oppents hand        (1 if card in hand else 0)
@@ -57,22 +125,23 @@ class CirullaEnv(Env):
                             opponents won cards (1 if card in won cards else 0)
         TODO: add also points for each player as integers
         '''
-   
-        board_rep= encode_cards(state['board'])
-        my_hand_rep= encode_cards(state['my_hand'])
-        opponents_hand_rep= encode_cards(state['opponents_hand'])
-        my_won_cards_rep= encode_cards(state['my_won_cards'])
-        opponents_won_cards_rep= encode_cards(state['opponents_won_cards'])
-
         extracted_state= {}
-        extracted_state['obs']= np.array([board_rep,
-                                          my_hand_rep, 
-                                          opponents_hand_rep, 
-                                          my_won_cards_rep, 
-                                          opponents_won_cards_rep])
-        extracted_state['raw_obs']= state
-        extracted_state['legal_actions']= self._get_legal_actions() 
+        extracted_state['obs']= self.encode_obs(state, self._obs_buffer if self.reuse_obs_buffer else None)
+        if self.raw_obs:
+            extracted_state['raw_obs']= state
+        if not self.legal_mask_only:
+            extracted_state['legal_actions']= OrderedDict((get_action_id(action), action)
+                                                          for action in state['legal_actions'])
         extracted_state['raw_legal_actions']= state['legal_actions']
+        # boolean mask of the legal action ids, used as is by the agents and their memories
+        if self.reuse_obs_buffer:
+            legal_mask = self._legal_mask_buffer
+            legal_mask.fill(False)
+        else:
+            legal_mask = np.zeros(self.num_actions, dtype=bool)
+        for action in state['legal_actions']:
+            legal_mask[get_action_id(action)] = True
+        extracted_state['legal_mask']= legal_mask
 
         return extracted_state
 
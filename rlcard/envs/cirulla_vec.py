@@ -0,0 +1,174 @@
+import numpy as np
+
+from rlcard.utils import seeding
+from rlcard.games.cirulla.bitboard import NUM_CARDS, CARD_VALUES, encode_masks, \
+    play_card, count_points
+
+
+class CirullaVecEnv(object):
+    ''' N Cirulla games stepped in lockstep.
+
+    The games are held in structure-of-arrays form: every pile of cards is a
+    40-bit mask (see rlcard.games.cirulla.bitboard) stored in an int64 array
+    with one row per game. The rules are the ones of CirullaBitboardGame
+    with the default options (none of the optional rules).
+
+    Every Cirulla game lasts exactly 36 moves (the 36 cards left after the first
+    4 are flipped), so all the games started by reset end on the same step.
+    '''
+
+    def __init__(self, num_envs, seed=None):
+        ''' Initialize the environments
+
+        Args:
+            num_envs (int): The number of games played in parallel
+            seed (int): A random seed
+        '''
+        self.num_envs = num_envs
+        self.num_players = 2
+        self.num_actions = NUM_CARDS
+        self.state_shape = [5, NUM_CARDS]
+        self._card_values = np.array(CARD_VALUES)
+        self.seed(seed)
+
+    def seed(self, seed=None):
+        self.np_random, seed = seeding.np_random(seed)
+        return seed
+
+    def reset(self):
+        ''' Start N new games
+
+        Returns:
+            (tuple): Tuple containing:
+
+                (numpy.array): The observations, shape (N, 5, 40)
+                (numpy.array): The legal action masks, shape (N, 40)
+                (numpy.array): The ids of the players to act, shape (N,)
+        '''
+        n = self.num_envs
+        # one shuffled deck per game: cards are dealt from the end of the deck
+        decks = np.argsort(self.np_random.random_sample((n, NUM_CARDS)), axis=1)
+        top = decks[:, :4]
+        self.decks = decks[:, 4:]
+        self.deck_sizes = np.full(n, NUM_CARDS - 4)
+
+        self.current_player = self.np_random.randint(0, 2, size=n)
+        self.hands = np.zeros((n, 2), dtype=np.int64)
+        self.won = np.zeros((n, 2), dtype=np.int64)
+        self.scopa_sums = np.zeros((n, 2), dtype=np.int64)
+        self.dones = np.zeros(n, dtype=bool)
+        self.payoffs = np.zeros((n, 2), dtype=np.int64)
+
+        # flip the top 4 cards: if they sum up to 15 or 30 they are taken
+        # by the player who flipped them, otherwise they go on the board
+        top_masks = np.bitwise_or.reduce(np.left_shift(1, top, dtype=np.int64), axis=1)
+        top_sums = self._card_values[top].sum(axis=1)
+        rows = np.arange(n)
+        taken = np.isin(top_sums, [15, 30])
+        self.scopa_sums[rows, self.current_player] += np.where(taken, top_sums // 15, 0)
+        self.won[rows, self.current_player] |= np.where(taken, top_masks, 0)
+        self.board = np.where(taken, 0, top_masks)
+        self.current_player = 1 - self.current_player
+
+        self._deal_round(rows)
+
+        return self._get_observations()
+
+    def _deal_round(self, rows):
+        ''' Deal 3 cards to each player of the given games
+
+        Args:
+            rows (numpy.array): The indices of the games
+        '''
+        for player_id in range(2):
+            for _ in range(3):
+                self.deck_sizes[rows] -= 1
+                cards = self.decks[rows, self.deck_sizes[rows]]
+                self.hands[rows, player_id] |= np.left_shift(1, cards, dtype=np.int64)
+
+    def step(self, actions):
+        ''' Play one card in every game that is not over
+
+        Args:
+            actions (array_like): The card ids played in each game, shape (N,).
+                Illegal actions are replaced by a random legal one.
+
+        Returns:
+            (tuple): Tuple containing:
+
+                (numpy.array): The observations, shape (N, 5, 40)
+                (numpy.array): The legal action masks, shape (N, 40)
+                (numpy.array): The ids of the players to act, shape (N,)
+                (numpy.array): True for the games that are over, shape (N,)
+                (numpy.array): The payoffs of the games, shape (N, 2), 0 until a game is over
+        '''
+        rows = np.flatnonzero(~self.dones)
+        players = self.current_player[rows]
+        actions = np.asarray(actions)[rows]
+
+        # replace the illegal actions
+        hands = self.hands[rows, players]
+        in_range = (actions >= 0) & (actions < NUM_CARDS)
+        illegal = ~in_range | (((hands >> np.where(in_range, actions, 0)) & 1) == 0)
+        for i in np.flatnonzero(illegal):
+            legal_ids = np.flatnonzero(encode_masks(hands[i]))
+            actions[i] = self.np_random.choice(legal_ids)
+
+        # the moves are resolved on python ints, the masks are too irregular to vectorise takes
+        new_hands, new_boards, new_won, points = [], [], [], []
+        for card_id, hand, board in zip(actions.tolist(), hands.tolist(), self.board[rows].tolist()):
+            hand, board, won, p = play_card(card_id, hand, board)
+            new_hands.append(hand)
+            new_boards.append(board)
+            new_won.append(won)
+            points.append(p)
+        self.hands[rows, players] = new_hands
+        self.board[rows] = new_boards
+        self.won[rows, players] |= np.array(new_won, dtype=np.int64)
+        self.scopa_sums[rows, players] += points
+
+        hands_empty = (self.hands[rows] == 0).all(axis=1)
+        deck_empty = self.deck_sizes[rows] == 0
+        # round finished
+        self._deal_round(rows[hands_empty & ~deck_empty])
+        # game finished, the player who played last takes the board
+        over = hands_empty & deck_empty
+        over_rows, over_players = rows[over], players[over]
+        self.won[over_rows, over_players] |= self.board[over_rows]
+        self.board[over_rows] = 0
+        self.dones[over_rows] = True
+        for row in over_rows.tolist():
+            points = [count_points(int(self.won[row, p]), int(self.scopa_sums[row, p])) for p in range(2)]
+            if points[0] != points[1]:
+                winner = 0 if points[0] > points[1] else 1
+                self.payoffs[row, winner] = 1
+                self.payoffs[row, 1 - winner] = -1
+
+        self.current_player[rows] = 1 - players
+
+        obs, legal_actions, player_ids = self._get_observations()
+        return obs, legal_actions, player_ids, self.dones.copy(), self.payoffs.copy()
+
+    def _get_observations(self):
+        ''' Encode the states of the players to act
+
+        Returns:
+            (tuple): observations (N, 5, 40), legal action masks (N, 40) and player ids (N,).
+                The 5 planes are the same as in CirullaEnv: board, my hand, opponent's hand,
+                my won cards, opponent's won cards.
+        '''
+        rows = np.arange(self.num_envs)
+        players = self.current_player
+        opponents = 1 - players
+        masks = np.stack([self.board,
+                          self.hands[rows, players],
+                          self.hands[rows, opponents],
+                          self.won[rows, players],
+                          self.won[rows, opponents]], axis=1)
+        obs = encode_masks(masks)
+        return obs, obs[:, 1].astype(bool), players.copy()
+
+    def is_over(self):
+        ''' Check whether all the games are over
+        '''
+        return bool(self.dones.all())
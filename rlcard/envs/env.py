@@ -117,12 +117,15 @@ class Env(object):
         '''
         self.agents = agents
 
-    def run(self, is_training=False):
+    def run(self, is_training=False, columnar=None):
         '''
         Run a complete game, either for evaluation or training RL agent.
 
         Args:
             is_training (boolean): True if for training purpose.
+            columnar (ColumnarTrajectories): If given, the game is appended to it
+                and it is returned instead of the nested lists, so that the state
+                dicts are not kept. The actions must be action ids (no raw agent).
 
         Returns:
             (tuple) Tuple containing:
@@ -133,11 +136,16 @@ class Env(object):
         Note: The trajectories are 3-dimension list. The first dimension is for different players.
               The second dimension is for different transitions. The third dimension is for the contents of each transiton
         '''
-        trajectories = [[] for _ in range(self.num_players)]
+        if columnar is not None:
+            add_state, add_action = columnar.add_state, columnar.add_action
+        else:
+            trajectories = [[] for _ in range(self.num_players)]
+            add_state = lambda player_id, state: trajectories[player_id].append(state)
+            add_action = lambda player_id, action: trajectories[player_id].append(action)
         state, player_id = self.reset()
 
         # Loop to play the game
-        trajectories[player_id].append(state)
+        add_state(player_id, state)
         while not self.is_over():
             # Agent plays
             if not is_training:
@@ -148,7 +156,7 @@ class Env(object):
             # Environment steps
             next_state, next_player_id = self.step(action, self.agents[player_id].use_raw)
             # Save action
-            trajectories[player_id].append(action)
+            add_action(player_id, action)
 
             # Set the state and player
             state = next_state
@@ -156,16 +164,19 @@ class Env(object):
 
             # Save state.
             if not self.game.is_over():
-                trajectories[player_id].append(state)
+                add_state(player_id, state)
 
         # Add a final state to all the players
         for player_id in range(self.num_players):
             state = self.get_state(player_id)
-            trajectories[player_id].append(state)
+            add_state(player_id, state)
 
         # Payoffs
         payoffs = self.get_payoffs()
 
+        if columnar is not None:
+            columnar.end_episode(payoffs)
+            return columnar, payoffs
         return trajectories, payoffs
 
     def is_over(self):
@@ -18,8 +18,21 @@ class EnvSpec(object):
             entry_point (string): A string the indicates the location of the envronment class
         '''
         self.env_id = env_id
-        mod_name, class_name = entry_point.split(':')
-        self._entry_point = getattr(importlib.import_module(mod_name), class_name)
+        self.entry_point = entry_point
+        # the module is imported on the first make, so that importing rlcard
+        # does not import the game engines of all the registered environments
+        self._mod_name, self._class_name = entry_point.split(':')
+        self._entry_point = None
+
+    def load(self):
+        ''' Import the environment class, once
+
+        Returns:
+            (class): The environment class
+        '''
+        if self._entry_point is None:
+            self._entry_point = getattr(importlib.import_module(self._mod_name), self._class_name)
+        return self._entry_point
 
     def make(self, config=DEFAULT_CONFIG):
         ''' Instantiates an instance of the environment
@@ -28,7 +41,7 @@ class EnvSpec(object):
             env (Env): An instance of the environemnt
             config (dict): A dictionary of the environment settings
         '''
-        env = self._entry_point(config)
+        env = self.load()(config)
         return env
 
 class EnvRegistry(object):
@@ -1,4 +1,5 @@
 from rlcard.games.cirulla.dealer import CirullaDealer as Dealer
 from rlcard.games.cirulla.judger import CirullaJudger as Judger
 from rlcard.games.cirulla.player import CirullaPlayer as Player
-from rlcard.games.cirulla.game import CirullaGame as Game
\ No newline at end of file
+from rlcard.games.cirulla.game import CirullaGame as Game
+from rlcard.games.cirulla.bitboard_game import CirullaBitboardGame as BitboardGame
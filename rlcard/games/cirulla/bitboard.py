@@ -0,0 +1,159 @@
+''' Bitmask helpers for Cirulla.
+
+A pile of cards (hand, board, won cards) is a single int where bit i is set if
+the card with id i (see utils.get_card_id: rank_id + 10 * suit_id) is in the pile.
+'''
+from functools import lru_cache
+import numpy as np
+
+from rlcard.games.cirulla.judger import count_suit_ranks_points
+from rlcard.games.cirulla.board import MAX_CARD_VALUE, SUM_TAKE_VALUE
+
+NUM_CARDS = 40
+FULL_MASK = (1 << NUM_CARDS) - 1
+
+# value of the card with id i
+CARD_VALUES = [card_id % 10 + 1 for card_id in range(NUM_CARDS)]
+
+# suit order is the one of CirullaCard.valid_suit: S, H, D, C
+SUIT_MASKS = [0x3FF << (10 * suit_id) for suit_id in range(4)]
+ACES_MASK = sum(1 << (10 * suit_id) for suit_id in range(4))
+SEVEN_OF_CLUBS_ID = 36
+
+_BIT_SHIFTS = np.arange(NUM_CARDS, dtype=np.uint64)
+
+
+def popcount(mask: int) -> int:
+    return mask.bit_count()
+
+
+def iter_card_ids(mask: int):
+    ''' Iterate over the card ids of a mask in increasing order
+    '''
+    while mask:
+        low_bit = mask & -mask
+        yield low_bit.bit_length() - 1
+        mask ^= low_bit
+
+
+def mask_from_card_ids(card_ids) -> int:
+    mask = 0
+    for card_id in card_ids:
+        mask |= 1 << card_id
+    return mask
+
+
+def mask_value(mask: int) -> int:
+    ''' Sum of the values of the cards in a mask
+    '''
+    return sum(CARD_VALUES[card_id] for card_id in iter_card_ids(mask))
+
+
+def encode_masks(masks) -> np.ndarray:
+    ''' Encode masks into planes of 40 (1 if card in pile else 0)
+
+    Args:
+        masks (int or array_like): one or more masks
+
+    Returns:
+        (numpy.array): array of shape masks.shape + (40,)
+    '''
+    masks = np.asarray(masks, dtype=np.uint64)
+    return ((masks[..., None] >> _BIT_SHIFTS) & np.uint64(1)).astype(np.int8)
+
+
+@lru_cache(maxsize=1 << 16)
+def find_take(board_mask: int, value: int) -> int:
+    ''' Find the cards of the board taken by a card of the given value, with the
+    same rules as Board.find_best_take: a "scopa" if possible, otherwise the take
+    with the most cards, ties broken by the lowest card ids.
+
+    Args:
+        board_mask (int): mask of the cards on the board
+        value (int): value of the played card
+
+    Returns:
+        (int): mask of the taken cards, 0 if the card takes nothing
+    '''
+    take_values = {0: 0}
+    for card_id in iter_card_ids(board_mask):
+        card_value = CARD_VALUES[card_id]
+        bit = 1 << card_id
+        for take_mask, take_value in list(take_values.items()):
+            if take_value + card_value <= MAX_CARD_VALUE:
+                take_values[take_mask | bit] = take_value + card_value
+    targets = (value, SUM_TAKE_VALUE - value)
+    masks = [m for m, v in take_values.items() if m and v in targets]
+    if not masks:
+        return 0
+    if board_mask in masks:
+        return board_mask
+    return max(masks, key=lambda m: (popcount(m), -m))
+
+
+def buona_points(hand_mask: int) -> int:
+    ''' Points of "buona" (ten and three) of a hand of three cards, see
+    CirullaPlayer.is_buona_ten and CirullaPlayer.is_buona_three
+    '''
+    if popcount(hand_mask) != 3:
+        return 0
+    has_seven_of_clubs = hand_mask >> SEVEN_OF_CLUBS_ID & 1
+    values = [CARD_VALUES[c] for c in iter_card_ids(hand_mask) if c != SEVEN_OF_CLUBS_ID]
+    points = 0
+    if all(v == values[0] for v in values):
+        points += 10
+    if sum(values) < (9 if has_seven_of_clubs else 10):
+        points += 3
+    return points
+
+
+def play_card(card_id: int, hand_mask: int, board_mask: int, knock=None) -> tuple:
+    ''' Play a card from a hand, see CirullaPlayer.play_card
+
+    Args:
+        card_id (int): id of the card to be played
+        hand_mask (int): mask of the player's hand
+        board_mask (int): mask of the cards on the board
+        knock (bool): Whether the player knocked, the "buona" is scored
+            only when knocking, or always if None
+
+    Returns:
+        (tuple): Tuple containing:
+
+            (int): mask of the hand after the move
+            (int): mask of the board after the move
+            (int): mask of the cards won with the move
+            (int): points scored with the move ("buona" and "scopa")
+    '''
+    bit = 1 << card_id
+    value = CARD_VALUES[card_id]
+
+    # Check for "buona"
+    points = buona_points(hand_mask) if knock is None or knock else 0
+
+    # aces take everything on the board (if no ace is already present)
+    if value == 1 and board_mask and not board_mask & ACES_MASK:
+        return hand_mask & ~bit, 0, board_mask | bit, points + 1
+
+    take = find_take(board_mask, value)
+    if not take:
+        return hand_mask & ~bit, board_mask | bit, 0, points
+    board_mask ^= take
+    # check if "scopa" is made (no cards left on the board)
+    if not board_mask:
+        points += 1
+    return hand_mask & ~bit, board_mask, take | bit, points
+
+
+def count_points(won_mask: int, scopa_sum: int = 0) -> int:
+    ''' Points of a player, see CirullaJudger.count_points
+
+    Args:
+        won_mask (int): mask of the cards won by the player
+        scopa_sum (int): points scored during the game
+
+    Returns:
+        (int): The total points
+    '''
+    suit_ranks = [won_mask >> (10 * suit_id) & 0x3FF for suit_id in range(4)]
+    return count_suit_ranks_points(suit_ranks, popcount(won_mask)) + scopa_sum
@@ -0,0 +1,258 @@
+import numpy as np
+
+from rlcard.games.cirulla.card import CirullaCard as Card, CirullaKnock as Knock, CARDS, KNOCKS
+from rlcard.games.cirulla.utils import get_card_id, is_redeal_needed
+from rlcard.games.cirulla.bitboard import NUM_CARDS, popcount, iter_card_ids, \
+    mask_from_card_ids, mask_value, play_card, count_points, buona_points
+
+
+def cards_from_mask(mask: int) -> list[Card]:
+    return [CARDS[card_id] for card_id in iter_card_ids(mask)]
+
+
+class CirullaBitboardGame:
+    ''' Cirulla game where every pile of cards (hands, board, won cards) is a 40-bit
+    mask over the card ids. It has the same API and the same rules as CirullaGame,
+    and for a given random state it deals and plays the same games.
+    '''
+
+    def __init__(self, allow_step_back=False, num_players=2, redeal=False, knock=False, last_taker=False):
+        ''' Initialize the game, see CirullaGame for the rule options
+        '''
+        self.allow_step_back = allow_step_back
+        self.np_random = np.random.RandomState()
+        self.num_players = num_players
+        self.redeal = redeal
+        self.knock = knock
+        self.last_taker = last_taker
+
+    def configure(self, game_config):
+        ''' Specifiy some game specific parameters, such as number of players
+        '''
+        self.num_players = game_config['game_num_players']
+
+    def init_game(self):
+        ''' Initialize players and state
+
+        Returns:
+            (tuple): Tuple containing:
+
+                (dict): The first state in one game
+                (int): Current player's id
+        '''
+        # draw from the random state as CirullaGame does: first player,
+        # then the dealer shuffles a deck and shuffles a new one before flipping
+        self.current_player_id = self.np_random.randint(0, 2)
+        self.np_random.shuffle(list(range(NUM_CARDS)))
+        deck = list(range(NUM_CARDS))
+        self.np_random.shuffle(deck)
+        # with the redeal rule, shuffle a new deck until the 4 top cards are valid
+        while self.redeal and is_redeal_needed([CARDS[card_id] for card_id in deck[:4]]):
+            deck = list(range(NUM_CARDS))
+            self.np_random.shuffle(deck)
+
+        self.hands = [0 for _ in range(self.num_players)]
+        self.won = [0 for _ in range(self.num_players)]
+        self.scopa_sums = [0 for _ in range(self.num_players)]
+        self.board = 0
+        self.payoffs = [0 for _ in range(self.num_players)]
+        self._is_over = False
+        self.winner = None
+        self.last_taker_id = None
+
+        # cards are dealt from the end of the deck, deck_size is the number of cards left
+        top, self.deck = deck[:4], deck[4:]
+        self.deck_size = len(self.deck)
+
+        # flip the top 4 cards: if they sum up to 15 or 30 they are taken
+        # by the player who flipped them, otherwise they go on the board
+        top_mask = mask_from_card_ids(top)
+        top_sum = mask_value(top_mask)
+        if top_sum in [15, 30]:
+            self.scopa_sums[self.current_player_id] += 1 if top_sum == 15 else 2
+            self.won[self.current_player_id] |= top_mask
+        else:
+            self.board = top_mask
+        self.current_player_id = 1 - self.current_player_id
+
+        self._deal_round()
+
+        # Save the history for stepping back to the last state.
+        self.history = []
+
+        state = self.get_state(self.current_player_id)
+
+        return state, self.current_player_id
+
+    def _deal_round(self):
+        ''' Deal 3 cards to each player from the top of the deck
+        '''
+        for player_id in range(self.num_players):
+            for _ in range(3):
+                self.deck_size -= 1
+                self.hands[player_id] |= 1 << self.deck[self.deck_size]
+
+    def step(self, raw_action):
+        ''' Get the next state
+
+        Args:
+            action (Card or Knock): card to be played, after knocking for a Knock
+
+        Returns:
+            (tuple): Tuple containing:
+
+                (dict): next player's state
+                (int): next plater's id
+        '''
+        if self.allow_step_back:
+            # masks are immutable ints and the deck is never modified,
+            # so a snapshot is a handful of ints
+            self.history.append((self.hands[:], self.board, self.won[:], self.scopa_sums[:],
+                                 self.current_player_id, self.deck_size, self._is_over, self.winner,
+                                 self.last_taker_id))
+
+        if isinstance(raw_action, Knock):
+            self.play_card_id(get_card_id(raw_action.card), knock=True)
+        else:
+            self.play_card_id(get_card_id(raw_action), knock=False if self.knock else None)
+
+        player_id = self.current_player_id
+        state = self.get_state(player_id)
+
+        return state, player_id
+
+    def play_card_id(self, card_id: int, knock=None):
+        ''' Current player plays a card, then the game or round ends if needed
+        and the turn passes to the other player
+
+        Args:
+            card_id (int): id of the card to be played
+            knock (bool): Whether the player knocked, see CirullaPlayer.play_card
+        '''
+        player_id = self.current_player_id
+        self.hands[player_id], self.board, won, points = play_card(card_id, self.hands[player_id],
+                                                                   self.board, knock)
+        if won:
+            self.won[player_id] |= won
+            self.last_taker_id = player_id
+        self.scopa_sums[player_id] += points
+
+        self.is_game_or_round_over()
+        self.current_player_id = 1 - player_id
+
+    def step_back(self):
+        ''' Return to the previous state of the game
+
+        Returns:
+            (bool): True if the game steps back successfully
+        '''
+        if not self.history:
+            return False
+        self.hands, self.board, self.won, self.scopa_sums, self.current_player_id, \
+            self.deck_size, self._is_over, self.winner, self.last_taker_id = self.history.pop()
+        return True
+
+    def get_state(self, player_id: int) -> dict:
+        ''' Return player's state
+
+        Args:
+            player_id (int): player id
+
+        Returns:
+            (dict): The state of the player
+        '''
+        opponent_id = 1 - player_id
+        state = {}
+        state['num_players'] = self.num_players
+        state['current_player'] = player_id
+        state['my_hand'] = cards_from_mask(self.hands[player_id])
+        state['opponents_hand'] = cards_from_mask(self.hands[opponent_id])
+        state['board'] = cards_from_mask(self.board)
+        state['my_won_cards'] = cards_from_mask(self.won[player_id])
+        state['opponents_won_cards'] = cards_from_mask(self.won[opponent_id])
+        state['legal_actions'] = self.get_legal_actions(player_id)
+        state['num_cards'] = [popcount(hand) for hand in self.hands]
+        state['my_scopa_sum'] = self.scopa_sums[player_id]
+        state['opponents_scopa_sum'] = self.scopa_sums[opponent_id]
+        # board, my hand, opponent's hand, my won cards, opponent's won cards
+        state['masks'] = (self.board, self.hands[player_id], self.hands[opponent_id],
+                          self.won[player_id], self.won[opponent_id])
+        return state
+
+    def get_legal_actions(self, player_id: int) -> list[Card]:
+        ''' Return the legal actions for a player
+
+        Returns:
+            (list): A list of legal actions (as card object), followed by the
+                knock actions (Knock objects) if the player can knock
+        '''
+        cards = cards_from_mask(self.hands[player_id])
+        if self.knock and buona_points(self.hands[player_id]):
+            return cards + [KNOCKS[card.card_id] for card in cards]
+        return cards
+
+    def get_legal_action_ids(self, player_id: int) -> list[int]:
+        ''' Return the legal actions for a player
+
+        Returns:
+            (list): A list of legal actions (as card id, 40 + card id to knock)
+        '''
+        card_ids = list(iter_card_ids(self.hands[player_id]))
+        if self.knock and buona_points(self.hands[player_id]):
+            return card_ids + [NUM_CARDS + card_id for card_id in card_ids]
+        return card_ids
+
+    def get_payoffs(self):
+        ''' Return the payoffs of the game
+
+        Returns:
+            (list): Each entry corresponds to the payoff of one player
+        '''
+        if self.winner is not None:
+            self.payoffs[self.winner] = 1
+            self.payoffs[1 - self.winner] = -1
+        return self.payoffs
+
+    def get_num_actions(self):
+        ''' Return the number of applicable actions
+
+        Returns:
+            (int): The number of actions.
+            There are 40 actions, 1 for each card in the deck,
+            and 40 more to knock and play each card with the knock rule
+        '''
+        return 2 * NUM_CARDS if self.knock else NUM_CARDS
+
+    def get_num_players(self):
+        return self.num_players
+
+    def get_points(self, player_id: int) -> int:
+        ''' Return the points the player would score if the game ended now
+        '''
+        return count_points(self.won[player_id], self.scopa_sums[player_id])
+
+    def is_game_or_round_over(self):
+        ''' Check if the game is over (deck and hands empty)
+        or the round is over (hands empty)
+        '''
+        if self.hands[0] or self.hands[1]:
+            return
+        if self.deck_size:   # round finished
+            self._deal_round()
+        else:                # game finished, the player who played last
+                             # (or took last with the last taker rule) takes the board
+            player_id = self.current_player_id
+            if self.last_taker and self.last_taker_id is not None:
+                player_id = self.last_taker_id
+            self.won[player_id] |= self.board
+            self.board = 0
+            self._is_over = True
+            points = [self.get_points(p) for p in range(self.num_players)]
+            if points[0] != points[1]:
+                self.winner = 0 if points[0] > points[1] else 1
+
+    def get_player_id(self):
+        return self.current_player_id
+
+    def is_over(self):
+        return self._is_over
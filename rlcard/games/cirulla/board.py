@@ -1,7 +1,9 @@
-
 from rlcard.games.cirulla.card import CirullaCard as Card
+from rlcard.games.cirulla.utils import get_card_id
 # from card import CirullaCard as Card
-from more_itertools import powerset
+
+MAX_CARD_VALUE = 10     # 10 is the maximum value of a card
+SUM_TAKE_VALUE = 15     # a card also takes the cards that sum up to 15 with it
 
 class Take:
 
@@ -29,19 +31,130 @@ class Take:
         return hash((tuple(self.cards), self.value))
 
 class Board:
+    ''' Cards lying face up on the table.
+
+    Besides the list of cards, the board keeps a take index: every subset of the
+    board worth at most MAX_CARD_VALUE is stored as a 40-bit mask (bit i set if
+    the card with id i, see utils.get_card_id, belongs to the subset) and grouped
+    by its value. The index is updated incrementally by add_card/remove_cards, so
+    finding the takes of a played card is a lookup instead of a powerset enumeration.
+    '''
     def __init__(self):
-        self.cards: list[Card] = []
+        self._cards: list[Card] = []
+        self._cards_by_id: dict[int, Card] = {}
+        self.mask = 0
+        self._take_values = {0: 0}
+        self._takes_by_value = [set() for _ in range(MAX_CARD_VALUE + 1)]
+        self._takes_by_value[0].add(0)
+
+    @property
+    def cards(self) -> list[Card]:
+        ''' The cards on the board. Use add_card/remove_cards/clear to modify the board
+        '''
+        return self._cards
+
+    @cards.setter
+    def cards(self, cards: list[Card]):
+        self.clear()
+        for card in cards:
+            self.add_card(card)
+
+    def add_card(self, card: Card):
+        ''' Put a card on the board and extend the take index with it
+
+        Args:
+            card (Card): The card to be put on the board
+        '''
+        card_id = get_card_id(card)
+        bit = 1 << card_id
+        for take_mask, take_value in list(self._take_values.items()):
+            new_value = take_value + card.value
+            if new_value <= MAX_CARD_VALUE:
+                self._take_values[take_mask | bit] = new_value
+                self._takes_by_value[new_value].add(take_mask | bit)
+        self._cards.append(card)
+        self._cards_by_id[card_id] = card
+        self.mask |= bit
+
+    def remove_cards(self, cards):
+        ''' Remove some cards from the board and drop the takes using them
+
+        Args:
+            cards (iterable): The cards to be removed from the board
+        '''
+        removed_mask = 0
+        for card in cards:
+            card_id = get_card_id(card)
+            removed_mask |= 1 << card_id
+            del self._cards_by_id[card_id]
+        self._cards = [c for c in self._cards if c not in cards]
+        self.mask &= ~removed_mask
+        self._take_values = {m: v for m, v in self._take_values.items() if not m & removed_mask}
+        for takes in self._takes_by_value:
+            takes.difference_update([m for m in takes if m & removed_mask])
+
+    def clear(self):
+        ''' Remove all the cards from the board
+        '''
+        self.__init__()
+
+    def cards_from_mask(self, mask: int) -> list[Card]:
+        ''' Get the cards of the board contained in a mask
+
+        Args:
+            mask (int): 40-bit mask of card ids
+
+        Returns:
+            (list): The list of Card objects
+        '''
+        cards = []
+        while mask:
+            low_bit = mask & -mask
+            cards.append(self._cards_by_id[low_bit.bit_length() - 1])
+            mask ^= low_bit
+        return cards
+
+    def find_take_masks(self, value: int) -> set[int]:
+        ''' Get the masks of the takes available to a card of the given value:
+        subsets of the board worth the card value or summing up to 15 with it.
+
+        Args:
+            value (int): The value of the played card
+
+        Returns:
+            (set): The set of take masks
+        '''
+        masks = set(self._takes_by_value[value])
+        complement = SUM_TAKE_VALUE - value
+        if complement <= MAX_CARD_VALUE:
+            masks.update(self._takes_by_value[complement])
+        masks.discard(0)
+        return masks
+
+    def find_best_take(self, card: Card) -> Take:
+        ''' Find the take made by playing a card: a "scopa" (all the cards on the board)
+        if possible, otherwise the take with the most cards. Ties are broken by the
+        lowest card ids, so the result does not depend on the order of the board.
+
+        Args:
+            card (Card): The card to be played
+
+        Returns:
+            take (Take): The best take, empty if the card takes nothing
+        '''
+        masks = self.find_take_masks(card.value)
+        if not masks:
+            return Take([])
+        if self.mask in masks:
+            return Take(self._cards)
+        best_mask = max(masks, key=lambda m: (bin(m).count('1'), -m))
+        return Take(self.cards_from_mask(best_mask))
 
     def find_normal_takes(self) -> list[Take]:
         '''
         Calculate takes by using player's card equal to sum of cards on the board 
         '''
-        takes = []
-        for sublist in powerset(self.cards):
-            take = Take(sublist)
-            if take.value <= 10:                   # 10 is the maximum value of a card
-                takes.append(take)
-        return takes
+        return [Take(self.cards_from_mask(m)) for m in self._take_values]
     
     def find_all_takes(self) -> list[Take]:
         '''
@@ -51,21 +164,18 @@ class Board:
         takes = self.find_normal_takes()
         new_takes = []
         for t in takes:
-            if t.value <= 15:
-                cards = t.cards
-                new_take = Take(cards)
-                new_take.value = 15 - t.value
-                if new_take.value <= 10:           # 10 is the maximum value of a card
-                    new_takes.append(new_take)
+            if SUM_TAKE_VALUE - t.value <= MAX_CARD_VALUE:
+                new_take = Take(t.cards)
+                new_take.value = SUM_TAKE_VALUE - t.value
+                new_takes.append(new_take)
         takes.extend(new_takes)
         return takes
     
     def is_empty(self) -> bool:
-        return len(self.cards) == 0
+        return len(self._cards) == 0
     
     def __str__(self) -> str:
         s = "["
-        for card in self.cards:
+        for card in self._cards:
             s += str(card) + ", "
         return s[0:-2] + "]"
-    
\ No newline at end of file
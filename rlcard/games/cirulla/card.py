@@ -18,30 +18,79 @@ UTIL_DICT = {
 REVERSE_UTIL_DICT = {v: k for k, v in UTIL_DICT.items()}
 
 
+PRIMIERA_VALUES = {
+    7: 21,
+    6: 18,
+    1: 16,
+    5: 15,
+    4: 14,
+    3: 13,
+    2: 12,
+    10: 10,
+    9: 10,
+    8: 10,
+}
+
+
 class CirullaCard(Card):
     '''
     Card stores the suit and rank of a single card
     In Cirulla there are 40 cards, 4 suits and 10 ranks
+
+    Note: there are exactly 40 instances of CirullaCard, one per card, built once
+    in CARDS. CirullaCard(suit, rank) returns the existing instance, cards are
+    immutable and their id, value, string and hash are precomputed attributes.
     '''
-    suit = None
-    rank = None
-    value = None
+    __slots__ = ('suit', 'rank', 'value', 'card_id', 'primiera_value', '_str', '_hash')
     valid_suit = ['S', 'H', 'D', 'C']
     valid_rank = ['A', '2', '3', '4', '5', '6', '7', 'J', 'Q', 'K']
+    _instances = {}
+
+    def __new__(cls, suit, rank):
+        card = cls._instances.get((suit, rank))
+        if card is None:
+            if suit not in cls.valid_suit or rank not in cls.valid_rank:
+                raise ValueError("Invalid Cirulla card: suit {}, rank {}".format(suit, rank))
+            card = object.__new__(cls)
+            value = REVERSE_UTIL_DICT.get(rank)
+            attributes = {
+                'suit': suit,
+                'rank': rank,
+                'value': value,
+                'card_id': cls.valid_rank.index(rank) + 10 * cls.valid_suit.index(suit),
+                'primiera_value': PRIMIERA_VALUES[value],
+                '_str': rank + suit,
+                '_hash': Card.valid_rank.index(rank) + 100 * Card.valid_suit.index(suit),
+            }
+            for name, attribute in attributes.items():
+                object.__setattr__(card, name, attribute)
+            cls._instances[(suit, rank)] = card
+        return card
 
     def __init__(self, suit, rank):
-        ''' Initialize the suit and rank of a card
+        ''' Initialize the suit and rank of a card (done once per card in __new__)
 
         Args:
             suit: string, suit of the card, should be one of valid_suit
             rank: string, rank of the card, should be one of valid_rank
             value: int, value of the card depending on the rank
         '''
-        self.suit = suit
-        self.rank = rank
-        self.value = REVERSE_UTIL_DICT.get(rank)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("CirullaCard is immutable")
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return (CirullaCard, (self.suit, self.rank))
 
     def __eq__(self, other):
+        if self is other:
+            return True
         if isinstance(other, Card):
             return self.rank == other.rank and self.suit == other.suit
         else:
@@ -49,9 +98,7 @@ class CirullaCard(Card):
             return NotImplemented
 
     def __hash__(self):
-        suit_index = Card.valid_suit.index(self.suit)
-        rank_index = Card.valid_rank.index(self.rank)
-        return rank_index + 100 * suit_index
+        return self._hash
 
     def __str__(self):
         ''' Get string representation of a card.
@@ -59,7 +106,7 @@ class CirullaCard(Card):
         Returns:
             string: the combination of rank and suit of a card. Eg: AS, 5H, JD, 3C, ...
         '''
-        return self.rank + self.suit
+        return self._str
 
     def get_index(self):
         ''' Get index of a card.
@@ -68,3 +115,39 @@ class CirullaCard(Card):
             string: the combination of suit and rank of a card. Eg: 1S, 2H, AD, BJ, RJ...
         '''
         return self.suit+self.rank
+
+
+# the 40 cards indexed by card id (rank_id + 10 * suit_id)
+CARDS = [CirullaCard(suit, rank) for suit in CirullaCard.valid_suit for rank in CirullaCard.valid_rank]
+
+
+class CirullaKnock:
+    ''' Raw action of a player who knocks ("bussa") to show a "buona" hand of
+    three cards, then plays one of them. Knocking is an action only when the
+    game is created with knock=True, otherwise the "buona" is scored automatically.
+    '''
+
+    __slots__ = ('card',)
+
+    def __init__(self, card):
+        ''' Initialize the action
+
+        Args:
+            card (CirullaCard): The card played after knocking
+        '''
+        self.card = card
+
+    def __eq__(self, other):
+        if isinstance(other, CirullaKnock):
+            return self.card is other.card
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(('knock', self.card.card_id))
+
+    def __str__(self):
+        return 'knock ' + str(self.card)
+
+
+# the knock actions indexed by the id of the card played
+KNOCKS = [CirullaKnock(card) for card in CARDS]
@@ -1,7 +1,7 @@
 from copy import deepcopy
 import numpy as np
 
-from rlcard.games.cirulla.card import CirullaCard as Card
+from rlcard.games.cirulla.card import CirullaCard as Card, CirullaKnock as Knock, KNOCKS
 from rlcard.games.cirulla.dealer import CirullaDealer as Dealer
 from rlcard.games.cirulla.player import CirullaPlayer as Player
 from rlcard.games.cirulla.board import Board, Take
@@ -19,9 +19,28 @@ from rlcard.games.cirulla.utils import *
 
 class CirullaGame:
 
-    def __init__(self, allow_step_back=False, num_players=2):
-        
+    def __init__(self, allow_step_back=False, num_players=2, undo_log=True,
+                 redeal=False, knock=False, last_taker=False):
+        ''' Initialize the game
+
+        Args:
+            allow_step_back (bool): True if step_back is allowed
+            num_players (int): The number of players
+            undo_log (bool): How to step back: True to record only the changes
+                made by each move and revert them, False to snapshot (deepcopy)
+                players, board, dealer and judger before each move
+            redeal (bool): Deal the first 4 cards again when they contain
+                at least 2 aces or 3 cards with the same rank
+            knock (bool): The "buona" is scored only if the player knocks
+                ("bussare"), with the Knock actions. Otherwise it is automatic.
+            last_taker (bool): At the end of the game the cards left on the board
+                go to the last player who took cards, otherwise to the last player
+        '''
         self.allow_step_back = allow_step_back
+        self.undo_log = undo_log
+        self.redeal = redeal
+        self.knock = knock
+        self.last_taker = last_taker
         self.np_random = np.random.RandomState()
 
         self.num_players = num_players
@@ -34,7 +53,7 @@ class CirullaGame:
 
         self._is_over = False
         self.winner = None
-        self.judger = Judger()
+        self.judger = Judger(self.num_players)
 
     def configure(self, game_config):
         ''' Specifiy some game specific parameters, such as number of players
@@ -50,8 +69,18 @@ class CirullaGame:
                 (dict): The first state in one game
                 (int): Current player's id
         '''
-        self.__init__(allow_step_back= self.allow_step_back, 
-                      num_players= self.num_players)
+        # keep self.np_random, it may have been seeded by the environment
+        self.players = [Player(i) for i in range(self.num_players)]
+        self.current_player_id = self.np_random.randint(0,2)
+
+        self.payoffs = [0 for _ in range(self.num_players)]
+        self.dealer = Dealer(self.np_random)
+        self.board = Board()
+
+        self._is_over = False
+        self.winner = None
+        self.judger = Judger(self.num_players)
+        self.last_taker_id = None
         
         flip_and_check_top_4_cards(self)
 
@@ -66,11 +95,11 @@ class CirullaGame:
         
         return state, self.current_player_id
 
-    def step(self, raw_action: Card):
+    def step(self, raw_action):
         ''' Get the next state
 
         Args:
-            action (Card): card to be played
+            action (Card or Knock): card to be played, after knocking for a Knock
 
         Returns:
             (tuple): Tuple containing:
@@ -79,17 +108,36 @@ class CirullaGame:
                 (int): next plater's id
         '''
 
+        player = self.players[self.current_player_id]
+        knock = None
+        card = raw_action
+        if self.knock:
+            knock = isinstance(raw_action, Knock)
+            if knock:
+                card = raw_action.card
+
         if self.allow_step_back:
-            # First snapshot the current state
-            _players= deepcopy(self.players)
-            _current_player= deepcopy(self.current_player_id)
-            _board= deepcopy(self.board)
-            _dealer = deepcopy(self.dealer)
-            _judger= deepcopy(self.judger)
-            self.history.append((_players,_current_player,_board,_dealer,_judger))
+            if self.undo_log:
+                # Record what is needed to revert the move, the rest is derived in step_back
+                self.history.append((self.current_player_id, card, player.hand.index(card), player.scopa_sum,
+                                     [len(p.won_cards) for p in self.players], len(self.dealer.deck),
+                                     self._is_over, self.winner, self.last_taker_id))
+            else:
+                # First snapshot the current state
+                _players= deepcopy(self.players)
+                _current_player= deepcopy(self.current_player_id)
+                _board= deepcopy(self.board)
+                _dealer = deepcopy(self.dealer)
+                _judger= deepcopy(self.judger)
+                self.history.append((_players,_current_player,_board,_dealer,_judger,
+                                     self._is_over,self.winner,self.last_taker_id))
 
         # current player plays card and update: hand, board, won_cards, scopa_sum
-        self.players[self.current_player_id].play_card(raw_action, self.board)
+        num_won_cards = len(player.won_cards)
+        player.play_card(card, self.board, knock)
+        if len(player.won_cards) > num_won_cards:
+            self.judger.record_won_cards(player.player_id, player.won_cards[num_won_cards:])
+            self.last_taker_id = player.player_id
         
         # check if game or round is over 
         self.is_game_or_round_over()
@@ -109,10 +157,58 @@ class CirullaGame:
         '''
         if not self.history:
             return False
-        self.players, self.current_player_id, \
-        self.board, self.dealer, self.judger = self.history.pop()
+        if self.undo_log:
+            self._undo_move(*self.history.pop())
+        else:
+            self.players, self.current_player_id, \
+            self.board, self.dealer, self.judger, \
+            self._is_over, self.winner, self.last_taker_id = self.history.pop()
         return True
 
+    def _undo_move(self, player_id, card, hand_index, scopa_sum, num_won_cards, deck_size,
+                   is_over, winner, last_taker_id):
+        ''' Revert a move recorded by step, in O(number of cards moved)
+
+        Args:
+            player_id (int): The player who played the card
+            card (Card): The card played
+            hand_index (int): The position of the card in the player's hand
+            scopa_sum (int): The player's scopa_sum before the move
+            num_won_cards (list): The number of won cards of each player before the move
+            deck_size (int): The number of cards in the deck before the move
+            is_over (bool): Whether the game was over before the move
+            winner: The winner before the move
+            last_taker_id (int): The last player who took cards before the move
+        '''
+        player = self.players[player_id]
+
+        # a new round was dealt: put the cards back on the deck in reverse order
+        if len(self.dealer.deck) < deck_size:
+            for p in reversed(self.players):
+                for _ in range(3):
+                    self.dealer.deck.append(p.hand.pop())
+
+        # the cards won with the move (the take, the played card and the cards left on the
+        # board at the end of the game) go back to the board, except for the played card
+        if card in self.board.cards:
+            self.board.remove_cards([card])
+        for p, n in zip(self.players, num_won_cards):
+            won_cards = p.won_cards[n:]
+            if not won_cards:
+                continue
+            del p.won_cards[n:]
+            self.judger.remove_won_cards(p.player_id, won_cards)
+            for c in won_cards:
+                if c != card:
+                    self.board.add_card(c)
+
+        player.hand.insert(hand_index, card)
+        player.scopa_sum = scopa_sum
+        self.current_player_id = player_id
+        self._is_over = is_over
+        self.winner = winner
+        self.last_taker_id = last_taker_id
+
     def get_state(self, player_id: int) -> dict:
         ''' Return player's state
 
@@ -143,7 +239,8 @@ class CirullaGame:
         for player in self.players:
             state['num_cards'].append(len(player.hand))
 
-        # TODO: maybe add scopa_sum of all players to the state
+        state['my_scopa_sum'] = player.scopa_sum
+        state['opponents_scopa_sum'] = opponent_player.scopa_sum
 
         return state
 
@@ -151,16 +248,18 @@ class CirullaGame:
         ''' Return the legal actions for a player
 
         Returns:
-            (list): A list of legal actions (as card object)
+            (list): A list of legal actions (as card object), followed by the
+                knock actions (Knock objects) if the player can knock
         '''
 
         # optional TODO: 
-        # - add the possibility to choose if "bussare" or not
         # - check if this function needs the current player or whatever player_id is passed
 
-        hand = self.players[player_id].hand
+        player = self.players[player_id]
+        if self.knock and player.has_buona():
+            return player.hand + [KNOCKS[card.card_id] for card in player.hand]
 
-        return hand
+        return player.hand
     
     def get_payoffs(self):
         ''' Return the payoffs of the game
@@ -178,15 +277,15 @@ class CirullaGame:
                 self.payoffs[1 - winner] = -1
         return self.payoffs
     
-    @staticmethod
-    def get_num_actions():
+    def get_num_actions(self):
         ''' Return the number of applicable actions
 
         Returns:
             (int): The number of actions. 
-            There are 40 actions, 1 for each card in the deck
+            There are 40 actions, 1 for each card in the deck,
+            and 40 more to knock and play each card with the knock rule
         '''
-        return 40
+        return 80 if self.knock else 40
     
     def get_num_players(self):
         return self.num_players
@@ -201,10 +300,13 @@ class CirullaGame:
         are_hands_empty= self.players[0].hand==[] and self.players[1].hand==[]
         if self.dealer.is_deck_empty():
             if are_hands_empty: # game finished
-                # TODO: complicate left cards: 
-                # if there are cards on the board, the player who took the last cards takes them
-                
-                self.players[self.current_player_id].won_cards.extend(self.board.cards)
+                # the cards left on the board go to the last player who took cards
+                # with the last taker rule, otherwise to the player who played last
+                player_id = self.current_player_id
+                if self.last_taker and self.last_taker_id is not None:
+                    player_id = self.last_taker_id
+                self.players[player_id].won_cards.extend(self.board.cards)
+                self.judger.record_won_cards(player_id, self.board.cards)
                 self.board.cards= []
                 self._is_over= True
                 self.winner= self.judger.judge_winner(self.players)
@@ -1,22 +1,130 @@
 
-from rlcard.games.cirulla.card import CirullaCard as Card
+from rlcard.games.cirulla.card import CirullaCard as Card, PRIMIERA_VALUES
 from rlcard.games.cirulla.player import CirullaPlayer as Player
 
-PRIMIERA_VALUES = {
-    7: 21,
-    6: 18,
-    1: 16,
-    5: 15,
-    4: 14,
-    3: 13,
-    2: 12,
-    10: 10,
-    9: 10,
-    8: 10,
-}
+
+def _primiera_of_suit(rank_mask):
+    ''' Best primiera value among the ranks of a 10-bit mask of one suit, 0 if empty
+    '''
+    values = [PRIMIERA_VALUES[r + 1] for r in range(10) if rank_mask >> r & 1]
+    return max(values, default=0)
+
+
+def _diamond_points(rank_mask):
+    ''' Points of "grande", "piccola" and "settebello" for a 10-bit mask of diamonds
+    '''
+    points = 0
+    # "Grande" ("Big"): J, Q, K
+    if rank_mask & 0b1110000000 == 0b1110000000:
+        points += 5
+    # "Piccola" ("Small"): A, 2, 3 and then 4, 5, 6 in sequence
+    if rank_mask & 0b111 == 0b111:
+        points += 3
+        for r in range(3, 6):
+            if rank_mask >> r & 1:
+                points += 1
+            else:
+                break
+    # "Settebello" (Seven of Diamonds)
+    if rank_mask >> 6 & 1:
+        points += 1
+    return points
+
+
+# indexed by the 10-bit mask of the ranks won in a suit (bit i set if rank id i is won)
+PRIMIERA_OF_SUIT = [_primiera_of_suit(m) for m in range(1 << 10)]
+DIAMOND_POINTS = [_diamond_points(m) for m in range(1 << 10)]
+DIAMONDS_SUIT_ID = 2
+
+
+def count_suit_ranks_points(suit_ranks: list[int], num_cards: int) -> int:
+    ''' Points of the won cards, without the points scored during the game
+
+    Args:
+        suit_ranks (list): for each suit, the 10-bit mask of the ranks won
+        num_cards (int): The number of cards won
+
+    Returns:
+        (int): The points
+    '''
+    s = DIAMOND_POINTS[suit_ranks[DIAMONDS_SUIT_ID]]
+
+    # "Primiera" (special scoring system in Cirulla): 2 sevens e 2 sixes
+    primiera = [PRIMIERA_OF_SUIT[m] for m in suit_ranks]
+    if all(primiera) and sum(primiera) >= 21 * 2 + 18 * 2:
+        s += 1
+
+    # "Cards"
+    if num_cards >= 21:
+        s += 1
+
+    # "Diamonds"
+    if suit_ranks[DIAMONDS_SUIT_ID].bit_count() >= 6:
+        s += 1
+
+    return s
+
+
+class CirullaScoreTally:
+    ''' Running tallies of the cards won by a player, updated as cards are won
+    so that points and score features are computed in O(1)
+    '''
+
+    def __init__(self):
+        self.num_cards = 0
+        self.num_diamonds = 0
+        # for each suit, the mask of the ranks won (bit i set if rank id i is won)
+        self.suit_ranks = [0, 0, 0, 0]
+
+    def add(self, card: Card):
+        self.num_cards += 1
+        suit_id, rank_id = divmod(card.card_id, 10)
+        if suit_id == DIAMONDS_SUIT_ID:
+            self.num_diamonds += 1
+        self.suit_ranks[suit_id] |= 1 << rank_id
+
+    def remove(self, card: Card):
+        self.num_cards -= 1
+        suit_id, rank_id = divmod(card.card_id, 10)
+        if suit_id == DIAMONDS_SUIT_ID:
+            self.num_diamonds -= 1
+        self.suit_ranks[suit_id] &= ~(1 << rank_id)
+
+    def get_primiera(self) -> list[int]:
+        ''' Return the best primiera value of each suit, 0 if no card of the suit is won
+        '''
+        return [PRIMIERA_OF_SUIT[m] for m in self.suit_ranks]
+
+    def has_settebello(self) -> bool:
+        return bool(self.suit_ranks[DIAMONDS_SUIT_ID] >> 6 & 1)
+
+    def get_diamond_points(self) -> int:
+        ''' Return the points of "grande", "piccola" and "settebello" won so far
+        '''
+        return DIAMOND_POINTS[self.suit_ranks[DIAMONDS_SUIT_ID]]
+
+    def count_points(self) -> int:
+        return count_suit_ranks_points(self.suit_ranks, self.num_cards)
+
 
 class CirullaJudger:
 
+    def __init__(self, num_players=2):
+        ''' Initialize the judger with the tallies of the cards won by each player.
+        The game must report the won cards with record_won_cards/remove_won_cards.
+        '''
+        self.tallies = [CirullaScoreTally() for _ in range(num_players)]
+
+    def record_won_cards(self, player_id: int, cards: list[Card]):
+        tally = self.tallies[player_id]
+        for card in cards:
+            tally.add(card)
+
+    def remove_won_cards(self, player_id: int, cards: list[Card]):
+        tally = self.tallies[player_id]
+        for card in cards:
+            tally.remove(card)
+
     def judge_winner(self, players: list[Player]) -> list[Player] | Player:
         ''' Judge the winner of the game
 
@@ -43,47 +151,25 @@ class CirullaJudger:
         cards_of_suit = [c for c in cards if c.suit == suit]
         if len(cards_of_suit) == 0:
             return [] # there are no cards with that suit in the list
-        return max(cards_of_suit, key=lambda c: PRIMIERA_VALUES[c.value])
+        return max(cards_of_suit, key=lambda c: c.primiera_value)
 
     def count_points(self, player: Player) -> int:
-        s = 0
-
-        # "Grande" ("Big")
-        if {"JD", "QD", "KD"} <= set([str(c) for c in player.won_cards]):
-            s += 5
-
-        # "Piccola" ("Small")
-        if {"AD", "2D", "3D"} <= set([str(c) for c in player.won_cards]):
-            s += 3
-            for i in range(4, 7):
-                if f"{i}D" in [str(c) for c in player.won_cards]:
-                    s += 1
-                else: break
-
-        # "Settebello" (Seven of Diamonds)
-        if '7D' in [str(c) for c in player.won_cards]:
-            s += 1
-
-        # "Primiera" (special scoring system in Cirulla)
-        suits = ["S", "H", "D", "C"]
-        best_cards = []
-        for suit in suits:
-            best_card: Card = self.calculate_best_primiera_card_of_suit(player.won_cards, suit)
-            best_cards.append(best_card)
-        # 2 sevens e 2 sixes
-        if all([c!=[] for c in best_cards]):  # if all suits are present in list
-            if sum([PRIMIERA_VALUES[c.value] for c in best_cards]) >= 21 * 2 + 18 * 2:
-                s += 1
-
-        # "Cards" 
-        if len(player.won_cards) >= 21:
-            s += 1
-        
-        # "Diamonds"
-        if len([c for c in player.won_cards if c.suit == "D"]) >= 6:
-            s += 1
-
-        return s + player.scopa_sum
+        ''' Count the points of a player from the tally of its won cards. If the
+        tally does not hold as many cards as player.won_cards (cards not reported
+        with record_won_cards), it is rebuilt from player.won_cards first.
+
+        Args:
+            player (Player): The player
+
+        Returns:
+            (int): The points, including the ones scored during the game
+        '''
+        tally = self.tallies[player.player_id]
+        if tally.num_cards != len(player.won_cards):
+            tally = self.tallies[player.player_id] = CirullaScoreTally()
+            for card in player.won_cards:
+                tally.add(card)
+        return tally.count_points() + player.scopa_sum
     
 # import numpy as np
 # state= np.random.RandomState(10)
@@ -35,54 +35,53 @@ class CirullaPlayer:
             return all([c.value == val for c in cards])
         return False
 
-    def play_card(self, card: Card, board: Board) -> Take:
+    def has_buona(self) -> bool:
+        ''' Check if the player can knock ("bussare") to score a "buona"
+        '''
+        return self.is_buona_ten() or self.is_buona_three()
+
+    def play_card(self, card: Card, board: Board, knock=None) -> Take:
         """
         Plays a card on the board and updates the player's score.
 
         Args:
             card (Card): The card to be played.
             board (Board): The current state of the game board.
+            knock (bool): Whether the player knocked ("bussare") before playing.
+                The "buona" is scored only when knocking, or always if None.
 
         Returns:
             take (Take): The take that the card will be used for.
         """
 
         # Check for "buona" 
-        if self.is_buona_ten():
-            self.scopa_sum += 10
-        if self.is_buona_three():
-            self.scopa_sum += 3
+        if knock is None or knock:
+            if self.is_buona_ten():
+                self.scopa_sum += 10
+            if self.is_buona_three():
+                self.scopa_sum += 3
         
-        best_take= Take([])
-
         # aces take everything on the board (if no ace is already present)
         if card.value == 1 and 1 not in [c.value for c in board.cards] and not board.is_empty():
             self.scopa_sum += 1
+            best_take= Take(board.cards)
             self.won_cards.extend(board.cards)
             self.won_cards.append(card)
-            board.cards = []
-            best_take= Take(self.won_cards)
+            best_take.add(card)
+            board.clear()
         
         else:
-            possible_takes= set(board.find_all_takes())
-            for take in possible_takes:
-                if card.value == take.value:
-                    if set(take.cards) == set(board.cards): # scopa is made
-                        best_take= take
-                        break
-                    else:
-                        if len(best_take.cards) < len(take.cards): # more cards taken the better
-                            best_take= take
+            best_take= board.find_best_take(card)
         
             if best_take != Take([]):
-                best_take.cards.add(card)
+                board.remove_cards(best_take.cards)
+                best_take.add(card)
                 self.won_cards.extend(best_take.cards)
-                board.cards = list(set(board.cards) - set(best_take.cards))
                 # check if "scopa" is made (no cards left on the board)
-                if len(board.cards) == 0:
+                if board.is_empty():
                     self.scopa_sum += 1
             else:
-                board.cards.append(card)
+                board.add_card(card)
         
         self.hand.remove(card)
         
@@ -0,0 +1,203 @@
+''' Exact Cirulla endgame solver.
+
+In the Cirulla environment both hands are observed, so the only hidden
+information is the order of the deck. Once the deck is empty the game is a
+deterministic two-player zero-sum game, solved here with alpha-beta search.
+When a few cards are left in the deck, the deals are chance nodes averaged
+over every possible split of the unseen cards (expectimax).
+
+Values are expected payoffs (1 win, 0 draw, -1 loss) of the player to move.
+The rules are the default ones of CirullaGame (none of the optional rules).
+'''
+from collections import namedtuple
+from itertools import combinations
+
+from rlcard.games.cirulla.bitboard import FULL_MASK, popcount, iter_card_ids, \
+    mask_from_card_ids, play_card, count_points
+
+# hands, won and scopa_sums are indexed by player id
+CirullaPosition = namedtuple('CirullaPosition', ['hands', 'board', 'won', 'scopa_sums', 'player_id'])
+
+# flags of the transposition table entries
+EXACT, LOWER, UPPER = 0, 1, 2
+
+
+def _cards_mask(cards):
+    return mask_from_card_ids(card.card_id for card in cards)
+
+
+def position_from_game(game):
+    ''' Get the position of a CirullaGame or a CirullaBitboardGame
+    '''
+    if hasattr(game, 'hands'):
+        return CirullaPosition(tuple(game.hands), game.board, tuple(game.won),
+                               tuple(game.scopa_sums), game.current_player_id)
+    return CirullaPosition(tuple(_cards_mask(p.hand) for p in game.players),
+                           _cards_mask(game.board.cards),
+                           tuple(_cards_mask(p.won_cards) for p in game.players),
+                           tuple(p.scopa_sum for p in game.players),
+                           game.current_player_id)
+
+
+def position_from_state(state):
+    ''' Get the position from the raw state of the player to move (game.get_state)
+    '''
+    player_id = state['current_player']
+    if 'masks' in state:
+        board, my_hand, opponents_hand, my_won, opponents_won = state['masks']
+    else:
+        board = _cards_mask(state['board'])
+        my_hand, opponents_hand = _cards_mask(state['my_hand']), _cards_mask(state['opponents_hand'])
+        my_won, opponents_won = _cards_mask(state['my_won_cards']), _cards_mask(state['opponents_won_cards'])
+    hands, won, scopa_sums = [None, None], [None, None], [None, None]
+    hands[player_id], hands[1 - player_id] = my_hand, opponents_hand
+    won[player_id], won[1 - player_id] = my_won, opponents_won
+    scopa_sums[player_id] = state['my_scopa_sum']
+    scopa_sums[1 - player_id] = state['opponents_scopa_sum']
+    return CirullaPosition(tuple(hands), board, tuple(won), tuple(scopa_sums), player_id)
+
+
+def get_deck_size(position):
+    ''' Number of cards left in the deck (the cards in no pile)
+    '''
+    known = position.board | position.hands[0] | position.hands[1] | position.won[0] | position.won[1]
+    return popcount(FULL_MASK & ~known)
+
+
+class CirullaEndgameSolver:
+    ''' Alpha-beta / expectimax search with a transposition table keyed by the
+    masks of the position. The table is shared by all the searches of a solver,
+    so solving the successive positions of a game reuses the previous work.
+    '''
+
+    def __init__(self, max_deck_size=6, max_table_size=1 << 22):
+        ''' Initialize the solver
+
+        Args:
+            max_deck_size (int): Solve only positions with at most that many cards
+                left in the deck. 0 is the last round, 6 adds the last deal
+                (20 chance outcomes), 12 adds 18480 more per position.
+            max_table_size (int): The transposition table is cleared when it grows
+                larger than that
+        '''
+        self.max_deck_size = max_deck_size
+        self.max_table_size = max_table_size
+        self.table = {}
+
+    def can_solve(self, position) -> bool:
+        return get_deck_size(position) <= self.max_deck_size
+
+    def value(self, position) -> float:
+        ''' Return the expected payoff of the player to move with perfect play of both players
+
+        Args:
+            position (CirullaPosition): The position to solve
+
+        Returns:
+            (float): The value in [-1, 1]
+        '''
+        hand, other_hand, won, other_won, scopa_diff = self._perspective(position)
+        return self._search(hand, other_hand, position.board, won, other_won, scopa_diff, -1, 1)
+
+    def action_values(self, position) -> dict:
+        ''' Return the exact value of every legal action of the player to move
+
+        Args:
+            position (CirullaPosition): The position to solve
+
+        Returns:
+            (dict): card id -> value in [-1, 1] for the player to move
+        '''
+        hand, other_hand, won, other_won, scopa_diff = self._perspective(position)
+        return {card_id: self._play(card_id, hand, other_hand, position.board,
+                                    won, other_won, scopa_diff, -1, 1)
+                for card_id in iter_card_ids(hand)}
+
+    def best_action(self, position) -> int:
+        ''' Return the id of the card with the highest value, the lowest id among ties
+        '''
+        return self.best_action_and_values(position)[0]
+
+    def best_action_and_values(self, position) -> tuple:
+        ''' Return the best action as best_action does, and the values of action_values
+
+        Args:
+            position (CirullaPosition): The position to solve
+
+        Returns:
+            (tuple): The id of the best card, and the dict card id -> value
+        '''
+        action_values = self.action_values(position)
+        return max(action_values, key=lambda card_id: (action_values[card_id], -card_id)), action_values
+
+    @staticmethod
+    def _perspective(position):
+        player_id = position.player_id
+        opponent_id = 1 - player_id
+        return (position.hands[player_id], position.hands[opponent_id],
+                position.won[player_id], position.won[opponent_id],
+                position.scopa_sums[player_id] - position.scopa_sums[opponent_id])
+
+    def _search(self, hand, other_hand, board, won, other_won, scopa_diff, alpha, beta):
+        ''' Negamax alpha-beta search, the value is the one of the player holding hand
+        '''
+        key = (hand, other_hand, board, won, other_won, scopa_diff)
+        entry = self.table.get(key)
+        if entry is not None:
+            value, flag = entry
+            if flag == EXACT or (flag == LOWER and value >= beta) or (flag == UPPER and value <= alpha):
+                return value
+
+        # try first the moves taking the most cards
+        moves = []
+        for card_id in iter_card_ids(hand):
+            moves.append((-popcount(play_card(card_id, hand, board)[2]), card_id))
+        moves.sort()
+
+        original_alpha = alpha
+        best = -1
+        for _, card_id in moves:
+            value = self._play(card_id, hand, other_hand, board, won, other_won, scopa_diff, alpha, beta)
+            if value > best:
+                best = value
+            if best > alpha:
+                alpha = best
+            if alpha >= beta:
+                break
+
+        if len(self.table) >= self.max_table_size:
+            self.table.clear()
+        if best <= original_alpha:
+            self.table[key] = (best, UPPER)
+        elif best >= beta:
+            self.table[key] = (best, LOWER)
+        else:
+            self.table[key] = (best, EXACT)
+        return best
+
+    def _play(self, card_id, hand, other_hand, board, won, other_won, scopa_diff, alpha, beta):
+        ''' Value of playing a card for the player holding hand
+        '''
+        hand, board, won_cards, points = play_card(card_id, hand, board)
+        won |= won_cards
+        scopa_diff += points
+
+        if hand or other_hand:
+            return -self._search(other_hand, hand, board, other_won, won, -scopa_diff, -beta, -alpha)
+
+        deck = FULL_MASK & ~(board | won | other_won)
+        if not deck:
+            # game finished, the player who played last takes the board
+            points = count_points(won | board, scopa_diff) - count_points(other_won)
+            return (points > 0) - (points < 0)
+
+        # round finished: average over the deals of the unseen cards, the other player moves next
+        deck_ids = list(iter_card_ids(deck))
+        total, num_deals = 0, 0
+        for first_ids in combinations(deck_ids, 3):
+            first = mask_from_card_ids(first_ids)
+            for second_ids in combinations(list(iter_card_ids(deck & ~first)), 3):
+                second = mask_from_card_ids(second_ids)
+                total += self._search(second, first, board, other_won, won, -scopa_diff, -1, 1)
+                num_deals += 1
+        return -total / num_deals
@@ -1,17 +1,14 @@
 
-from rlcard.games.cirulla.card import CirullaCard as Card
+from rlcard.games.cirulla.card import CirullaCard as Card, CirullaKnock as Knock, CARDS, KNOCKS
 import numpy as np
 
 def init_deck():
     ''' Initialize a Cirulla deck of 40 cards
 
     Returns:
-        (list): A list of Card object
+        (list): A list of Card object, ordered by card id
     '''
-    suit_list = ['S', 'H', 'D', 'C']
-    rank_list = ['A', '2', '3', '4', '5', '6', '7', 'J', 'Q', 'K']
-    res = [Card(suit, rank) for suit in suit_list for rank in rank_list]
-    return res
+    return list(CARDS)
 
 
 def cards2list(cards):
@@ -59,25 +56,38 @@ def flip_and_check_top_4_cards(game):
 
     '''
 
-    # TODO: Implement logic for checking if in the 4 cards:
-    # - there are at least 2 aces
-    # - there are at least 3 cards with the same rank
-    # - there are at least 4 cards with the same rank (victory)
-    # while loop until the condition is met
-    
     top = game.dealer.flip_top_4_cards()
+    # with the redeal rule, flip a new deck until the 4 cards are valid
+    while game.redeal and is_redeal_needed(top):
+        top = game.dealer.flip_top_4_cards()
 
     top_sum = sum([c.value for c in top])
     if top_sum in [15, 30]:     
         points = 1 if top_sum == 15 else 2
         game.players[game.current_player_id].scopa_sum += points
         game.players[game.current_player_id].won_cards.extend(top)
+        game.judger.record_won_cards(game.current_player_id, top)
         game.board.cards = []
     else:
         game.board.cards = top
     switch_player(game)
 
 
+def is_redeal_needed(cards: list[Card]) -> bool:
+    ''' Check if the 4 flipped cards must be dealt again: they contain
+    at least 2 aces or at least 3 cards with the same rank (which includes
+    4 cards with the same rank)
+
+    Args:
+        cards (list): The flipped cards
+
+    Returns:
+        (bool): True if the cards must be dealt again
+    '''
+    ranks = [card.rank for card in cards]
+    return ranks.count('A') >= 2 or max(ranks.count(rank) for rank in ranks) >= 3
+
+
 def switch_player(game):
     ''' Switch to the next player
 
@@ -93,37 +103,54 @@ def switch_player(game):
 # functions below are copied from gin_rummy implementation (a big thanks to the authors)
 def encode_cards(cards: list[Card]) -> np.ndarray:
     plane = np.zeros(40, dtype=int)
-    for card in cards:
-        card_id = get_card_id(card)
-        plane[card_id] = 1
+    plane[[card.card_id for card in cards]] = 1
     return plane
 
 def get_card_id(card: Card) -> int:
-    rank_id = get_rank_id(card)
-    suit_id = get_suit_id(card)
-    return rank_id + 10 * suit_id
+    return card.card_id
 
 
 def get_rank_id(card: Card) -> int:
-    return Card.valid_rank.index(card.rank)
+    return card.card_id % 10
 
 
 def get_suit_id(card: Card) -> int:
-    return Card.valid_suit.index(card.suit)
+    return card.card_id // 10
 
 def card_from_card_id(card_id: int) -> Card:
     ''' Make card from its card_id
 
     Args:
-        card_id: int in range(0, 52)
+        card_id: int in range(0, 40)
      '''
     if not (0 <= card_id < 40):
         raise Exception("card_id is {}: should be 0 <= card_id < 40.".format(card_id))
-    rank_id = card_id % 10
-    suit_id = card_id // 10
-    rank = Card.valid_rank[rank_id]
-    suit = Card.valid_suit[suit_id]
-    return Card(rank=rank, suit=suit)
+    return CARDS[card_id]
+
+
+def get_action_id(raw_action) -> int:
+    ''' Get the action id of a raw action: the card id for a card,
+    40 + the card id for knocking and playing a card
+
+    Args:
+        raw_action (Card or Knock): The raw action
+    '''
+    if isinstance(raw_action, Knock):
+        return 40 + raw_action.card.card_id
+    return raw_action.card_id
+
+
+def action_from_action_id(action_id: int):
+    ''' Make the raw action of an action id, see get_action_id
+
+    Args:
+        action_id: int in range(0, 80)
+    '''
+    if not (0 <= action_id < 80):
+        raise Exception("action_id is {}: should be 0 <= action_id < 80.".format(action_id))
+    if action_id >= 40:
+        return KNOCKS[action_id - 40]
+    return CARDS[action_id]
 
 # # test card encoding into a plane of 40
 # cards= [Card('S', 'A'), Card('H', '2'), Card('D', '3'), Card('C', 'K')]
@@ -0,0 +1,128 @@
+import numpy as np
+
+
+class ColumnarTrajectories(object):
+    ''' Trajectories of several episodes stored column by column, in numpy arrays
+    that grow by doubling, instead of nested lists of state dicts.
+
+    For each player, an episode with T actions holds T + 1 states (the decision
+    points and the final state) and T transitions. Transition t of the player's
+    episode e goes from state offsets[e] + e + t to the next one, as the transitions
+    built by reorganize: the reward is the payoff on the last transition, else 0.
+    '''
+
+    def __init__(self, num_players, num_actions, capacity=64):
+        ''' Initialize the empty columns
+
+        Args:
+            num_players (int): The number of players
+            num_actions (int): The size of the legal action masks
+            capacity (int): The initial number of states per player
+        '''
+        self.num_players = num_players
+        self.num_actions = num_actions
+        self.capacity = capacity
+        self.clear()
+
+    def clear(self):
+        ''' Remove all the episodes, keeping the allocated arrays
+        '''
+        if not hasattr(self, 'obs'):
+            # allocated on the first state, with the shape and dtype of its observation
+            self.obs = [None for _ in range(self.num_players)]
+            self.legal_masks = [np.zeros((self.capacity, self.num_actions), dtype=bool)
+                                for _ in range(self.num_players)]
+            self.actions = [np.zeros(self.capacity, dtype=np.int64) for _ in range(self.num_players)]
+        self.num_states = [0 for _ in range(self.num_players)]
+        self.num_transitions = [0 for _ in range(self.num_players)]
+        # transition offsets of the episodes, the last entry is the total
+        self.offsets = [[0] for _ in range(self.num_players)]
+        self.payoffs = []
+
+    @property
+    def num_episodes(self):
+        return len(self.payoffs)
+
+    def add_state(self, player_id, state):
+        ''' Append the observation and the legal actions of a state
+
+        Args:
+            player_id (int): The id of the player observing the state
+            state (dict): The state, as returned by the environment
+        '''
+        n = self.num_states[player_id]
+        obs = state['obs']
+        if self.obs[player_id] is None:
+            self.obs[player_id] = np.zeros((len(self.actions[player_id]),) + obs.shape, dtype=obs.dtype)
+        if n == len(self.obs[player_id]):
+            self._grow(player_id)
+        self.obs[player_id][n] = obs
+        if 'legal_mask' in state:
+            self.legal_masks[player_id][n] = state['legal_mask']
+        else:
+            self.legal_masks[player_id][n] = False
+            self.legal_masks[player_id][n, list(state['legal_actions'].keys())] = True
+        self.num_states[player_id] = n + 1
+
+    def add_action(self, player_id, action):
+        ''' Append the action taken by a player in its last state
+
+        Args:
+            player_id (int): The id of the player
+            action (int): The action id
+        '''
+        n = self.num_transitions[player_id]
+        self.actions[player_id][n] = action
+        self.num_transitions[player_id] = n + 1
+
+    def end_episode(self, payoffs):
+        ''' Close the current episode of every player
+
+        Args:
+            payoffs (list): The payoffs of the episode
+        '''
+        for player_id in range(self.num_players):
+            self.offsets[player_id].append(self.num_transitions[player_id])
+        self.payoffs.append(list(payoffs))
+
+    def _grow(self, player_id):
+        ''' Double the capacity of the columns of a player
+        '''
+        for columns in [self.obs, self.legal_masks, self.actions]:
+            array = columns[player_id]
+            grown = np.zeros((2 * len(array),) + array.shape[1:], dtype=array.dtype)
+            grown[:len(array)] = array
+            columns[player_id] = grown
+
+    def get_transitions(self, player_id):
+        ''' Get all the transitions of a player, with bulk indexing
+
+        Args:
+            player_id (int): The id of the player
+
+        Returns:
+            (tuple): Tuple containing, one row per transition:
+
+                (numpy.array): The observations
+                (numpy.array): The actions
+                (numpy.array): The rewards
+                (numpy.array): The next observations
+                (numpy.array): The legal action masks of the next states
+                (numpy.array): True for the last transition of an episode
+        '''
+        offsets = np.array(self.offsets[player_id])
+        lengths = np.diff(offsets)
+        num_transitions = offsets[-1]
+        episodes = np.repeat(np.arange(len(lengths)), lengths)
+        # the states of episode e start at offsets[e] + e
+        states = np.arange(num_transitions) + episodes
+        dones = np.zeros(num_transitions, dtype=bool)
+        rewards = np.zeros(num_transitions, dtype=np.float32)
+        ends = offsets[1:][lengths > 0] - 1
+        dones[ends] = True
+        rewards[ends] = np.array([payoffs[player_id] for payoffs in self.payoffs])[lengths > 0]
+        obs = self.obs[player_id]
+        if obs is None:
+            obs = np.zeros((0,))
+        return (obs[states], self.actions[player_id][:num_transitions], rewards,
+                obs[states + 1], self.legal_masks[player_id][states + 1], dones)
@@ -224,6 +224,217 @@ def tournament(env, num):
         payoffs[i] /= counter
     return payoffs
 
+def run_batched(envs, num_games, is_training=False):
+    ''' Play games in several environments concurrently, batching the decisions
+
+    At every tick, the decision points pending in all the environments are grouped
+    by agent. An agent with a batch_step method is called once per tick with the
+    stacked observations and the boolean masks of the legal actions. The other
+    agents (e.g. the ones using raw actions) are called state by state, as in Env.run.
+
+    Args:
+        envs (list): Environments of the same game, the agents of envs[0] play in all of them
+        num_games (int): The number of games to play
+        is_training (boolean): True if for training purpose, see Env.run
+
+    Returns:
+        (tuple) Tuple containing:
+
+            (list): The trajectories of every game, as returned by Env.run
+            (list): The payoffs of every game
+
+    Note: The games are returned in the order they finish. Each pair of trajectories
+          and payoffs can be passed to reorganize.
+    '''
+    agents = envs[0].agents
+    num_actions = envs[0].num_actions
+    all_trajectories, all_payoffs = [], []
+
+    # per environment: [state, player_id, trajectories] of the game being played
+    slots = {}
+    num_started = 0
+    for env in envs[:num_games]:
+        state, player_id = env.reset()
+        trajectories = [[] for _ in range(env.num_players)]
+        trajectories[player_id].append(state)
+        slots[env] = [state, player_id, trajectories]
+        num_started += 1
+
+    while slots:
+        # group the pending decisions by agent, an agent may play several seats
+        groups = {}
+        for env, (_, player_id, _) in slots.items():
+            agent = agents[player_id]
+            groups.setdefault(id(agent), (agent, []))[1].append(env)
+
+        actions = {}
+        for agent, group in groups.values():
+            states = [slots[env][0] for env in group]
+            if hasattr(agent, 'batch_step') and not agent.use_raw:
+                obs = np.stack([state['obs'] for state in states])
+                if all('legal_mask' in state for state in states):
+                    legal_masks = np.stack([state['legal_mask'] for state in states])
+                else:
+                    legal_masks = np.zeros((len(states), num_actions), dtype=bool)
+                    for i, state in enumerate(states):
+                        legal_masks[i, list(state['legal_actions'].keys())] = True
+                batch_actions = agent.batch_step(obs, legal_masks, is_training)
+                actions.update(zip(group, batch_actions.tolist()))
+            elif is_training:
+                actions.update((env, agent.step(state)) for env, state in zip(group, states))
+            else:
+                actions.update((env, agent.eval_step(state)[0]) for env, state in zip(group, states))
+
+        # step the environments, recording the trajectories as Env.run does
+        for env in list(slots):
+            _, player_id, trajectories = slots[env]
+            action = actions[env]
+            next_state, next_player_id = env.step(action, agents[player_id].use_raw)
+            trajectories[player_id].append(action)
+            if not env.game.is_over():
+                trajectories[next_player_id].append(next_state)
+                slots[env][:2] = next_state, next_player_id
+                continue
+
+            for player_id in range(env.num_players):
+                trajectories[player_id].append(env.get_state(player_id))
+            all_trajectories.append(trajectories)
+            all_payoffs.append(env.get_payoffs())
+            del slots[env]
+            if num_started < num_games:
+                state, player_id = env.reset()
+                trajectories = [[] for _ in range(env.num_players)]
+                trajectories[player_id].append(state)
+                slots[env] = [state, player_id, trajectories]
+                num_started += 1
+
+    return all_trajectories, all_payoffs
+
+def _seed_shard(seed):
+    ''' Seed the global random generators, which the agents draw from
+    '''
+    import random
+    import sys
+    np.random.seed(seed)
+    random.seed(seed)
+    if 'torch' in sys.modules:
+        sys.modules['torch'].manual_seed(seed)
+
+def _global_random_states():
+    ''' The states of the global random generators seeded by _seed_shard
+    '''
+    import random
+    import sys
+    torch_state = sys.modules['torch'].get_rng_state() if 'torch' in sys.modules else None
+    return np.random.get_state(), random.getstate(), torch_state
+
+def _set_global_random_states(states):
+    ''' Restore the states returned by _global_random_states
+    '''
+    import random
+    import sys
+    np_state, random_state, torch_state = states
+    np.random.set_state(np_state)
+    random.setstate(random_state)
+    if torch_state is not None:
+        sys.modules['torch'].set_rng_state(torch_state)
+
+def _tournament_shard(env_id, config, agents, num, seed):
+    ''' Play the games of one shard of parallel_tournament, usually in a worker process
+
+    Returns:
+        (tuple): The number of games, the sums and the sums of squares of the payoffs
+    '''
+    import rlcard
+    env = rlcard.make(env_id, config=dict(config, seed=seed))
+    _seed_shard(seed)
+    if callable(agents):
+        agents = agents(env)
+    env.set_agents(agents)
+
+    sums = np.zeros(env.num_players)
+    squares = np.zeros(env.num_players)
+    counter = 0
+    while counter < num:
+        _, _payoffs = env.run(is_training=False)
+        for _p in (_payoffs if isinstance(_payoffs, list) else [_payoffs]):
+            sums += _p
+            squares += np.square(_p)
+            counter += 1
+    return counter, sums, squares
+
+def parallel_tournament(env_id, agents, num, config=None, num_workers=None,
+                        seed=0, num_shards=None, confidence=0.95):
+    ''' Evaluate the performance of the agents, with the games sharded across processes
+
+    Every shard makes its own environment and seeds it, and the global random
+    generators of the agents, from a seed derived from seed and the shard index.
+    The results only depend on seed and num_shards: any num_workers, including
+    1 which plays the shards serially in this process, gives the same averages.
+    The global random generators of this process are restored after the shards
+    it plays.
+
+    With num_shards=1 the only shard uses seed itself, and the averages are the
+    ones of tournament(rlcard.make(env_id, config=dict(config, seed=seed)), num)
+    after seeding np.random, random and torch with seed. With more shards the
+    games differ from the ones of tournament, so the averages differ too, up to
+    the sampling error given by the confidence intervals.
+
+    Args:
+        env_id (string): The name of the environment
+        agents (list or callable): The agents, pickled to the workers, or a
+            picklable function making the agents given the environment
+        num (int): The number of games to play
+        config (dict): The environment settings, the seed is set per shard
+        num_workers (int): The number of processes, the number of CPUs if None
+        seed (int): The seed of the tournament
+        num_shards (int): The number of shards, min(num, 100) if None
+        confidence (float): The confidence level of the intervals
+
+    Returns:
+        (tuple): Tuple containing:
+
+            (list): The average payoffs of each player
+            (list): The (low, high) confidence interval of each average payoff
+    '''
+    import os
+    from statistics import NormalDist
+
+    config = config or {}
+    num_workers = num_workers or os.cpu_count()
+    num_shards = num_shards or min(num, 100)
+    if num_shards == 1:
+        seeds = [seed]
+    else:
+        seeds = [int(s.generate_state(1)[0]) for s in np.random.SeedSequence(seed).spawn(num_shards)]
+    # spread the games over the shards, the first ones get one more
+    nums = [num // num_shards + (i < num % num_shards) for i in range(num_shards)]
+    args = [(env_id, config, agents, n, s) for n, s in zip(nums, seeds) if n > 0]
+
+    if num_workers == 1:
+        states = _global_random_states()
+        try:
+            results = [_tournament_shard(*a) for a in args]
+        finally:
+            _set_global_random_states(states)
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=min(num_workers, len(args))) as executor:
+            results = list(executor.map(_tournament_shard, *zip(*args)))
+
+    # aggregate in shard order, so that the sums do not depend on the scheduling
+    counter = 0
+    sums, squares = 0, 0
+    for _counter, _sums, _squares in results:
+        counter += _counter
+        sums = sums + _sums
+        squares = squares + _squares
+    payoffs = sums / counter
+    variances = np.maximum(squares / counter - np.square(payoffs), 0) * counter / max(counter - 1, 1)
+    half_widths = NormalDist().inv_cdf((1 + confidence) / 2) * np.sqrt(variances / counter)
+    intervals = [(p - h, p + h) for p, h in zip(payoffs.tolist(), half_widths.tolist())]
+    return payoffs.tolist(), intervals
+
 def plot_curve(csv_path, save_path, algorithm):
     ''' Read data from csv file and plot the results
     '''
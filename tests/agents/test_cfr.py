@@ -1,4 +1,6 @@
 import unittest
+import os
+import pickle
 import numpy as np
 
 import rlcard
@@ -30,8 +32,66 @@ class TestNFSP(unittest.TestCase):
 
         new_agent = CFRAgent(env, model_path='experiments/cfr_model')
         new_agent.load()
-        self.assertEqual(len(agent.policy), len(new_agent.policy))
-        self.assertEqual(len(agent.average_policy), len(new_agent.average_policy))
-        self.assertEqual(len(agent.regrets), len(new_agent.regrets))
+        self.assertEqual(agent.num_infosets, new_agent.num_infosets)
+        self.assertEqual(agent.infosets, new_agent.infosets)
+        num_infosets = agent.num_infosets
+        self.assertTrue(np.array_equal(agent.policy[:num_infosets], new_agent.policy[:num_infosets]))
+        self.assertTrue(np.array_equal(agent.average_policy[:num_infosets], new_agent.average_policy[:num_infosets]))
+        self.assertTrue(np.array_equal(agent.regrets[:num_infosets], new_agent.regrets[:num_infosets]))
         self.assertEqual(agent.iteration, new_agent.iteration)
+        # the loaded tables keep growing
+        new_agent.train()
+
+    def test_grow(self):
+        env = rlcard.make('leduc-holdem', config={'allow_step_back':True})
+        agent = CFRAgent(env, model_path='experiments/cfr_model', capacity=2)
+        for _ in range(10):
+            agent.train()
+        self.assertGreater(agent.num_infosets, 2)
+        self.assertGreaterEqual(len(agent.regrets), agent.num_infosets)
+        self.assertEqual(sorted(agent.infosets.values()), list(range(agent.num_infosets)))
+
+    def test_regret_matching(self):
+        env = rlcard.make('leduc-holdem', config={'allow_step_back':True})
+        agent = CFRAgent(env)
+        regrets = np.array([[1., -1., 3., 0.], [-1., 0., -2., 0.]])
+        action_probs = agent.regret_matching(regrets)
+        self.assertTrue(np.allclose(action_probs[0], [0.25, 0., 0.75, 0.]))
+        self.assertTrue(np.allclose(action_probs[1], [0.25, 0.25, 0.25, 0.25]))
+
+    def test_variants(self):
+        env = rlcard.make('leduc-holdem', config={'allow_step_back':True, 'seed': 0})
+        for variant in CFRAgent.VARIANTS:
+            agent = CFRAgent(env, variant=variant)
+            self.assertEqual(agent.alternating, variant != 'vanilla')
+            for _ in range(20):
+                agent.train()
+            num_infosets = agent.num_infosets
+            self.assertTrue(np.allclose(agent.policy[:num_infosets].sum(axis=1), 1))
+            self.assertTrue((agent.average_policy[:num_infosets] >= 0).all())
+            if variant == 'cfr+':
+                self.assertTrue((agent.regrets[:num_infosets] >= 0).all())
+        with self.assertRaises(ValueError):
+            CFRAgent(env, variant='cfr++')
+
+    def test_discount(self):
+        env = rlcard.make('leduc-holdem', config={'allow_step_back':True})
+        agent = CFRAgent(env, variant='discounted', alpha=1.5, beta=0.0, gamma=2.0)
+        agent.infoset_id(b'infoset')
+        agent.regrets[0] = [4., -4., 0., 1.]
+        agent.average_policy[0] = [1., 0., 0., 1.]
+        agent.iteration = 4
+        agent.discount()
+        self.assertTrue(np.allclose(agent.regrets[0], [4. * 8 / 9, -2., 0., 8 / 9]))
+        self.assertTrue(np.allclose(agent.average_policy[0], [0.64, 0., 0., 0.64]))
+
+    def test_load_dicts(self):
+        env = rlcard.make('leduc-holdem', config={'allow_step_back':True})
+        agent = CFRAgent(env, model_path=os.path.join(rlcard.__path__[0], 'models/pretrained/leduc_holdem_cfr'))
+        agent.load()
+        with open(os.path.join(agent.model_path, 'average_policy.pkl'), 'rb') as f:
+            average_policy = pickle.load(f)
+        self.assertEqual(agent.num_infosets, len(average_policy))
+        for obs, values in average_policy.items():
+            self.assertTrue(np.array_equal(agent.average_policy[agent.infosets[obs]], values))
 
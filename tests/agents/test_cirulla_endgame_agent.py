@@ -0,0 +1,69 @@
+import unittest
+
+import rlcard
+from rlcard.agents.cirulla_endgame_agent import CirullaEndgameAgent
+from rlcard.agents.random_agent import RandomAgent
+
+
+class TestCirullaEndgameAgent(unittest.TestCase):
+
+    def test_eval_step(self):
+        env = rlcard.make('cirulla', config={'seed': 0})
+        agent = CirullaEndgameAgent(max_deck_size=0)
+        state, _ = env.reset()
+        # before the endgame the agent plays randomly
+        action, info = agent.eval_step(state)
+        self.assertIn(action, state['legal_actions'])
+        self.assertEqual(info, {})
+        while env.game.dealer.deck:
+            state, _ = env.step(action)
+            action, info = agent.eval_step(state)
+        self.assertIn(action, state['legal_actions'])
+        self.assertEqual(len(info['values']), len(state['legal_actions']))
+        self.assertEqual(max(info['values'].values()), info['values'][str(state['legal_actions'][action])])
+
+    def test_run(self):
+        env = rlcard.make('cirulla', config={'seed': 0})
+        env.set_agents([CirullaEndgameAgent(fallback_agent=RandomAgent(env.num_actions), env=env),
+                        RandomAgent(env.num_actions)])
+        for _ in range(3):
+            _, payoffs = env.run(is_training=False)
+            self.assertEqual(sum(payoffs), 0)
+
+    def test_without_raw_obs(self):
+        env = rlcard.make('cirulla', config={'seed': 0, 'raw_obs': False})
+        raw_env = rlcard.make('cirulla', config={'seed': 0})
+        agent = CirullaEndgameAgent(max_deck_size=0, env=env)
+        state, _ = env.reset()
+        raw_state, _ = raw_env.reset()
+        while env.game.dealer.deck:
+            action = min(state['legal_actions'])
+            state, _ = env.step(action)
+            raw_state, _ = raw_env.step(action)
+        # the position is read from the game of the env, as from the raw state
+        self.assertEqual(agent.eval_step(state), CirullaEndgameAgent(max_deck_size=0).eval_step(raw_state))
+        with self.assertRaises(ValueError):
+            CirullaEndgameAgent(max_deck_size=0).eval_step(state)
+
+        env.set_agents([agent, RandomAgent(env.num_actions)])
+        for _ in range(2):
+            _, payoffs = env.run(is_training=False)
+            self.assertEqual(sum(payoffs), 0)
+
+    def test_optional_rules(self):
+        for rule in ['game_redeal', 'game_knock', 'game_last_taker']:
+            env = rlcard.make('cirulla', config={'seed': 0, rule: True})
+            state, _ = env.reset()
+            while env.game.dealer.deck:
+                state, _ = env.step(list(state['legal_actions'])[0])
+            # the endgame is not solved, the fallback agent plays
+            agent = CirullaEndgameAgent(max_deck_size=0, fallback_agent=RandomAgent(env.num_actions), env=env)
+            action, info = agent.eval_step(state)
+            self.assertIn(action, state['legal_actions'])
+            self.assertNotIn('values', info)
+            with self.assertRaises(ValueError):
+                CirullaEndgameAgent(max_deck_size=0, env=env).eval_step(state)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,168 @@
+import queue
+import unittest
+import numpy as np
+import torch
+
+import rlcard
+from rlcard.agents.dmc_agent.model import DMCAgent, DMCModel
+from rlcard.agents.dmc_agent.parameter_store import ParameterStore
+from rlcard.agents.dmc_agent.telemetry import QueueMeter, Telemetry, autoscale_decision
+from rlcard.agents.dmc_agent.utils import device_name, create_buffers, create_staging, stage_episode, flush_staging
+
+class TestDMC(unittest.TestCase):
+
+    def test_predict(self):
+        env = rlcard.make('doudizhu', config={'seed': 0})
+        action_features = np.stack([env.get_action_feature(action_id) for action_id in range(env.num_actions)])
+        agent = DMCAgent(env.state_shape[0], env.action_shape[0], mlp_layers=[16, 16], device='cpu',
+                         action_features=action_features)
+        state, _ = env.reset()
+        action_keys, values = agent.predict(state)
+        self.assertEqual(action_keys.tolist(), list(state['legal_actions'].keys()))
+
+        # the values of forward on the observation repeated for every action
+        obs = np.repeat(state['obs'][np.newaxis].astype(np.float32), len(action_keys), axis=0)
+        actions = np.stack(list(state['legal_actions'].values())).astype(np.float32)
+        expected = agent.forward(torch.from_numpy(obs), torch.from_numpy(actions)).detach().numpy()
+        self.assertTrue(np.allclose(values, expected, atol=1e-6))
+
+        # without a table, the features carried by the legal actions
+        agent.action_features = None
+        self.assertTrue(np.allclose(agent.predict(state)[1], expected, atol=1e-6))
+
+    def test_one_hot(self):
+        for env_id in ['leduc-holdem', 'cirulla']:
+            env = rlcard.make(env_id, config={'seed': 0})
+            model = DMCModel(env.state_shape, [[env.num_actions] for _ in range(env.num_players)],
+                             mlp_layers=[16], device='cpu')
+            env.set_agents(model.get_agents())
+            trajectories, _ = env.run(is_training=False)
+            self.assertEqual(len(trajectories), env.num_players)
+            agent = model.get_agent(0)
+            self.assertTrue(torch.equal(agent.action_features, torch.eye(env.num_actions)))
+
+    def test_staging(self):
+        env = rlcard.make('leduc-holdem', config={'seed': 0})
+        action_features = np.stack([env.get_action_feature(action_id) for action_id in range(env.num_actions)])
+        model = DMCModel(env.state_shape, [[env.num_actions] for _ in range(env.num_players)],
+                         mlp_layers=[16], device='cpu')
+        env.set_agents(model.get_agents())
+        T, num_buffers = 3, 8
+        buffers = create_buffers(T, num_buffers, env.state_shape,
+                                 [[env.num_actions] for _ in range(env.num_players)], ['cpu'])['cpu'][0]
+        free_queue, full_queue = queue.Queue(), queue.Queue()
+        for index in range(num_buffers):
+            free_queue.put(index)
+
+        # stage from a small capacity to exercise the growth
+        staging, size = create_staging(buffers, 1), 0
+        states, actions, dones, returns, targets = [], [], [], [], []
+        while full_queue.qsize() < 4:
+            trajectories, payoffs = env.run(is_training=True)
+            trajectory = trajectories[0]
+            num_steps = len(trajectory) // 2
+            if num_steps == 0:
+                # player 0 did not act
+                continue
+            states += [trajectory[i]['obs'] for i in range(0, 2 * num_steps, 2)]
+            actions += [env.get_action_feature(trajectory[i]) for i in range(1, 2 * num_steps, 2)]
+            dones += [False] * (num_steps - 1) + [True]
+            returns += [0.0] * (num_steps - 1) + [payoffs[0]]
+            targets += [payoffs[0]] * num_steps
+            staging, size = stage_episode(staging, size, trajectory, float(payoffs[0]), action_features)
+            size = flush_staging(staging, size, T, free_queue, full_queue, buffers)
+            self.assertLessEqual(size, T)
+            self.assertEqual(size + T * full_queue.qsize(), len(targets))
+
+        for n in range(full_queue.qsize()):
+            index = full_queue.get()
+            steps = slice(n * T, (n + 1) * T)
+            self.assertTrue(np.array_equal(buffers['state'][index].numpy(), np.array(states[steps], dtype=np.int8)))
+            self.assertTrue(np.array_equal(buffers['action'][index].numpy(), np.array(actions[steps], dtype=np.int8)))
+            self.assertEqual(buffers['done'][index].tolist(), dones[steps])
+            self.assertTrue(np.allclose(buffers['episode_return'][index].numpy(), returns[steps]))
+            self.assertTrue(np.allclose(buffers['target'][index].numpy(), targets[steps]))
+
+    def test_parameter_store(self):
+        env = rlcard.make('leduc-holdem', config={'seed': 0})
+        action_shape = [[env.num_actions] for _ in range(env.num_players)]
+        learner_model = DMCModel(env.state_shape, action_shape, mlp_layers=[16], device='cpu')
+        actor_model = DMCModel(env.state_shape, action_shape, mlp_layers=[16], device='cpu')
+        store = ParameterStore(learner_model.get_agents(), num_actors=2, publish_interval=2)
+
+        def same(agent, other):
+            return all(torch.equal(a, b) for a, b in zip(agent.parameters(), other.parameters()))
+
+        versions = store.pull(1, actor_model.get_agents())
+        self.assertEqual(versions, [0, 0])
+        self.assertTrue(all(same(*agents) for agents in zip(learner_model.get_agents(), actor_model.get_agents())))
+
+        learner_agent, actor_agent = learner_model.get_agent(0), actor_model.get_agent(0)
+        with torch.no_grad():
+            for param in learner_agent.parameters():
+                param.add_(1.0)
+        store.step(0, learner_agent)
+        # not published before publish_interval steps
+        self.assertEqual(store.pull(1, actor_model.get_agents(), versions), [0, 0])
+        self.assertFalse(same(learner_agent, actor_agent))
+        store.step(0, learner_agent)
+        versions = store.pull(1, actor_model.get_agents(), versions)
+        self.assertEqual(versions, [2, 0])
+        self.assertTrue(same(learner_agent, actor_agent))
+
+        # actor 0 never pulled
+        store.step(0, learner_agent)
+        mean_lag, max_lag = store.policy_lag()
+        self.assertEqual(mean_lag.tolist(), [2.0, 0.0])
+        self.assertEqual(max_lag.tolist(), [3.0, 0.0])
+
+    def test_telemetry(self):
+        telemetry = Telemetry(num_devices=2, max_actors=3, num_players=2)
+        slot = telemetry.slot(1, 2)
+        self.assertEqual(slot, 5)
+        free_queue = [QueueMeter(queue.Queue()) for _ in range(2)]
+        full_queue = [QueueMeter(queue.Queue()) for _ in range(2)]
+        free_queue[0].put(3)
+        self.assertEqual(free_queue[0].get(), 3)
+        full_queue[1].put(3)
+        full_queue[1].put(4)
+        telemetry.record(slot, free_queue, full_queue)
+        telemetry.record(slot, free_queue, full_queue)
+        self.assertEqual(int(telemetry.episodes[slot]), 2)
+        self.assertEqual(telemetry.buffers[slot].tolist(), [0, 2])
+        self.assertGreaterEqual(float(telemetry.wait_time[slot]), 0.0)
+        self.assertEqual(full_queue[1].num_puts, 0)
+        self.assertEqual(int(telemetry.episodes.sum()), 2)
+
+    def test_autoscale_decision(self):
+        # the learner is starved
+        self.assertEqual(autoscale_decision(0.5, 0.0, 2, 1, 4), 1)
+        self.assertEqual(autoscale_decision(0.5, 0.0, 4, 1, 4), 0)
+        # the actors wait for the learner
+        self.assertEqual(autoscale_decision(0.0, 0.9, 2, 1, 4), -1)
+        self.assertEqual(autoscale_decision(0.0, 0.9, 1, 1, 4), 0)
+        self.assertEqual(autoscale_decision(0.05, 0.1, 2, 1, 4), 0)
+
+    def test_learner_num_threads(self):
+        import os
+        import tempfile
+        from rlcard.agents.dmc_agent.trainer import DMCTrainer
+        env = rlcard.make('leduc-holdem')
+        with tempfile.TemporaryDirectory() as savedir:
+            trainer = DMCTrainer(env, savedir=savedir, training_device='cpu', num_actors=2, autoscale=True)
+            # the CPUs left by the running actors, at least one
+            self.assertEqual(trainer._learner_num_threads(1), max(1, os.cpu_count() - 1))
+            self.assertEqual(trainer._learner_num_threads(os.cpu_count() + 1), 1)
+            trainer.learner_threads = 3
+            self.assertEqual(trainer._learner_num_threads(1), 3)
+
+    def test_device_name(self):
+        self.assertEqual(device_name('cpu'), 'cpu')
+        self.assertEqual(device_name(0), 'cuda:0')
+        self.assertEqual(device_name('1'), 'cuda:1')
+        self.assertEqual(device_name('cuda:2'), 'cuda:2')
+        agent = DMCAgent([4], [3], mlp_layers=[8], device='cpu')
+        self.assertEqual(agent.device, 'cpu')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,7 +2,8 @@ import unittest
 import torch
 import numpy as np
 
-from rlcard.agents.dqn_agent import DQNAgent
+import rlcard
+from rlcard.agents.dqn_agent import DQNAgent, Memory, Transition, SumTree, PrioritizedMemory
 
 class TestDQN(unittest.TestCase):
 
@@ -51,3 +52,133 @@ class TestDQN(unittest.TestCase):
         predicted_action = agent.step({'obs': np.random.random_sample((2,)), 'legal_actions': {0: None, 1: None}})
         self.assertGreaterEqual(predicted_action, 0)
         self.assertLessEqual(predicted_action, 1)
+
+    def test_batch_step(self):
+        agent = DQNAgent(num_actions=4,
+                         state_shape=[3],
+                         mlp_layers=[10,10],
+                         device=torch.device('cpu'))
+        obs = np.random.random_sample((8, 3))
+        legal_masks = np.random.random_sample((8, 4)) < 0.5
+        legal_masks[:, 2] = True
+        actions = agent.batch_step(obs, legal_masks)
+        for i in range(8):
+            state = {'obs': obs[i], 'legal_actions': {a: None for a in np.flatnonzero(legal_masks[i])},
+                     'raw_legal_actions': list(np.flatnonzero(legal_masks[i]))}
+            self.assertEqual(actions[i], agent.eval_step(state)[0])
+        self.assertTrue(legal_masks[np.arange(8), agent.batch_step(obs, legal_masks, is_training=True)].all())
+
+    def test_memory(self):
+        memory = Memory(memory_size=5, batch_size=3, num_actions=4)
+        for i in range(7):
+            memory.save(np.full(2, i, dtype=np.float32), i % 4, float(i), np.full(2, i + 1, dtype=np.float32), [i % 4], i == 6)
+        self.assertEqual(len(memory), 5)
+        # the two oldest transitions were overwritten
+        self.assertEqual(sorted(memory.rewards.tolist()), [2.0, 3.0, 4.0, 5.0, 6.0])
+        states, actions, rewards, next_states, dones, legal_actions = memory.sample()
+        self.assertEqual(states.shape, (3, 2))
+        self.assertEqual(len(set(rewards.tolist())), 3)
+        self.assertTrue((states[:, 0] == rewards).all())
+        self.assertTrue((next_states[:, 0] == rewards + 1).all())
+        self.assertTrue(legal_actions[np.arange(3), actions].all())
+        self.assertEqual(legal_actions.sum(), 3)
+        self.assertTrue((dones == (rewards == 6)).all())
+
+        checkpoint = memory.checkpoint_attributes()
+        self.assertEqual(checkpoint['rewards'].tolist(), [2.0, 3.0, 4.0, 5.0, 6.0])
+        restored = Memory.from_checkpoint(checkpoint)
+        self.assertEqual(len(restored), 5)
+        restored.save(np.zeros(2), 0, 7.0, np.zeros(2), [0], False)
+        self.assertEqual(restored.checkpoint_attributes()['rewards'].tolist(), [3.0, 4.0, 5.0, 6.0, 7.0])
+
+        # checkpoints of the former list memory
+        old = {'memory_size': 5, 'batch_size': 3,
+               'memory': [Transition(np.zeros(2), 1, 1.0, np.ones(2), False, [0, 1])]}
+        restored = Memory.from_checkpoint(old)
+        self.assertEqual(len(restored), 1)
+        self.assertEqual(restored.legal_actions[0].tolist(), [True, True])
+
+    def test_legal_mask(self):
+        agent = DQNAgent(num_actions=4, state_shape=[2], mlp_layers=[8], device=torch.device('cpu'))
+        state = {'obs': np.zeros(2), 'legal_actions': {1: None, 3: None}}
+        self.assertEqual(agent.legal_mask(state).tolist(), [False, True, False, True])
+        state['legal_mask'] = np.array([True, False, False, False])
+        self.assertIs(agent.legal_mask(state), state['legal_mask'])
+        # the memory stores boolean masks as they are
+        memory = Memory(memory_size=2, batch_size=1, num_actions=4)
+        memory.save(np.zeros(2), 0, 0.0, np.zeros(2), state['legal_mask'], True)
+        self.assertEqual(memory.legal_actions[0].tolist(), [True, False, False, False])
+
+    def test_env_legal_mask(self):
+        # the mask published by the environment reaches the memory
+        env = rlcard.make('cirulla', config={'seed': 0})
+        agent = DQNAgent(num_actions=env.num_actions, state_shape=env.state_shape[0], mlp_layers=[8],
+                         replay_memory_init_size=100, device=torch.device('cpu'))
+        state, _ = env.reset()
+        self.assertIs(agent.legal_mask(state), state['legal_mask'])
+        action = agent.step(state)
+        next_state, _ = env.step(action)
+        agent.feed((state, action, 0.0, next_state, False))
+        self.assertEqual(agent.memory.legal_actions[0].tolist(), next_state['legal_mask'].tolist())
+        self.assertEqual(np.flatnonzero(agent.memory.legal_actions[0]).tolist(), sorted(next_state['legal_actions']))
+
+    def test_legal_mask_only(self):
+        # without the legal actions dict the agent acts from the mask
+        env = rlcard.make('cirulla', config={'seed': 0, 'legal_mask_only': True})
+        agent = DQNAgent(num_actions=env.num_actions, state_shape=env.state_shape[0], mlp_layers=[8],
+                         device=torch.device('cpu'))
+        state, _ = env.reset()
+        self.assertNotIn('legal_actions', state)
+        self.assertTrue(state['legal_mask'][agent.step(state)])
+        action, info = agent.eval_step(state)
+        self.assertTrue(state['legal_mask'][action])
+        self.assertEqual(sorted(info['values']), np.flatnonzero(state['legal_mask']).tolist())
+
+    def test_sum_tree(self):
+        tree = SumTree(5)
+        values = np.array([1.0, 0.0, 2.5, 0.5, 3.0])
+        tree.update(np.arange(5), values)
+        self.assertAlmostEqual(tree.total(), 7.0)
+        prefix_sums = np.random.random_sample(100) * 7.0
+        expected = np.searchsorted(np.cumsum(values), prefix_sums, side='right')
+        self.assertTrue((tree.find(prefix_sums) == expected).all())
+        tree.update([2, 2], [1.0, 1.0])
+        self.assertAlmostEqual(tree.total(), 5.5)
+
+    def test_prioritized_memory(self):
+        memory = PrioritizedMemory(memory_size=4, batch_size=1000, num_actions=2, alpha=1.0, beta=1.0)
+        for i in range(4):
+            memory.save(np.zeros(2), 0, float(i), np.zeros(2), [0], False)
+        memory.update_priorities(np.arange(4), np.array([1.0, 1.0, 1.0, 7.0]))
+        _, _, rewards, _, _, _, weights, indices = memory.sample()
+        self.assertTrue((memory.rewards[indices] == rewards).all())
+        # the last transition has 70% of the priority
+        self.assertGreater((indices == 3).mean(), 0.6)
+        self.assertAlmostEqual(weights.max(), 1.0)
+        self.assertLess(weights[indices == 3].max(), weights[indices == 0].min())
+
+        restored = PrioritizedMemory.from_checkpoint(memory.checkpoint_attributes())
+        self.assertAlmostEqual(restored.tree.total(), memory.tree.total())
+        self.assertEqual(restored.max_priority, memory.max_priority)
+
+    def test_train_prioritized(self):
+        agent = DQNAgent(replay_memory_size=200,
+                         replay_memory_init_size=20,
+                         update_target_estimator_every=50,
+                         state_shape=[2],
+                         mlp_layers=[10,10],
+                         device=torch.device('cpu'),
+                         prioritized_replay=True)
+        self.assertIsInstance(agent.memory, PrioritizedMemory)
+        for _ in range(100):
+            ts = [{'obs': np.random.random_sample((2,)), 'legal_actions': {0: None, 1: None}}, np.random.randint(2), 0, {'obs': np.random.random_sample((2,)), 'legal_actions': {0: None, 1: None}, 'raw_legal_actions': ['call', 'raise']}, True]
+            agent.feed(ts)
+        # the TD errors are copied only on request, for the priorities
+        s, a, y = np.random.random_sample((4, 2)), np.array([0, 1, 1, 0]), np.zeros(4)
+        self.assertIsInstance(agent.q_estimator.update(s, a, y), float)
+        loss, td_errors = agent.q_estimator.update(s, a, y, return_td_errors=True)
+        self.assertEqual(td_errors.shape, (4,))
+        # the sampled transitions got their priorities from the TD errors
+        self.assertGreater(len(np.unique(agent.memory.tree.get(np.arange(100)))), 1)
+        restored = DQNAgent.from_checkpoint(agent.checkpoint_attributes())
+        self.assertIsInstance(restored.memory, PrioritizedMemory)
@@ -0,0 +1,47 @@
+import unittest
+import numpy as np
+
+import rlcard
+from rlcard.agents.mccfr_agent import MCCFRAgent
+
+class TestMCCFR(unittest.TestCase):
+
+    def test_train(self):
+        for sampling in MCCFRAgent.SAMPLINGS:
+            env = rlcard.make('leduc-holdem', config={'allow_step_back': True, 'seed': 0})
+            agent = MCCFRAgent(env, sampling=sampling, seed=0)
+            for _ in range(100):
+                agent.train()
+            num_infosets = agent.num_infosets
+            self.assertGreater(num_infosets, 0)
+            self.assertTrue(np.allclose(agent.policy[:num_infosets].sum(axis=1), 1))
+            self.assertTrue((agent.average_policy[:num_infosets] >= 0).all())
+
+            state = {'obs': np.array([1., 1., 0., 0., 0., 0.]), 'legal_actions': {0: None, 2: None}, 'raw_legal_actions': ['call', 'fold']}
+            action, _ = agent.eval_step(state)
+            self.assertIn(action, [0, 2])
+        with self.assertRaises(ValueError):
+            MCCFRAgent(env, sampling='chance')
+
+    def test_outcome_sampling_without_step_back(self):
+        env = rlcard.make('cirulla', config={'allow_step_back': False, 'seed': 0})
+        def step_back():
+            raise AssertionError('outcome sampling stepped back')
+        env.step_back = step_back
+        agent = MCCFRAgent(env, sampling='outcome', seed=0)
+        for _ in range(5):
+            agent.train()
+        self.assertEqual(agent.iteration, 5)
+        self.assertGreater(agent.num_infosets, 0)
+
+    def test_train_parallel(self):
+        env = rlcard.make('leduc-holdem', config={'allow_step_back': True})
+        agents = [MCCFRAgent(env) for _ in range(2)]
+        for agent, num_workers in zip(agents, [1, 2]):
+            agent.train_parallel(40, num_workers=num_workers, num_shards=4, seed=1)
+            agent.train_parallel(40, num_workers=num_workers, num_shards=4, seed=1)
+            self.assertEqual(agent.iteration, 80)
+        # the tables only depend on the seed and the number of shards
+        self.assertEqual(agents[0].infosets, agents[1].infosets)
+        self.assertTrue(np.array_equal(agents[0].regrets, agents[1].regrets))
+        self.assertTrue(np.array_equal(agents[0].average_policy, agents[1].average_policy))
@@ -45,3 +45,20 @@ class TestNFSP(unittest.TestCase):
 
             ts = [{'obs': np.random.random_sample((2,)), 'legal_actions': {0: None, 1: None}}, np.random.randint(2), 0, {'obs': np.random.random_sample((2,)), 'legal_actions': {0: None, 1: None}, 'raw_legal_actions': ['call', 'raise']}, True]
             agent.feed(ts)
+
+    def test_batch_step(self):
+        agent = NFSPAgent(num_actions=4,
+                          state_shape=[3],
+                          hidden_layers_sizes=[10,10],
+                          q_mlp_layers=[10,10],
+                          device=torch.device('cpu'))
+        obs = np.random.random_sample((8, 3))
+        legal_masks = np.random.random_sample((8, 4)) < 0.5
+        legal_masks[:, 1] = True
+        for mode in ['best_response', 'average_policy']:
+            agent._mode = mode
+            actions = agent.batch_step(obs, legal_masks, is_training=True)
+            self.assertTrue(legal_masks[np.arange(8), actions].all())
+        self.assertEqual(len(agent._reservoir_buffer), 8)
+        actions = agent.batch_step(obs, legal_masks)
+        self.assertTrue(legal_masks[np.arange(8), actions].all())
@@ -0,0 +1,42 @@
+import unittest
+import numpy as np
+
+import rlcard
+from rlcard.agents.cfr_agent import CFRAgent
+from rlcard.agents.parallel_cfr_trainer import ParallelCFRTrainer
+
+def train(variant, num_workers=None, chance_samples=1, capacity=2):
+    env = rlcard.make('leduc-holdem', config={'allow_step_back': True, 'seed': 3})
+    # a small capacity makes the traversals outgrow the shared arrays
+    agent = CFRAgent(env, variant=variant, capacity=capacity)
+    if num_workers is None:
+        for _ in range(20):
+            agent.train()
+    else:
+        with ParallelCFRTrainer(agent, num_workers=num_workers, chance_samples=chance_samples) as trainer:
+            for _ in range(20):
+                trainer.train()
+    return agent
+
+class TestParallelCFRTrainer(unittest.TestCase):
+
+    def test_serial_run(self):
+        for variant in ['vanilla', 'cfr+']:
+            serial = train(variant)
+            parallel = train(variant, num_workers=2)
+            self.assertEqual(serial.infosets, parallel.infosets)
+            self.assertEqual(serial.iteration, parallel.iteration)
+            num_infosets = serial.num_infosets
+            self.assertTrue(np.allclose(serial.regrets[:num_infosets], parallel.regrets[:num_infosets]))
+            self.assertTrue(np.allclose(serial.average_policy[:num_infosets], parallel.average_policy[:num_infosets]))
+
+    def test_num_workers(self):
+        agents = [train('vanilla', num_workers=num_workers, chance_samples=3) for num_workers in [1, 2]]
+        self.assertEqual(agents[0].infosets, agents[1].infosets)
+        num_infosets = agents[0].num_infosets
+        self.assertTrue(np.array_equal(agents[0].regrets[:num_infosets], agents[1].regrets[:num_infosets]))
+        self.assertTrue(np.array_equal(agents[0].policy[:num_infosets], agents[1].policy[:num_infosets]))
+        self.assertTrue(np.array_equal(agents[0].average_policy[:num_infosets], agents[1].average_policy[:num_infosets]))
+
+if __name__ == '__main__':
+    unittest.main()
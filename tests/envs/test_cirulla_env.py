@@ -0,0 +1,149 @@
+import unittest
+import numpy as np
+
+import rlcard
+from rlcard.agents.random_agent import RandomAgent
+from rlcard.envs.cirulla_vec import CirullaVecEnv
+from rlcard.games.cirulla.bitboard_game import CirullaBitboardGame
+from rlcard.games.cirulla.bitboard import encode_masks
+from rlcard.games.cirulla.card import CirullaKnock as Knock
+from .determism_util import is_deterministic
+
+FULL_RULES = {'game_redeal': True, 'game_knock': True, 'game_last_taker': True}
+
+
+class TestCirullaEnv(unittest.TestCase):
+
+    def test_reset_and_extract_state(self):
+        env = rlcard.make('cirulla')
+        state, _ = env.reset()
+        self.assertEqual(state['obs'].shape, (5, 40))
+        self.assertEqual(len(state['legal_actions']), 3)
+        for action in state['legal_actions']:
+            self.assertLess(action, env.num_actions)
+            self.assertEqual(state['obs'][1][action], 1)
+        self.assertEqual(state['legal_mask'].dtype, bool)
+        self.assertEqual(np.flatnonzero(state['legal_mask']).tolist(), sorted(state['legal_actions']))
+
+    def test_is_deterministic(self):
+        self.assertTrue(is_deterministic('cirulla'))
+
+    def test_step(self):
+        env = rlcard.make('cirulla')
+        state, player_id = env.reset()
+        self.assertEqual(player_id, env.get_player_id())
+        action = list(state['legal_actions'].keys())[0]
+        _, player_id = env.step(action)
+        self.assertEqual(player_id, env.get_player_id())
+
+    def test_step_back(self):
+        env = rlcard.make('cirulla', config={'allow_step_back': True})
+        state, player_id = env.reset()
+        env.step(list(state['legal_actions'].keys())[0])
+        back_state, back_player_id = env.step_back()
+        self.assertEqual(player_id, back_player_id)
+        self.assertTrue(np.array_equal(state['obs'], back_state['obs']))
+        self.assertEqual(env.step_back(), False)
+
+    def test_run(self):
+        env = rlcard.make('cirulla')
+        agents = [RandomAgent(env.num_actions) for _ in range(env.num_players)]
+        env.set_agents(agents)
+        trajectories, payoffs = env.run(is_training=False)
+        self.assertEqual(len(trajectories), 2)
+        self.assertEqual(sum(payoffs), 0)
+
+    def test_bitboard_engine(self):
+        for rules in [{}, FULL_RULES]:
+            env = rlcard.make('cirulla', config={'seed': 3, **rules})
+            bitboard_env = rlcard.make('cirulla', config={'seed': 3, 'game_bitboard': True, **rules})
+            state, player_id = env.reset()
+            bitboard_state, bitboard_player_id = bitboard_env.reset()
+            while not env.is_over():
+                self.assertEqual(player_id, bitboard_player_id)
+                self.assertTrue(np.array_equal(state['obs'], bitboard_state['obs']))
+                self.assertEqual(sorted(state['legal_actions']), sorted(bitboard_state['legal_actions']))
+                action = max(state['legal_actions'])
+                state, player_id = env.step(action)
+                bitboard_state, bitboard_player_id = bitboard_env.step(action)
+            self.assertTrue(bitboard_env.is_over())
+            self.assertTrue(np.array_equal(env.get_payoffs(), bitboard_env.get_payoffs()))
+
+    def test_full_rules(self):
+        env = rlcard.make('cirulla', config={'seed': 1, **FULL_RULES})
+        self.assertEqual(env.num_actions, 80)
+        env.set_agents([RandomAgent(env.num_actions) for _ in range(env.num_players)])
+        knocks = 0
+        for _ in range(5):
+            trajectories, payoffs = env.run(is_training=False)
+            self.assertEqual(sum(payoffs), 0)
+            for state in trajectories[0][:-1:2]:
+                self.assertEqual(state['legal_mask'].shape, (80,))
+                self.assertEqual(np.flatnonzero(state['legal_mask']).tolist(), sorted(state['legal_actions']))
+                for action_id, action in state['legal_actions'].items():
+                    self.assertEqual(action_id >= 40, isinstance(action, Knock))
+                    knocks += action_id >= 40
+        self.assertGreater(knocks, 0)
+
+    def test_obs_buffer(self):
+        env = rlcard.make('cirulla', config={'seed': 5})
+        buffer_env = rlcard.make('cirulla', config={'seed': 5, 'reuse_obs_buffer': True, 'raw_obs': False,
+                                                    'legal_mask_only': True})
+        state, _ = env.reset()
+        buffer_state, _ = buffer_env.reset()
+        self.assertNotIn('raw_obs', buffer_state)
+        self.assertNotIn('legal_actions', buffer_state)
+        self.assertEqual(buffer_state['obs'].dtype, np.int8)
+        obs, legal_mask = buffer_state['obs'], buffer_state['legal_mask']
+        while not env.is_over():
+            self.assertTrue(np.array_equal(state['obs'], buffer_state['obs']))
+            self.assertTrue(np.array_equal(state['legal_mask'], buffer_state['legal_mask']))
+            self.assertIs(buffer_state['obs'], obs)
+            self.assertIs(buffer_state['legal_mask'], legal_mask)
+            action = min(state['legal_actions'])
+            state, _ = env.step(action)
+            buffer_state, _ = buffer_env.step(action)
+
+        batch = np.zeros((2, 5, 40), dtype=np.int8)
+        for player_id in range(2):
+            raw_state = env.game.get_state(player_id)
+            env.encode_obs(raw_state, out=batch[player_id])
+            self.assertTrue(np.array_equal(batch[player_id], env.get_state(player_id)['obs']))
+
+    def test_vec_env(self):
+        env = CirullaVecEnv(8, seed=0)
+        obs, legal_actions, player_ids = env.reset()
+        self.assertEqual(obs.shape, (8, 5, 40))
+        self.assertEqual(legal_actions.shape, (8, 40))
+        self.assertTrue((legal_actions.sum(axis=1) == 3).all())
+        np_random = np.random.RandomState(0)
+        num_steps = 0
+        while not env.is_over():
+            # replay the move of the first game on a bitboard game in the same state
+            game = CirullaBitboardGame()
+            game.hands = [int(h) for h in env.hands[0]]
+            game.won = [int(w) for w in env.won[0]]
+            game.scopa_sums = [int(s) for s in env.scopa_sums[0]]
+            game.board = int(env.board[0])
+            game.deck = [int(c) for c in env.decks[0]]
+            game.deck_size = int(env.deck_sizes[0])
+            game.current_player_id = int(player_ids[0])
+            game.payoffs = [0, 0]
+            game._is_over, game.winner = False, None
+
+            actions = [np_random.choice(np.flatnonzero(mask)) for mask in legal_actions]
+            obs, legal_actions, player_ids, dones, payoffs = env.step(actions)
+            game.play_card_id(int(actions[0]))
+            state = game.get_state(game.get_player_id())
+            self.assertEqual(player_ids[0], game.get_player_id())
+            self.assertTrue(np.array_equal(obs[0], encode_masks(state['masks'])))
+            self.assertEqual(dones[0], game.is_over())
+            self.assertEqual(list(payoffs[0]), game.get_payoffs())
+            num_steps += 1
+        self.assertEqual(num_steps, 36)
+        self.assertTrue((payoffs.sum(axis=1) == 0).all())
+        self.assertTrue((obs[:, 3].sum(axis=1) + obs[:, 4].sum(axis=1) == 40).all())
+
+
+if __name__ == '__main__':
+    unittest.main()
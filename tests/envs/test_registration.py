@@ -1,3 +1,5 @@
+import subprocess
+import sys
 import unittest
 
 import rlcard
@@ -23,5 +25,18 @@ class TestRegistration(unittest.TestCase):
     def test_make_modes(self):
         register(env_id='test_env', entry_point='rlcard.envs.blackjack:BlackjackEnv')
 
+    def test_lazy_import(self):
+        # the entry point is imported on the first make only
+        register(env_id='test_lazy', entry_point='rlcard.envs.not_a_module:NotAnEnv')
+        with self.assertRaises(ImportError):
+            make('test_lazy')
+
+    def test_import_does_not_load_games(self):
+        code = ('import sys, rlcard; rlcard.make("blackjack"); '
+                'print(" ".join(m for m in sys.modules if m.startswith("rlcard.games.")))')
+        modules = subprocess.check_output([sys.executable, '-c', code], text=True).split()
+        self.assertIn('rlcard.games.blackjack', modules)
+        self.assertFalse([m for m in modules if m.startswith('rlcard.games.doudizhu')])
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,346 @@
+import unittest
+from copy import deepcopy
+from itertools import combinations
+import numpy as np
+
+from rlcard.games.cirulla.game import CirullaGame as Game
+from rlcard.games.cirulla.bitboard_game import CirullaBitboardGame as BitboardGame
+from rlcard.games.cirulla.bitboard import mask_from_card_ids, count_points
+from rlcard.games.cirulla.solver import CirullaEndgameSolver, CirullaPosition, position_from_game, \
+    position_from_state, get_deck_size
+from rlcard.games.cirulla.player import CirullaPlayer as Player
+from rlcard.games.cirulla.judger import CirullaJudger as Judger
+from rlcard.games.cirulla.board import Board
+from rlcard.games.cirulla.card import CirullaCard as Card, CirullaKnock as Knock
+from rlcard.games.cirulla.utils import init_deck, get_card_id, card_from_card_id, get_action_id, \
+    is_redeal_needed
+
+FULL_RULES = {'redeal': True, 'knock': True, 'last_taker': True}
+
+
+def cards_mask(cards):
+    return mask_from_card_ids(get_card_id(c) for c in cards)
+
+
+def play_until_deck_size(game, deck_size, np_random):
+    while game.deck_size > deck_size or game.hands[game.get_player_id()].bit_count() < 3:
+        legal_actions = game.get_legal_actions(game.get_player_id())
+        game.step(legal_actions[np_random.randint(len(legal_actions))])
+
+
+def minimax(game):
+    ''' Value of the player to move by exhaustive search with step/step_back
+    '''
+    if game.is_over():
+        return None
+    player_id = game.get_player_id()
+    best = -1
+    for card in game.get_legal_actions(player_id):
+        game.step(card)
+        if game.is_over():
+            value = game.get_payoffs()[player_id]
+            game.payoffs = [0, 0]
+        else:
+            value = -minimax(game)
+        game.step_back()
+        best = max(best, value)
+    return best
+
+
+def brute_force_take_sets(cards, value):
+    ''' Enumerate every subset of the board taken by a card of the given value
+    '''
+    takes = set()
+    for n in range(1, len(cards) + 1):
+        for subset in combinations(cards, n):
+            subset_value = sum(c.value for c in subset)
+            if subset_value <= 10 and value in (subset_value, 15 - subset_value):
+                takes.add(frozenset(subset))
+    return takes
+
+
+class TestCirullaMethods(unittest.TestCase):
+
+    def test_get_num_actions(self):
+        game = Game()
+        self.assertEqual(game.get_num_actions(), 40)
+
+    def test_init_game(self):
+        game = Game()
+        state, player_id = game.init_game()
+        self.assertEqual(game.get_player_id(), player_id)
+        self.assertEqual(len(state['legal_actions']), 3)
+        self.assertEqual(len(game.dealer.deck), 30)
+
+    def test_card_table(self):
+        deck = init_deck()
+        self.assertEqual(len(set(deck)), 40)
+        for card_id, card in enumerate(deck):
+            self.assertIs(card, Card(card.suit, card.rank))
+            self.assertIs(card, card_from_card_id(card_id))
+            self.assertIs(card, deepcopy(card))
+            self.assertEqual(get_card_id(card), card_id)
+            self.assertEqual(str(card), card.rank + card.suit)
+        with self.assertRaises(AttributeError):
+            deck[0].value = 2
+
+    def test_board_take_index(self):
+        np_random = np.random.RandomState(7)
+        for _ in range(20):
+            deck = init_deck()
+            np_random.shuffle(deck)
+            board = Board()
+            board.cards = deck[:6]
+            for card in deck[6:12]:
+                board.add_card(card)
+            board.remove_cards(deck[2:4])
+            for value in range(1, 11):
+                takes = {frozenset(board.cards_from_mask(m)) for m in board.find_take_masks(value)}
+                self.assertEqual(takes, brute_force_take_sets(board.cards, value))
+
+    def test_board_best_take(self):
+        board = Board()
+        board.cards = [Card('S', '2'), Card('H', '3'), Card('D', '5'), Card('C', '7')]
+        # 7 takes 7C alone or 2S+5D, the take with more cards wins
+        take = board.find_best_take(Card('S', '7'))
+        self.assertEqual(take.cards, {Card('S', '2'), Card('D', '5')})
+        # K takes 2S+3H+5D (worth 10) rather than 5D or 2S+3H (summing up to 15)
+        take = board.find_best_take(Card('S', 'K'))
+        self.assertEqual(take.cards, {Card('S', '2'), Card('H', '3'), Card('D', '5')})
+        self.assertEqual(len(board.find_best_take(Card('S', 'A')).cards), 0)
+
+    def test_play_card_scopa(self):
+        player = Player(0)
+        board = Board()
+        board.cards = [Card('S', '2'), Card('H', '3')]
+        player.hand = [Card('D', '5'), Card('C', 'K')]
+        player.play_card(Card('D', '5'), board)
+        self.assertTrue(board.is_empty())
+        self.assertEqual(player.scopa_sum, 1)
+        self.assertEqual(len(player.won_cards), 3)
+        self.assertEqual(board.mask, 0)
+
+    def test_run_game(self):
+        game = Game()
+        game.init_game()
+        while not game.is_over():
+            game.step(game.get_legal_actions(game.get_player_id())[0])
+        won = sum(len(p.won_cards) for p in game.players)
+        self.assertEqual(won, 40)
+        self.assertEqual(sum(game.get_payoffs()), 0)
+
+    def test_bitboard_game_matches_game(self):
+        for seed, rules in [(seed, rules) for rules in [{}, FULL_RULES] for seed in range(10)]:
+            game = Game(**rules)
+            game.np_random = np.random.RandomState(seed)
+            bitboard_game = BitboardGame(**rules)
+            bitboard_game.np_random = np.random.RandomState(seed)
+            game.init_game()
+            bitboard_game.init_game()
+            np_random = np.random.RandomState(seed)
+            while True:
+                self.assertEqual(game.get_player_id(), bitboard_game.get_player_id())
+                self.assertEqual(cards_mask(game.board.cards), bitboard_game.board)
+                for player in game.players:
+                    player_id = player.player_id
+                    self.assertEqual(cards_mask(player.hand), bitboard_game.hands[player_id])
+                    self.assertEqual(cards_mask(player.won_cards), bitboard_game.won[player_id])
+                    self.assertEqual(player.scopa_sum, bitboard_game.scopa_sums[player_id])
+                    self.assertEqual(game.judger.count_points(player), bitboard_game.get_points(player_id))
+                if game.is_over():
+                    break
+                legal_actions = game.get_legal_actions(game.get_player_id())
+                self.assertEqual(sorted(map(get_action_id, legal_actions)),
+                                 bitboard_game.get_legal_action_ids(game.get_player_id()))
+                action = legal_actions[np_random.randint(len(legal_actions))]
+                game.step(action)
+                bitboard_game.step(action)
+            self.assertTrue(bitboard_game.is_over())
+            self.assertEqual(game.get_payoffs(), bitboard_game.get_payoffs())
+
+    def test_undo_log_matches_snapshot(self):
+        def game_state(game):
+            winner = getattr(game.winner, 'player_id', game.winner and 'draw')
+            return (game.get_player_id(), game.is_over(), winner,
+                    [str(c) for c in game.dealer.deck],
+                    cards_mask(game.board.cards),
+                    [([str(c) for c in p.hand], cards_mask(p.won_cards), p.scopa_sum,
+                      game.judger.tallies[p.player_id].suit_ranks, game.judger.count_points(p))
+                     for p in game.players])
+
+        for seed, rules in [(seed, rules) for rules in [{}, FULL_RULES] for seed in range(5)]:
+            undo_game = Game(allow_step_back=True, undo_log=True, **rules)
+            snapshot_game = Game(allow_step_back=True, undo_log=False, **rules)
+            undo_game.np_random = np.random.RandomState(seed)
+            snapshot_game.np_random = np.random.RandomState(seed)
+            undo_game.init_game()
+            snapshot_game.init_game()
+            states = [game_state(undo_game)]
+            np_random = np.random.RandomState(seed)
+            while not undo_game.is_over():
+                # go forward two moves, back one
+                for _ in range(2):
+                    if undo_game.is_over():
+                        break
+                    legal_actions = undo_game.get_legal_actions(undo_game.get_player_id())
+                    action = legal_actions[np_random.randint(len(legal_actions))]
+                    undo_game.step(action)
+                    snapshot_game.step(action)
+                    states.append(game_state(undo_game))
+                    self.assertEqual(states[-1], game_state(snapshot_game))
+                self.assertTrue(undo_game.step_back())
+                self.assertTrue(snapshot_game.step_back())
+                states.pop()
+                self.assertEqual(states[-1], game_state(undo_game))
+                self.assertEqual(states[-1], game_state(snapshot_game))
+                legal_actions = undo_game.get_legal_actions(undo_game.get_player_id())
+                action = legal_actions[np_random.randint(len(legal_actions))]
+                undo_game.step(action)
+                snapshot_game.step(action)
+                states.append(game_state(undo_game))
+            # back to the beginning
+            while undo_game.step_back():
+                self.assertTrue(snapshot_game.step_back())
+                states.pop()
+                self.assertEqual(states[-1], game_state(undo_game))
+                self.assertEqual(states[-1], game_state(snapshot_game))
+            self.assertEqual(len(states), 1)
+
+    def test_bitboard_step_back(self):
+        game = BitboardGame(allow_step_back=True)
+        state, _ = game.init_game()
+        game.step(state['legal_actions'][0])
+        game.step_back()
+        self.assertEqual(game.get_state(game.get_player_id())['masks'], state['masks'])
+        self.assertEqual(game.step_back(), False)
+
+    def test_redeal(self):
+        self.assertTrue(is_redeal_needed([Card('S', 'A'), Card('H', '5'), Card('D', 'A'), Card('C', '7')]))
+        self.assertTrue(is_redeal_needed([Card('S', '5'), Card('H', '5'), Card('D', '5'), Card('C', '7')]))
+        self.assertFalse(is_redeal_needed([Card('S', 'A'), Card('H', '5'), Card('D', '5'), Card('C', '7')]))
+        for seed in range(20):
+            game = Game(redeal=True)
+            game.np_random = np.random.RandomState(seed)
+            game.init_game()
+            top = game.board.cards or game.players[1 - game.get_player_id()].won_cards
+            self.assertFalse(is_redeal_needed(top))
+
+    def test_knock(self):
+        game = Game(knock=True)
+        self.assertEqual(game.get_num_actions(), 80)
+        game.init_game()
+        player = game.players[game.get_player_id()]
+        player.hand = [Card('S', '2'), Card('H', '3'), Card('D', '4')]
+        game.board.cards = [Card('C', 'K')]
+        legal_actions = game.get_legal_actions(player.player_id)
+        self.assertEqual(legal_actions[3:], [Knock(card) for card in player.hand])
+        scopa_sum = player.scopa_sum
+        game.step(legal_actions[0])
+        self.assertEqual(player.scopa_sum, scopa_sum)
+        # the "buona" is scored only when knocking
+        player.hand.append(Card('C', '2'))
+        self.assertEqual(len(game.get_legal_actions(player.player_id)), 6)
+        game.current_player_id = player.player_id
+        game.step(Knock(Card('C', '2')))
+        self.assertEqual(player.scopa_sum, scopa_sum + 3)
+
+    def test_last_taker(self):
+        for last_taker in [False, True]:
+            game = Game(last_taker=last_taker)
+            game.init_game()
+            player_id = game.get_player_id()
+            for player in game.players:
+                player.hand = []
+            game.dealer.deck = []
+            game.board.cards = [Card('S', '5')]
+            game.players[player_id].hand = [Card('H', '5')]
+            game.players[1 - player_id].hand = [Card('D', '2')]
+            game.step(Card('H', '5'))
+            game.step(Card('D', '2'))
+            self.assertTrue(game.is_over())
+            taker = game.players[player_id if last_taker else 1 - player_id]
+            self.assertIn(Card('D', '2'), taker.won_cards)
+
+    def test_judger_tallies(self):
+        judger = Judger()
+        player = Player(0)
+        player.won_cards = [Card('D', 'J'), Card('D', 'Q'), Card('D', 'K'), Card('D', '7'),
+                            Card('S', '7'), Card('H', '6'), Card('C', '6')]
+        judger.record_won_cards(0, player.won_cards)
+        tally = judger.tallies[0]
+        self.assertEqual(tally.num_cards, 7)
+        self.assertEqual(tally.num_diamonds, 4)
+        self.assertTrue(tally.has_settebello())
+        self.assertEqual(tally.get_primiera(), [21, 18, 21, 18])
+        # grande 5, settebello 1, primiera 1
+        self.assertEqual(judger.count_points(player), 7)
+        judger.remove_won_cards(0, [Card('D', 'J'), Card('H', '6')])
+        self.assertEqual(tally.get_primiera(), [21, 0, 21, 18])
+        self.assertEqual(tally.get_diamond_points(), 1)
+        self.assertEqual(tally.count_points(), 1)
+
+    def test_judger_unreported_won_cards(self):
+        # won cards assigned without record_won_cards are still counted
+        judger = Judger()
+        player = Player(0)
+        player.won_cards = [Card('D', 'J'), Card('D', 'Q'), Card('D', 'K'), Card('D', '7'),
+                            Card('S', '7'), Card('H', '6'), Card('C', '6')]
+        self.assertEqual(judger.count_points(player), 7)
+        self.assertEqual(judger.tallies[0].num_cards, 7)
+        player.won_cards = player.won_cards + [Card(suit, rank) for suit in 'SHC' for rank in 'A2345']
+        # one more point for the 22 cards
+        self.assertEqual(judger.count_points(player), 8)
+
+    def test_solver_matches_minimax(self):
+        solver = CirullaEndgameSolver(max_deck_size=0)
+        for seed in range(5):
+            game = BitboardGame(allow_step_back=True)
+            game.np_random = np.random.RandomState(seed)
+            game.init_game()
+            play_until_deck_size(game, 0, np.random.RandomState(seed))
+            position = position_from_game(game)
+            self.assertEqual(get_deck_size(position), 0)
+            self.assertTrue(solver.can_solve(position))
+            self.assertEqual(solver.value(position), minimax(game))
+            action_values = solver.action_values(position)
+            self.assertEqual(max(action_values.values()), solver.value(position))
+            self.assertEqual(position_from_state(game.get_state(game.get_player_id())), position)
+
+    def test_solver_last_deal(self):
+        solver = CirullaEndgameSolver(max_deck_size=6)
+        game = BitboardGame()
+        game.np_random = np.random.RandomState(0)
+        game.init_game()
+        play_until_deck_size(game, 6, np.random.RandomState(0))
+        # play the last card of the round, the value is the average over the last deals
+        game.step(game.get_legal_actions(game.get_player_id())[0])
+        game.step(game.get_legal_actions(game.get_player_id())[0])
+        game.step(game.get_legal_actions(game.get_player_id())[0])
+        game.step(game.get_legal_actions(game.get_player_id())[0])
+        game.step(game.get_legal_actions(game.get_player_id())[0])
+        position = position_from_game(game)
+        self.assertEqual(position.hands[1 - position.player_id], 0)
+        card_id = next(iter(solver.action_values(position)))
+        deck = [c for c in range(40) if not (position.board | position.won[0] | position.won[1]
+                                             | position.hands[0] | position.hands[1]) >> c & 1]
+        self.assertEqual(len(deck), 6)
+        game.step(game.get_legal_actions(game.get_player_id())[0])
+        values = []
+        for first in combinations(deck, 3):
+            hands = [0, 0]
+            hands[game.get_player_id()] = mask_from_card_ids(first)
+            hands[1 - game.get_player_id()] = mask_from_card_ids(c for c in deck if c not in first)
+            dealt = CirullaPosition(tuple(hands), game.board, tuple(game.won),
+                                    tuple(game.scopa_sums), game.get_player_id())
+            values.append(solver.value(dealt))
+        self.assertAlmostEqual(solver.action_values(position)[card_id], -sum(values) / len(values))
+
+    def test_count_points(self):
+        won_mask = cards_mask([Card('D', 'J'), Card('D', 'Q'), Card('D', 'K'), Card('D', '7'),
+                               Card('D', 'A'), Card('D', '2'), Card('D', '3'), Card('D', '4')])
+        # grande 5, piccola 3 + 1, settebello 1, diamonds 1
+        self.assertEqual(count_points(won_mask, 2), 13)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+import numpy as np
+
+import rlcard
+from rlcard.agents.random_agent import RandomAgent
+from rlcard.utils import ColumnarTrajectories, reorganize
+
+
+class TestColumnarTrajectories(unittest.TestCase):
+
+    def test_matches_reorganize(self):
+        for env_id in ['leduc-holdem', 'cirulla']:
+            env = rlcard.make(env_id, config={'seed': 0})
+            env.set_agents([RandomAgent(env.num_actions) for _ in range(env.num_players)])
+            np.random.seed(0)
+            expected = [reorganize(*env.run(is_training=True)) for _ in range(20)]
+
+            env = rlcard.make(env_id, config={'seed': 0})
+            env.set_agents([RandomAgent(env.num_actions) for _ in range(env.num_players)])
+            np.random.seed(0)
+            columnar = ColumnarTrajectories(env.num_players, env.num_actions, capacity=4)
+            for _ in range(20):
+                _, payoffs = env.run(is_training=True, columnar=columnar)
+            self.assertEqual(columnar.num_episodes, 20)
+            self.assertEqual(columnar.payoffs[-1], list(payoffs))
+
+            for player_id in range(env.num_players):
+                transitions = [t for episode in expected for t in episode[player_id]]
+                obs, actions, rewards, next_obs, next_legal_masks, dones = columnar.get_transitions(player_id)
+                self.assertEqual(len(actions), len(transitions))
+                for i, (state, action, reward, next_state, done) in enumerate(transitions):
+                    self.assertTrue(np.array_equal(obs[i], state['obs']))
+                    self.assertEqual(actions[i], action)
+                    self.assertEqual(rewards[i], reward)
+                    self.assertTrue(np.array_equal(next_obs[i], next_state['obs']))
+                    self.assertEqual(list(np.flatnonzero(next_legal_masks[i])),
+                                     sorted(next_state['legal_actions']))
+                    self.assertEqual(dones[i], done)
+
+    def test_clear(self):
+        env = rlcard.make('leduc-holdem')
+        env.set_agents([RandomAgent(env.num_actions) for _ in range(env.num_players)])
+        columnar = ColumnarTrajectories(env.num_players, env.num_actions)
+        env.run(columnar=columnar)
+        obs = columnar.obs[0]
+        columnar.clear()
+        self.assertEqual(columnar.num_episodes, 0)
+        self.assertEqual(len(columnar.get_transitions(0)[1]), 0)
+        self.assertIs(columnar.obs[0], obs)
+
+
+if __name__ == '__main__':
+    unittest.main()
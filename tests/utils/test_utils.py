@@ -1,6 +1,7 @@
 import unittest
 import numpy as np
-from rlcard.utils.utils import init_54_deck, init_standard_deck, rank2int, print_card, elegent_form, reorganize, tournament
+from rlcard.utils.utils import init_54_deck, init_standard_deck, rank2int, print_card, elegent_form, reorganize, tournament, \
+    parallel_tournament, run_batched
 import rlcard
 from rlcard.agents.random_agent import RandomAgent
 
@@ -43,5 +44,75 @@ class TestUtils(unittest.TestCase):
         payoffs = tournament(env,1000)
         self.assertEqual(len(payoffs), 2)
 
+    def test_parallel_tournament(self):
+        env = rlcard.make('leduc-holdem')
+        agents = [RandomAgent(env.num_actions), RandomAgent(env.num_actions)]
+        payoffs, intervals = parallel_tournament('leduc-holdem', agents, 200, num_workers=1, seed=1, num_shards=8)
+        parallel_payoffs, parallel_intervals = parallel_tournament('leduc-holdem', agents, 200, num_workers=2,
+                                                                   seed=1, num_shards=8)
+        self.assertEqual(payoffs, parallel_payoffs)
+        self.assertEqual(intervals, parallel_intervals)
+        self.assertAlmostEqual(sum(payoffs), 0)
+        for payoff, (low, high) in zip(payoffs, intervals):
+            self.assertLess(low, payoff)
+            self.assertLess(payoff, high)
+        other_payoffs, _ = parallel_tournament('leduc-holdem', agents, 200, num_workers=1, seed=2, num_shards=8)
+        self.assertNotEqual(payoffs, other_payoffs)
+
+    def test_parallel_tournament_restores_random_states(self):
+        import random
+        env = rlcard.make('leduc-holdem')
+        agents = [RandomAgent(env.num_actions), RandomAgent(env.num_actions)]
+        np.random.seed(3)
+        random.seed(3)
+        expected = (np.random.rand(), random.random())
+        np.random.seed(3)
+        random.seed(3)
+        parallel_tournament('leduc-holdem', agents, 50, num_workers=1, seed=1, num_shards=4)
+        self.assertEqual((np.random.rand(), random.random()), expected)
+
+    def test_parallel_tournament_single_shard_matches_tournament(self):
+        import random
+        env = rlcard.make('leduc-holdem', config={'seed': 5})
+        agents = [RandomAgent(env.num_actions), RandomAgent(env.num_actions)]
+        env.set_agents(agents)
+        np.random.seed(5)
+        random.seed(5)
+        expected = tournament(env, 300)
+        payoffs, _ = parallel_tournament('leduc-holdem', agents, 300, num_workers=1, seed=5, num_shards=1)
+        self.assertEqual(list(payoffs), list(expected))
+
+    def test_run_batched(self):
+        envs = [rlcard.make('leduc-holdem', config={'seed': i}) for i in range(4)]
+        for env in envs:
+            env.set_agents([RandomAgent(env.num_actions), RandomAgent(env.num_actions)])
+        all_trajectories, all_payoffs = run_batched(envs, 10, is_training=True)
+        self.assertEqual(len(all_trajectories), 10)
+        for trajectories, payoffs in zip(all_trajectories, all_payoffs):
+            self.assertAlmostEqual(sum(payoffs), 0)
+            # a player may have no transition, when the other folds first
+            for transitions in reorganize(trajectories, payoffs):
+                for transition in transitions:
+                    self.assertEqual(len(transition), 5)
+                self.assertTrue(not transitions or transitions[-1][-1])
+
+    def test_run_batched_matches_run(self):
+        import torch
+        from rlcard.agents.dqn_agent import DQNAgent
+        env = rlcard.make('cirulla', config={'seed': 7})
+        agent = DQNAgent(num_actions=env.num_actions, state_shape=env.state_shape[0],
+                         mlp_layers=[16], device=torch.device('cpu'))
+        # a greedy agent playing both seats: batched or not, the games are the same
+        env.set_agents([agent, agent])
+        expected = [env.run(is_training=False) for _ in range(3)]
+        batched_env = rlcard.make('cirulla', config={'seed': 7})
+        batched_env.set_agents([agent, agent])
+        all_trajectories, all_payoffs = run_batched([batched_env], 3)
+        for (trajectories, payoffs), batched_trajectories, batched_payoffs in \
+                zip(expected, all_trajectories, all_payoffs):
+            self.assertEqual(list(payoffs), list(batched_payoffs))
+            for player_id in range(2):
+                self.assertEqual(trajectories[player_id][1::2], batched_trajectories[player_id][1::2])
+
 if __name__ == '__main__':
     unittest.main()